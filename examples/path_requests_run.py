@@ -23,12 +23,21 @@ from networkx import (draw_networkx_nodes, draw_networkx_edges,
 from numpy import mean
 from examples.convert_service_sheet import convert_service_sheet, Request_element, Element
 from gnpy.core.utils import load_json
-from gnpy.core.network import load_network, build_network, set_roadm_loss
+from gnpy.core.network import load_network, build_network, set_roadm_loss, DesignCache, network_index
 from gnpy.core.equipment import load_equipment, trx_mode_params
 from gnpy.core.elements import Transceiver, Roadm, Edfa, Fused
 from gnpy.core.utils import db2lin, lin2db
-from gnpy.core.request import Path_request, Result_element, compute_constrained_path, propagate, jsontocsv
+from gnpy.core.request import (Path_request, Result_element, compute_constrained_path, propagate,
+                               jsontocsv, csv_row, CSV_HEADER, path_result,
+                               Disjunction, roadm_graph, compute_disjoint_paths,
+                               compute_feasible_path)
+from gnpy.core.execute import propagation_cache
 from copy import copy, deepcopy
+from contextlib import redirect_stdout
+from io import StringIO
+from multiprocessing import Pool
+from itertools import islice
+from csv import writer
 
 #EQPT_LIBRARY_FILENAME = Path(__file__).parent / 'eqpt_config.json'
 
@@ -40,34 +49,49 @@ parser.add_argument('service_filename', nargs='?', type = Path, default= Path(__
 parser.add_argument('eqpt_filename', nargs='?', type = Path, default=Path(__file__).parent / 'eqpt_config.json')
 parser.add_argument('-v', '--verbose', action='count')
 parser.add_argument('-o', '--output', default=None)
+parser.add_argument('-j', '--jobs', type=int, default=1,
+                    help='number of worker processes computing the requests')
 
 
-def requests_from_json(json_data,equipment):
-    requests_list = []
+def request_from_json(req, equipment):
+    #print(f'{req}')
+    params = {}
+    params['request_id'] = req['request-id']
+    params['source'] = req['src-tp-id']
+    params['destination'] = req['dst-tp-id']
+    params['trx_type'] = req['path-constraints']['te-bandwidth']['trx_type']
+    params['trx_mode'] = req['path-constraints']['te-bandwidth']['trx_mode']
+    params['format'] = params['trx_mode']
+    nd_list = req['optimizations']['explicit-route-include-objects']
+    params['nodes_list'] = [n['unnumbered-hop']['node-id'] for n in nd_list]
+    params['loose_list'] = [n['unnumbered-hop']['hop-type'] for n in nd_list]
+    params['spacing'] = req['path-constraints']['te-bandwidth']['spacing']
 
-    for req in json_data['path-request']:
-        #print(f'{req}')
-        params = {}
-        params['request_id'] = req['request-id']
-        params['source'] = req['src-tp-id']
-        params['destination'] = req['dst-tp-id']
-        params['trx_type'] = req['path-constraints']['te-bandwidth']['trx_type']
-        params['trx_mode'] = req['path-constraints']['te-bandwidth']['trx_mode']
-        params['format'] = params['trx_mode']
-        nd_list = req['optimizations']['explicit-route-include-objects']
-        params['nodes_list'] = [n['unnumbered-hop']['node-id'] for n in nd_list]
-        params['loose_list'] = [n['unnumbered-hop']['hop-type'] for n in nd_list]
-        params['spacing'] = req['path-constraints']['te-bandwidth']['spacing']
+    trx_params = trx_mode_params(equipment,params['trx_type'],params['trx_mode'],True)
+    params.update(trx_params)
+    params['power'] = req['path-constraints']['te-bandwidth']['output-power']
+    params['nb_channel'] = req['path-constraints']['te-bandwidth']['max-nb-of-channel']
 
-        trx_params = trx_mode_params(equipment,params['trx_type'],params['trx_mode'],True)
-        params.update(trx_params)
-        params['power'] = req['path-constraints']['te-bandwidth']['output-power']
-        params['nb_channel'] = req['path-constraints']['te-bandwidth']['max-nb-of-channel']
+    return Path_request(**params)
 
-        requests_list.append(Path_request(**params))
+def requests_from_json(json_data,equipment):
+    return [request_from_json(req, equipment) for req in json_data['path-request']]
 
-    return requests_list
+def disjunctions_from_json(json_data):
+    return [Disjunction(disjunction_id=snc['synchonization-id'],
+                        relaxable=snc['svec']['relaxable'],
+                        link_diverse=snc['svec']['link-diverse'],
+                        node_diverse=snc['svec']['node-diverse'],
+                        disjunctions_req=snc['svec']['request-id-number'])
+            for snc in json_data.get('synchronisation', [])]
 
+def requests_from_jsonl(filename, equipment):
+    """path requests of a JSONL file (one path-request object per line),
+    read as they are needed"""
+    with open(filename) as f:
+        for line in f:
+            if line.strip():
+                yield request_from_json(loads(line), equipment)
 
 def load_requests(filename,eqpt_filename):
     if filename.suffix.lower() == '.xls':
@@ -78,41 +102,159 @@ def load_requests(filename,eqpt_filename):
             json_data = loads(f.read())
     return json_data
 
-def compute_path(network, equipment, pathreqlist):
-
-    path_res_list = []
-
-    for pathreq in pathreqlist:
-        #need to rebuid the network for each path because the total power
-        #can be different and the choice of amplifiers in autodesign is power dependant
-        #but the design is the same if the total power is the same
-        #TODO parametrize the total spectrum power so the same design can be shared
-        p_db = lin2db(pathreq.power*1e3)
-        p_total_db = p_db + lin2db(pathreq.nb_channel)
-        build_network(network, equipment, p_db, p_total_db)
-        pathreq.nodes_list.append(pathreq.destination)
-        #we assume that the destination is a strict constraint
-        pathreq.loose_list.append('strict')
-        print(f'Computing path from {pathreq.source} to {pathreq.destination}')
-        print(f'with path constraint: {[pathreq.source]+pathreq.nodes_list}') #adding first node to be clearer on the output
-        total_path = compute_constrained_path(network, pathreq)
-        print(f'Computed path (roadms):{[e.uid for e in total_path  if isinstance(e, Roadm)]}\n')
-        # for debug
-        # print(f'{pathreq.baud_rate}   {pathreq.power}   {pathreq.spacing}   {pathreq.nb_channel}')
-        if total_path :
-            total_path = propagate(total_path,pathreq,equipment, show=False)
-        else:
-            total_path = []
-        # we record the last tranceiver object in order to have th whole
-        # information about spectrum. Important Note: since transceivers
-        # attached to roadms are actually logical elements to simulate
-        # performance, several demands having the same destination may use
-        # the same transponder for the performance simaulation. This is why
-        # we use deepcopy: to ensure each propagation is recorded and not
-        # overwritten
-
-        path_res_list.append(deepcopy(total_path))
-    return path_res_list
+def disjoint_routes(network, equipment, pathreqlist, disjunctions):
+    """routes (hop uids) of the requests of the disjunctions, computed
+    together on a designed copy of the network: the topology of a design
+    does not depend on the design powers. Requests of a disjunction that
+    cannot be satisfied get an empty route, unless it is relaxable: they
+    are then routed independently"""
+    pathreqs = {str(pathreq.request_id): pathreq for pathreq in pathreqlist}
+    disjunctions = [d for d in disjunctions if len(d.disjunctions_req) > 1]
+    if not disjunctions:
+        return {}
+    topology = deepcopy(network)
+    pref_ch_db = equipment['SI']['default'].power_dbm
+    build_network(topology, equipment, pref_ch_db, pref_ch_db + lin2db(pathreqlist[0].nb_channel))
+    graph = roadm_graph(topology)
+    routes = {}
+    for disjunction in disjunctions:
+        try:
+            reqs = [pathreqs[request_id] for request_id in disjunction.disjunctions_req]
+        except KeyError as e:
+            print(f'disjunction {disjunction.disjunction_id}: unknown request {e}')
+            continue
+        if any(pathreq.nodes_list or str(pathreq.request_id) in routes for pathreq in reqs):
+            print(f'disjunction {disjunction.disjunction_id}: requests with include constraints '
+                  'or in several disjunctions are routed independently')
+            continue
+        paths = compute_disjoint_paths(topology, reqs, disjunction, graph)
+        if paths is not None:
+            for pathreq in reqs:
+                routes[str(pathreq.request_id)] = tuple(el.uid for el in paths[pathreq.request_id])
+        elif disjunction.relaxable == 'False':
+            print(f'no disjoint paths for requests {disjunction.disjunctions_req}')
+            for pathreq in reqs:
+                routes[str(pathreq.request_id)] = ()
+    return routes
+
+def compute_request(network, equipment, designs, pathreq, route=None):
+    """design the network for the request powers, route and propagate it.
+    route: hop uids of the path computed beforehand (disjoint paths)"""
+    p_db = lin2db(pathreq.power*1e3)
+    p_total_db = p_db + lin2db(pathreq.nb_channel)
+    designs.design(p_db, p_total_db)
+    print(f'Computing path from {pathreq.source} to {pathreq.destination}')
+    print(f'with path constraint: {[pathreq.source]+pathreq.nodes_list}') #adding first node to be clearer on the output
+    if route is None:
+        # when the shortest path does not meet the transceiver OSNR, the next
+        # shortest paths are tried
+        total_path = compute_feasible_path(network, pathreq, equipment)
+    else:
+        index = network_index(network)
+        total_path = [index.nodes[uid] for uid in route]
+        if total_path:
+            total_path = propagate(total_path,pathreq,equipment, show=False,
+                                   cache=propagation_cache(network))
+    print(f'Computed path (roadms):{[e.uid for e in total_path  if isinstance(e, Roadm)]}\n')
+    # for debug
+    # print(f'{pathreq.baud_rate}   {pathreq.power}   {pathreq.spacing}   {pathreq.nb_channel}')
+    # we record the results of the last tranceiver object. Important Note:
+    # since transceivers attached to roadms are actually logical elements to
+    # simulate performance, several demands having the same destination may
+    # use the same transponder for the performance simaulation. This is why
+    # the results are copied: to ensure each propagation is recorded and not
+    # overwritten
+    return path_result(total_path)
+
+# requests read in advance by worker process
+CHUNK_PER_JOB = 16
+
+# network, equipment and designs of a worker process
+_worker = {}
+
+def _init_worker(network, equipment):
+    _worker.update(network=network, equipment=equipment,
+                   designs=DesignCache(network, equipment))
+
+def _compute_request_in_worker(args):
+    pathreq, route = args
+    # the output of the request is returned to be printed in request order
+    with redirect_stdout(StringIO()) as output:
+        total_path = compute_request(_worker['network'], _worker['equipment'],
+                                     _worker['designs'], pathreq, route)
+    return output.getvalue(), total_path
+
+def prepare_request(pathreq):
+    pathreq.nodes_list.append(pathreq.destination)
+    #we assume that the destination is a strict constraint
+    pathreq.loose_list.append('strict')
+    return pathreq
+
+def iter_compute_path(network, equipment, pathreqs, jobs=1, routes=None):
+    """compute the requests one after the other, or spread them over jobs
+    worker processes that each receive a copy of the network and equipment
+    once: a request result only depends on the request (see DesignCache)
+    so that both give the same results.
+    pathreqs can be any iterable: the requests are read, and their
+    (request, result) yielded in order, as the computation goes.
+    routes: {request id: hop uids} of the requests routed beforehand"""
+    pathreqs = (prepare_request(pathreq) for pathreq in pathreqs)
+    routes = routes or {}
+
+    if jobs > 1:
+        with Pool(jobs, initializer=_init_worker, initargs=(network, equipment)) as pool:
+            # the requests are dispatched by chunks so that only a few of
+            # them are read in advance
+            while True:
+                chunk = list(islice(pathreqs, jobs * CHUNK_PER_JOB))
+                if not chunk:
+                    break
+                args = [(pathreq, routes.get(str(pathreq.request_id))) for pathreq in chunk]
+                for pathreq, (output, total_path) in \
+                        zip(chunk, pool.imap(_compute_request_in_worker, args)):
+                    print(output, end='')
+                    yield pathreq, total_path
+        return
+
+    #the choice of amplifiers in autodesign is power dependant but the design
+    #is the same if the total power is the same: designs are computed once
+    #per power setting and restored for the next requests with the same powers
+    designs = DesignCache(network, equipment)
+    for pathreq in pathreqs:
+        yield pathreq, compute_request(network, equipment, designs, pathreq,
+                                       routes.get(str(pathreq.request_id)))
+
+def compute_path(network, equipment, pathreqlist, jobs=1, disjunctions=()):
+    jobs = min(jobs, len(pathreqlist))
+    routes = disjoint_routes(network, equipment, pathreqlist, disjunctions)
+    return [total_path for _, total_path in
+            iter_compute_path(network, equipment, pathreqlist, jobs, routes)]
+
+def stream_path(network, equipment, pathreqs, output=None, jobs=1):
+    """compute the requests and write every result as soon as it is known:
+    a line of the JSONL output file and a row of the CSV file"""
+    if output is None:
+        for pathreq, p in iter_compute_path(network, equipment, pathreqs, jobs):
+            print(' '.join(result_line(pathreq, p)))
+        return
+    fnamecsv = next(s for s in output.split('.')) + '.csv'
+    with open(output, 'w') as f, open(fnamecsv, 'w') as fcsv:
+        csvwriter = writer(fcsv)
+        csvwriter.writerow(CSV_HEADER)
+        for pathreq, p in iter_compute_path(network, equipment, pathreqs, jobs):
+            print(' '.join(result_line(pathreq, p)))
+            result = Result_element(pathreq, p).json
+            f.write(dumps(result) + '\n')
+            csvwriter.writerow(csv_row(result, equipment))
+            f.flush()
+            fcsv.flush()
+
+def result_line(pathreq, p):
+    if p:
+        return [f'{pathreq.source} to {pathreq.destination} : ', f'{round(mean(p.snr),2)}',\
+            f'{round(mean(p.snr+lin2db(pathreq.baud_rate/(12.5e9))),2)}',\
+            f'{pathreq.OSNR}']
+    return [f'no path from {pathreq.source} to {pathreq.destination} ']
 
 def path_result_json(pathresult):
     data = {
@@ -127,26 +269,25 @@ if __name__ == '__main__':
     logger.info(f'Computing path requests {args.service_filename} into JSON format')
     # for debug
     # print( args.eqpt_filename)
-    data = load_requests(args.service_filename,args.eqpt_filename)
     equipment = load_equipment(args.eqpt_filename)
     network = load_network(args.network_filename,equipment)
+    if args.service_filename.suffix.lower() == '.jsonl':
+        # streaming mode: results are written (in JSONL) as the requests are read
+        stream_path(network, equipment, requests_from_jsonl(args.service_filename, equipment),
+                    args.output, args.jobs)
+        exit()
+    data = load_requests(args.service_filename,args.eqpt_filename)
     pths = requests_from_json(data, equipment)
     print(pths)
-    test = compute_path(network, equipment, pths)
+    test = compute_path(network, equipment, pths, args.jobs, disjunctions_from_json(data))
 
     #TODO write results
 
     header = ['demand','snr@bandwidth','snr@0.1nm','Receiver minOSNR']
     data = []
     data.append(header)
-    for i, p in enumerate(test):
-        if p:
-            line = [f'{pths[i].source} to {pths[i].destination} : ', f'{round(mean(p[-1].snr),2)}',\
-                f'{round(mean(p[-1].snr+lin2db(pths[i].baud_rate/(12.5e9))),2)}',\
-                f'{pths[i].OSNR}']
-        else:
-            line = [f'no path from {pths[i].source} to {pths[i].destination} ']
-        data.append(line)
+    for pth, p in zip(pths, test):
+        data.append(result_line(pth, p))
 
     col_width = max(len(word) for row in data for word in row)   # padding
     for row in data:
@@ -156,10 +297,10 @@ if __name__ == '__main__':
 
     if args.output :
         result = []
-        for p in test:
-            result.append(Result_element(pths[test.index(p)],p))
+        for pth, p in zip(pths, test):
+            result.append(Result_element(pth,p))
         with open(args.output, 'w') as f:
             f.write(dumps(path_result_json(result), indent=2))
             fnamecsv = next(s for s in args.output.split('.')) + '.csv'
             with open(fnamecsv,"w") as fcsv :
-                jsontocsv(path_result_json(result),equipment,fcsv)
+                jsontocsv(result,equipment,fcsv)
@@ -0,0 +1,210 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+"""
+path_requests_server.py
+=======================
+
+Path computation service: the equipment library and the network are loaded
+once, and kept in memory with the designs and propagations of the
+previous requests. Requests are posted to a localhost HTTP server, in the
+JSON format read by path_requests_run.py, and answered with the path
+results it writes:
+
+    POST /path-request   {"path-request": [...], "synchronisation": [...]}
+    POST /reload         load the topology and equipment files again
+
+Requests are received concurrently, but the state of the service is not
+thread-safe: the designs, the propagation cache and the index are kept on
+the network itself. The requests of one state are thus read and routed one
+at a time (ServiceState.lock); with --jobs they are then computed by worker
+processes that each keep a copy of the network, otherwise they are also
+computed one at a time, on the network of the service. The computation
+messages are captured by redirecting the stdout of the process: one
+request at a time, whatever its state (during a reload).
+
+See: draft-ietf-teas-yang-path-computation-01.txt
+"""
+
+from argparse import ArgumentParser
+from pathlib import Path
+from logging import getLogger, basicConfig, CRITICAL, DEBUG, INFO
+from json import dumps, loads
+from copy import deepcopy
+from contextlib import redirect_stdout
+from io import StringIO
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from multiprocessing import get_context
+from threading import Condition, Lock
+from examples.path_requests_run import (requests_from_json, disjunctions_from_json, disjoint_routes,
+                                        prepare_request, compute_request, path_result_json,
+                                        _init_worker, _compute_request_in_worker)
+from gnpy.core.equipment import load_equipment
+from gnpy.core.network import load_network, DesignCache
+from gnpy.core.request import Result_element
+
+logger = getLogger(__name__)
+
+parser = ArgumentParser(description = 'A service that computes the path requests posted to it, with the network and equipment kept in memory.')
+parser.add_argument('network_filename', nargs='?', type = Path, default= Path(__file__).parent / 'meshTopologyExampleV2.xls')
+parser.add_argument('eqpt_filename', nargs='?', type = Path, default=Path(__file__).parent / 'eqpt_config.json')
+parser.add_argument('-v', '--verbose', action='count')
+parser.add_argument('-p', '--port', type=int, default=8080,
+                    help='port of the HTTP server, on localhost')
+parser.add_argument('-j', '--jobs', type=int, default=1,
+                    help='number of worker processes computing the requests')
+
+# sys.stdout is redirected by one request at a time, whatever its state
+_stdout_lock = Lock()
+
+
+class ServiceState:
+    """equipment, network and caches of the service, from one (re)load"""
+    def __init__(self, network_filename, eqpt_filename, jobs=1):
+        self.equipment = load_equipment(eqpt_filename)
+        self.network = load_network(network_filename, self.equipment)
+        # disjoint routes are computed on the network as loaded
+        self.topology = deepcopy(self.network)
+        # requests being computed with this state
+        self.users = 0
+        # serializes the requests on the network, topology and stdout
+        self.lock = Lock()
+        self.pool = None
+        if jobs > 1:
+            # workers are started, not forked from a process with threads
+            self.pool = get_context('spawn').Pool(jobs, initializer=_init_worker,
+                                                  initargs=(self.network, self.equipment))
+        else:
+            self.designs = DesignCache(self.network, self.equipment)
+
+    def __repr__(self):
+        return (f'{type(self).__name__}('
+                f'nodes={self.network.number_of_nodes()!r}, '
+                f'jobs={self.pool._processes if self.pool else 1!r}, '
+                f'users={self.users!r})')
+
+    def compute(self, pathreqs, routes):
+        """results of the prepared requests, in order"""
+        args = [(pathreq, routes.get(str(pathreq.request_id))) for pathreq in pathreqs]
+        if self.pool is not None:
+            results = list(self.pool.imap(_compute_request_in_worker, args))
+        else:
+            # the designs are set on the network itself: one request at a time
+            results = []
+            with self.lock:
+                for pathreq, route in args:
+                    with _stdout_lock, redirect_stdout(StringIO()) as output:
+                        total_path = compute_request(self.network, self.equipment, self.designs,
+                                                     pathreq, route)
+                    results.append((output.getvalue(), total_path))
+        for output, _ in results:
+            logger.debug(output)
+        return [total_path for _, total_path in results]
+
+    def close(self):
+        if self.pool is not None:
+            self.pool.close()
+            self.pool.join()
+
+
+class PathComputationService:
+    """path computation with the state of the last (re)load: a reload waits
+    for the requests computed with the previous state"""
+    def __init__(self, network_filename, eqpt_filename, jobs=1):
+        self.network_filename = network_filename
+        self.eqpt_filename = eqpt_filename
+        self.jobs = jobs
+        self.reloads = 0
+        self._condition = Condition()
+        self._state = ServiceState(network_filename, eqpt_filename, jobs)
+
+    def __repr__(self):
+        return (f'{type(self).__name__}('
+                f'network_filename={str(self.network_filename)!r}, '
+                f'eqpt_filename={str(self.eqpt_filename)!r}, '
+                f'state={self._state!r})')
+
+    def compute(self, json_data):
+        """path results (path_result_json) of the path requests of json_data"""
+        with self._condition:
+            state = self._state
+            state.users += 1
+        try:
+            with state.lock:
+                pathreqs = requests_from_json(json_data, state.equipment)
+                routes = disjoint_routes(state.topology, state.equipment, pathreqs,
+                                         disjunctions_from_json(json_data))
+            pathreqs = [prepare_request(pathreq) for pathreq in pathreqs]
+            paths = state.compute(pathreqs, routes)
+            return path_result_json([Result_element(pathreq, p) for pathreq, p in zip(pathreqs, paths)])
+        finally:
+            with self._condition:
+                state.users -= 1
+                self._condition.notify_all()
+
+    def reload(self):
+        """load the topology and equipment files again: the requests are
+        computed with the previous state until the new one is ready"""
+        state = ServiceState(self.network_filename, self.eqpt_filename, self.jobs)
+        with self._condition:
+            previous, self._state = self._state, state
+            self.reloads += 1
+            self._condition.wait_for(lambda: previous.users == 0)
+        previous.close()
+
+    def close(self):
+        self._state.close()
+
+
+class PathRequestHandler(BaseHTTPRequestHandler):
+    def _reply(self, code, data):
+        body = dumps(data, indent=2).encode()
+        self.send_response(code)
+        self.send_header('Content-Type', 'application/json')
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def do_POST(self):
+        service = self.server.service
+        body = self.rfile.read(int(self.headers.get('Content-Length', 0)))
+        if self.path == '/reload':
+            try:
+                service.reload()
+            except (Exception, SystemExit) as e:
+                # the previous state is kept
+                logger.critical(f'reload failed: {e!r}')
+                return self._reply(500, {'error': f'reload failed: {e!r}'})
+            return self._reply(200, {'reloads': service.reloads})
+        if self.path != '/path-request':
+            return self._reply(404, {'error': f'unknown command {self.path}'})
+        try:
+            result = service.compute(loads(body))
+        # path requests of the equipment library are checked with exit()
+        except (KeyError, TypeError, ValueError, SystemExit) as e:
+            return self._reply(400, {'error': f'invalid path request: {e!r}'})
+        self._reply(200, result)
+
+    def log_message(self, format, *args):
+        logger.info(format % args)
+
+
+class PathComputationServer(ThreadingHTTPServer):
+    def __init__(self, server_address, service):
+        super().__init__(server_address, PathRequestHandler)
+        self.service = service
+
+
+if __name__ == '__main__':
+    args = parser.parse_args()
+    basicConfig(level={2: DEBUG, 1: INFO, 0: CRITICAL}.get(args.verbose, CRITICAL))
+    service = PathComputationService(args.network_filename, args.eqpt_filename, args.jobs)
+    server = PathComputationServer(('127.0.0.1', args.port), service)
+    print(f'Computing path requests on http://127.0.0.1:{server.server_port}')
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.server_close()
+        service.close()
@@ -22,10 +22,10 @@ from numpy import arange, mean
 from matplotlib.pyplot import show, axis, figure, title
 from networkx import (draw_networkx_nodes, draw_networkx_edges,
                       draw_networkx_labels, dijkstra_path)
-from gnpy.core.network import load_network, build_network, save_network
+from gnpy.core.network import load_network, build_network, save_network, network_index
 from gnpy.core.elements import Transceiver, Fiber, Edfa, Roadm
 from gnpy.core.info import create_input_spectral_information, SpectralInformation, Channel, Power, Pref
-from gnpy.core.request import Path_request, RequestParams, compute_constrained_path, propagate
+from gnpy.core.request import Path_request, RequestParams, compute_constrained_path, propagate, propagate_power_sweep
 
 logger = getLogger(__name__)
 
@@ -77,7 +77,11 @@ def main(network, equipment, source, destination, req = None):
 
     pref_ch_db = lin2db(req.power*1e3) #reference channel power / span (SL=20dB)
     pref_total_db = pref_ch_db + lin2db(req.nb_channel) #reference total power / span (SL=20dB)
+    # a network loaded from its auto-design is not built nor saved again
+    designed = 'auto_design' in network.graph
     build_network(network, equipment, pref_ch_db, pref_total_db)
+    if not designed:
+        save_network(args.filename, network, equipment)
     path = compute_constrained_path(network, req)
 
     spans = [s.length for s in path if isinstance(s, Fiber)]
@@ -95,19 +99,15 @@ def main(network, equipment, source, destination, req = None):
         print('invalid power range definition in eqpt_config, should be power_range_db: [lower, upper, step]')
         power_range = [0]
 
-    for dp_db in power_range:
-        req.power = db2lin(pref_ch_db + dp_db)*1e-3
-        print(f'\nPropagating with input power = {lin2db(req.power*1e3):.2f}dBm :')
-        propagate(path, req, equipment, show=len(power_range)==1)
-        print(f'\nTransmission result for input power = {lin2db(req.power*1e3):.2f}dBm :')
-        print(destination)
-        simulation_data.append({
-                    'Pch_dBm'               : pref_ch_db + dp_db,
-                    'OSNR_ASE_0.1nm'        : round(mean(destination.osnr_ase_01nm),2),
-                    'OSNR_ASE_signal_bw'    : round(mean(destination.osnr_ase),2),
-                    'SNR_nli_signal_bw'     : round(mean(destination.osnr_nli),2),
-                    'SNR_total_signal_bw'   : round(mean(destination.snr),2)
-                            })
+    # all the power levels of the sweep are propagated in a single pass
+    powers_dbm = [pref_ch_db + dp_db for dp_db in power_range]
+    print(f'\nPropagating with input power = {", ".join(f"{p:.2f}" for p in powers_dbm)}dBm :')
+    simulation_data.extend(propagate_power_sweep(path, req, equipment, powers_dbm,
+                                                 show=len(power_range)==1))
+    for result in simulation_data:
+        print(f'\nTransmission result for input power = {result["Pch_dBm"]:.2f}dBm :')
+        print(type(destination).summary(destination.uid, result['OSNR_ASE_0.1nm'],
+                                        result['OSNR_ASE_signal_bw'], result['SNR_total_signal_bw']))
     write_csv(result_dicts, 'simulation_result.csv')
     return path
 
@@ -132,12 +132,18 @@ if __name__ == '__main__':
     basicConfig(level={0: ERROR, 1: INFO, 2: DEBUG}.get(args.verbose, ERROR))
 
     equipment = load_equipment(args.equipment)
+    trx_params = trx_mode_params(equipment)
+    if args.power:
+        trx_params['power'] = db2lin(float(args.power))*1e-3
     # logger.info(equipment)
     # print(args.filename)
-    network = load_network(args.filename, equipment)
+    # the design powers of main, to reuse the auto-design of a previous run
+    pref_ch_db = lin2db(trx_params['power']*1e3)
+    pref_total_db = pref_ch_db + lin2db(trx_params['nb_channel'])
+    network = load_network(args.filename, equipment, pref_ch_db, pref_total_db)
     # print(network)
 
-    transceivers = {n.uid: n for n in network.nodes() if isinstance(n, Transceiver)}
+    transceivers = dict(network_index(network).transceivers)
 
     if not transceivers:
         exit('Network has no transceivers!')
@@ -151,8 +157,8 @@ if __name__ == '__main__':
 
     if args.source:
         try:
-            source = next(transceivers[uid] for uid in transceivers if uid == args.source)
-        except StopIteration as e:
+            source = transceivers[args.source]
+        except KeyError as e:
             #TODO code a more advanced regex to find nodes match
             nodes_suggestion = [uid for uid in transceivers \
                 if args.source.lower() in uid.lower()]
@@ -168,8 +174,8 @@ if __name__ == '__main__':
 
     if args.destination:
         try:
-            destination = next(transceivers[uid] for uid in transceivers if uid == args.destination)
-        except StopIteration as e:
+            destination = transceivers[args.destination]
+        except KeyError as e:
             nodes_suggestion = [uid for uid in transceivers \
                 if args.destination.lower() in uid.lower()]
             destination = transceivers[nodes_suggestion[0]] \
@@ -193,13 +199,9 @@ if __name__ == '__main__':
     params['nodes_list'] = [destination.uid]
     params['loose_list'] = ['strict']
     params['format'] = ''
-    trx_params = trx_mode_params(equipment)
-    if args.power:
-        trx_params['power'] = db2lin(float(args.power))*1e-3
     params.update(trx_params)
     req = Path_request(**params)
     path = main(network, equipment, source, destination, req)
-    save_network(args.filename, network)
 
     if args.plot:
         plot_results(network, path, source, destination)
@@ -18,6 +18,9 @@ degree ≠ 2) will be automatically corrected.
 In the "Links" sheet, only the first three columns ("Node A", "Node Z" and
 "east Distance (km)") are mandatory.  Missing "west" information is copied from
 the "east" information so that it is possible to input undirected data.
+
+The JSON file is only generated again when the workbook is newer, or when it
+was generated by another version of the converter or with other regions.
 """
 
 from sys import exit
@@ -28,11 +31,17 @@ except ModuleNotFoundError:
 from argparse import ArgumentParser
 from collections import namedtuple, Counter, defaultdict
 from itertools import chain
-from json import dumps
+from json import dumps, load
+from os import getpid, replace
+from threading import get_ident
 from pathlib import Path
 
 all_rows = lambda sh, start=0: (sh.row(x) for x in range(start, sh.nrows))
 
+# version of the JSON generated by convert_file: to change when the
+# conversion gives another result for the same workbook
+CONVERTER_VERSION = 1
+
 class Node(namedtuple('Node', 'city state country region latitude longitude node_type')):
     def __new__(cls, city, state='', country='', region='', latitude=0, longitude=0, node_type='ILA'):
         values = [latitude, longitude, node_type]
@@ -72,6 +81,28 @@ class Eqpt(namedtuple('Eqpt', 'from_city to_city \
         values = [x[0] if x[0] != '' else x[1] for x in zip(values,default_values)]
         return super().__new__(cls, *values)
 
+CityIndex = namedtuple('CityIndex', 'nodes_by_city links_by_city eqpts_by_city \
+                                     link_by_cities eqpts_by_cities')
+
+def city_index(nodes, links, eqpts):
+    """lookups of the nodes, links and equipment by city, and of the link
+    and equipment by (from_city, to_city)"""
+    nodes_by_city = {n.city: n for n in nodes}
+    links_by_city = defaultdict(list)
+    # the first link between two cities, in both directions
+    link_by_cities = {}
+    for link in links:
+        links_by_city[link.from_city].append(link)
+        links_by_city[link.to_city].append(link)
+        link_by_cities.setdefault((link.from_city, link.to_city), link)
+        link_by_cities.setdefault((link.to_city, link.from_city), link)
+    eqpts_by_city = defaultdict(list)
+    eqpts_by_cities = defaultdict(list)
+    for eqpt in eqpts:
+        eqpts_by_city[eqpt.from_city].append(eqpt)
+        eqpts_by_cities[eqpt.from_city, eqpt.to_city].append(eqpt)
+    return CityIndex(nodes_by_city, links_by_city, eqpts_by_city, link_by_cities, eqpts_by_cities)
+
 def sanity_check(nodes, nodes_by_city, links_by_city, eqpts_by_city):
     try :
         test_nodes = [n for n in nodes_by_city if not n in links_by_city]
@@ -98,7 +129,31 @@ def sanity_check(nodes, nodes_by_city, links_by_city, eqpts_by_city):
             nodes = [n._replace(node_type='ROADM') if n.city==city else n for n in nodes]
     return nodes
 
+def json_filename(input_filename):
+    # output_json_file_name = input_filename.split(".")[0]+".json"
+    suffix_filename = str(input_filename.suffixes[0])
+    full_input_filename = str(input_filename)
+    split_filename = [full_input_filename[0:len(full_input_filename)-len(suffix_filename)] , suffix_filename[1:]]
+    return split_filename[0]+'.json'
+
+def converter_data(filter_region):
+    return {'version': CONVERTER_VERSION, 'filter_region': list(filter_region)}
+
+def is_converted(input_filename, output_filename, filter_region=[]):
+    """the JSON file is newer than the workbook and was generated by this
+    version of convert_file, with the same regions"""
+    try:
+        if Path(output_filename).stat().st_mtime_ns <= Path(input_filename).stat().st_mtime_ns:
+            return False
+        with open(output_filename) as f:
+            return load(f).get('converter') == converter_data(filter_region)
+    except (OSError, ValueError):
+        return False
+
 def convert_file(input_filename, filter_region=[]):
+    output_json_file_name = json_filename(input_filename)
+    if is_converted(input_filename, output_json_file_name, filter_region):
+        return output_json_file_name
     nodes, links, eqpts = parse_excel(input_filename)
 
     if filter_region:
@@ -109,21 +164,9 @@ def convert_file(input_filename, filter_region=[]):
         cities = {lnk.from_city for lnk in links} | {lnk.to_city for lnk in links}
         nodes = [n for n in nodes if n.city in cities]
 
-    global nodes_by_city
-    nodes_by_city = {n.city: n for n in nodes}
-
-    global links_by_city
-    links_by_city = defaultdict(list)
-    for link in links:
-        links_by_city[link.from_city].append(link)
-        links_by_city[link.to_city].append(link)
-
-    global eqpts_by_city
-    eqpts_by_city = defaultdict(list)
-    for eqpt in eqpts:
-        eqpts_by_city[eqpt.from_city].append(eqpt)
-
-    nodes = sanity_check(nodes, nodes_by_city, links_by_city, eqpts_by_city)
+    index = city_index(nodes, links, eqpts)
+    nodes_by_city = index.nodes_by_city
+    nodes = sanity_check(nodes, nodes_by_city, index.links_by_city, index.eqpts_by_city)
 
     data = {
         'elements':
@@ -202,7 +245,7 @@ def convert_file(input_filename, filter_region=[]):
               }
              for e in eqpts if e.ingress_amp_type.lower() != ''],
         'connections':
-            list(chain.from_iterable([eqpt_connection_by_city(n.city)
+            list(chain.from_iterable([eqpt_connection_by_city(index, n.city)
             for n in nodes]))
             +
             list(chain.from_iterable(zip(
@@ -211,17 +254,17 @@ def convert_file(input_filename, filter_region=[]):
              for x in nodes_by_city.values() if x.node_type.lower()=='roadm'],
             [{'from_node': f'roadm {x.city}',
               'to_node':   f'trx {x.city}'}
-             for x in nodes_by_city.values() if x.node_type.lower()=='roadm'])))
+             for x in nodes_by_city.values() if x.node_type.lower()=='roadm']))),
+        'converter': converter_data(filter_region)
     }
 
     #print(dumps(data, indent=2))
-    # output_json_file_name = input_filename.split(".")[0]+".json"
-    suffix_filename = str(input_filename.suffixes[0])
-    full_input_filename = str(input_filename)
-    split_filename = [full_input_filename[0:len(full_input_filename)-len(suffix_filename)] , suffix_filename[1:]]
-    output_json_file_name = split_filename[0]+'.json'
-    with  open(output_json_file_name,'w') as edfa_json_file:
+    # written aside then renamed: a concurrent conversion never reads a
+    # partial file
+    temporary_file_name = f'{output_json_file_name}.{getpid()}.{get_ident()}.tmp'
+    with  open(temporary_file_name,'w') as edfa_json_file:
         edfa_json_file.write(dumps(data, indent=2))
+    replace(temporary_file_name, output_json_file_name)
     return output_json_file_name
 
 def parse_excel(input_filename):
@@ -280,26 +323,26 @@ def parse_excel(input_filename):
     return nodes, links, eqpts
 
 
-def eqpt_connection_by_city(city_name):
-    other_cities = fiber_dest_from_source(city_name)
+def eqpt_connection_by_city(index, city_name):
+    other_cities = fiber_dest_from_source(index, city_name)
     subdata = []
-    if nodes_by_city[city_name].node_type.lower() in ('ila', 'fused'):
+    if index.nodes_by_city[city_name].node_type.lower() in ('ila', 'fused'):
         # Then len(other_cities) == 2
         direction = ['ingress', 'egress']
         for i in range(2):
-            from_ = fiber_link(other_cities[i], city_name)
-            in_ = eqpt_in_city_to_city(city_name, other_cities[0],direction[i])
-            to_ = fiber_link(city_name, other_cities[1-i])
+            from_ = fiber_link(index, other_cities[i], city_name)
+            in_ = eqpt_in_city_to_city(index, city_name, other_cities[0],direction[i])
+            to_ = fiber_link(index, city_name, other_cities[1-i])
             subdata += connect_eqpt(from_, in_, to_)
-    elif nodes_by_city[city_name].node_type.lower() == 'roadm':
+    elif index.nodes_by_city[city_name].node_type.lower() == 'roadm':
         for other_city in other_cities:
             from_ = f'roadm {city_name}'
-            in_ = eqpt_in_city_to_city(city_name, other_city)
-            to_ = fiber_link(city_name, other_city)
+            in_ = eqpt_in_city_to_city(index, city_name, other_city)
+            to_ = fiber_link(index, city_name, other_city)
             subdata += connect_eqpt(from_, in_, to_)
 
-            from_ = fiber_link(other_city, city_name)
-            in_ = eqpt_in_city_to_city(city_name, other_city, "ingress")
+            from_ = fiber_link(index, other_city, city_name)
+            in_ = eqpt_in_city_to_city(index, city_name, other_city, "ingress")
             to_ = f'roadm {city_name}'
             subdata += connect_eqpt(from_, in_, to_)
     return subdata
@@ -315,30 +358,33 @@ def connect_eqpt(from_, in_, to_):
     return connections
 
 
-def eqpt_in_city_to_city(in_city, to_city, direction='egress'):
+def eqpt_in_city_to_city(index, in_city, to_city, direction='egress'):
     rev_direction = 'ingress' if direction == 'egress' else 'egress'
     amp_direction = f'{direction}_amp_type'
     amp_rev_direction = f'{rev_direction}_amp_type'
+    node_type = index.nodes_by_city[in_city].node_type.lower()
     return_eqpt = ''
-    if in_city in eqpts_by_city:
-        for e in eqpts_by_city[in_city]:
-            if nodes_by_city[in_city].node_type.lower() == 'roadm':
-                if e.to_city == to_city and getattr(e, amp_direction) != '':
-                    return_eqpt = f'{direction} edfa in {e.from_city} to {e.to_city}'
-            elif nodes_by_city[in_city].node_type.lower() == 'ila':
-                if e.to_city != to_city:
-                    direction = rev_direction
-                    amp_direction = amp_rev_direction
-                if getattr(e, amp_direction) != '':
-                    return_eqpt = f'{direction} edfa in {e.from_city} to {e.to_city}'
-    if nodes_by_city[in_city].node_type.lower() == 'fused':
+    if node_type == 'roadm':
+        # the last equipment towards to_city with an amplifier in direction
+        for e in reversed(index.eqpts_by_cities.get((in_city, to_city), [])):
+            if getattr(e, amp_direction) != '':
+                return_eqpt = f'{direction} edfa in {e.from_city} to {e.to_city}'
+                break
+    elif node_type == 'ila':
+        for e in index.eqpts_by_city.get(in_city, []):
+            if e.to_city != to_city:
+                direction = rev_direction
+                amp_direction = amp_rev_direction
+            if getattr(e, amp_direction) != '':
+                return_eqpt = f'{direction} edfa in {e.from_city} to {e.to_city}'
+    if node_type == 'fused':
         return_eqpt = f'{direction} fused spans in {in_city}'
     return return_eqpt
 
 
-def fiber_dest_from_source(city_name):
+def fiber_dest_from_source(index, city_name):
     destinations = []
-    links_from_city = links_by_city[city_name]
+    links_from_city = index.links_by_city[city_name]
     for l in links_from_city:
         if l.from_city == city_name:
             destinations.append(l.to_city)
@@ -347,10 +393,8 @@ def fiber_dest_from_source(city_name):
     return destinations
 
 
-def fiber_link(from_city, to_city):
-    source_dest = (from_city, to_city)
-    link = links_by_city[from_city]
-    l = next(l for l in link if l.from_city in source_dest and l.to_city in source_dest)
+def fiber_link(index, from_city, to_city):
+    l = index.link_by_cities[from_city, to_city]
     if l.from_city == from_city:
         fiber = f'fiber ({l.from_city} → {l.to_city})-{l.east_cable}'
     else:
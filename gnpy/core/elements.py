@@ -18,15 +18,25 @@ Network elements MUST implement two attributes .uid and .name representing a
 unique identifier and a printable name.
 '''
 
-from numpy import abs, arange, arcsinh, array, exp
-from numpy import interp, log10, mean, pi, polyfit, polyval, sum
+from numpy import abs, arange, arcsinh, around, array, asarray, exp, float64, ndarray, newaxis, where
+from numpy import interp, log10, maximum, mean, minimum, pi, polyfit, polyval, sum
 from scipy.constants import c, h
-from collections import namedtuple
+from collections import namedtuple, OrderedDict
 
 from gnpy.core.node import Node
 from gnpy.core.units import UNITS
 from gnpy.core.utils import lin2db, db2lin, itufs
 
+def _power_sum(powers):
+    """total power of the WDM comb: a scalar for a single power level,
+    a column with one total per power level for a batched power sweep
+    (2-D powers: power level x channel)"""
+    return sum(powers, axis=-1, keepdims=powers.ndim > 1)
+
+def _round(value, ndigits):
+    """round() that also accepts the per power level arrays of a batched sweep"""
+    return around(value, ndigits) if isinstance(value, ndarray) else round(value, ndigits)
+
 class Transceiver(Node):
     def __init__(self, *args, **kwargs):
         super().__init__(*args, **kwargs)
@@ -37,20 +47,15 @@ class Transceiver(Node):
         self.passive = False
 
     def _calc_snr(self, spectral_info):
-        ase = [c.power.ase for c in spectral_info.carriers]
-        nli = [c.power.nli for c in spectral_info.carriers]
-        if min(ase) > 1e-20:
-            self.osnr_ase = [lin2db(c.power.signal/c.power.ase)
-                             for c in spectral_info.carriers]
-            ratio_01nm = [lin2db(12.5e9/c.baud_rate)
-                          for c in spectral_info.carriers]
-            self.osnr_ase_01nm = [ase - ratio for ase, ratio
-                                  in zip(self.osnr_ase, ratio_01nm)]
-        if min(nli) > 1e-20:
-            self.osnr_nli = [lin2db(c.power.signal/c.power.nli)
-                             for c in spectral_info.carriers]
-            self.snr = [lin2db(c.power.signal/(c.power.nli+c.power.ase))
-                        for c in spectral_info.carriers]
+        ase = spectral_info.ase
+        nli = spectral_info.nli
+        if ase.min() > 1e-20:
+            self.osnr_ase = lin2db(spectral_info.signal/ase)
+            ratio_01nm = lin2db(12.5e9/spectral_info.baud_rate)
+            self.osnr_ase_01nm = self.osnr_ase - ratio_01nm
+        if nli.min() > 1e-20:
+            self.osnr_nli = lin2db(spectral_info.signal/nli)
+            self.snr = lin2db(spectral_info.signal/(nli+ase))
 
 
     @property
@@ -78,8 +83,12 @@ class Transceiver(Node):
         osnr_ase = round(mean(self.osnr_ase),2)
         osnr_ase_01nm = round(mean(self.osnr_ase_01nm), 2)
 
-        return '\n'.join([f'{type(self).__name__} {self.uid}',
+        return self.summary(self.uid, osnr_ase_01nm, osnr_ase, snr)
 
+    @classmethod
+    def summary(cls, uid, osnr_ase_01nm, osnr_ase, snr):
+        """printed results of a transceiver, from its mean OSNR and SNR (dB)"""
+        return '\n'.join([f'{cls.__name__} {uid}',
                           f'  OSNR ASE (1nm):        {osnr_ase_01nm:.2f}',
                           f'  OSNR ASE (signal bw):  {osnr_ase:.2f}',
                           f'  SNR total (signal bw): {snr:.2f}'])
@@ -119,24 +128,21 @@ class Roadm(Node):
                           f'  loss (dB):     {self.loss:.2f}',
                           f'  pch out (dBm): {self.pch_out!r}'])
 
-    def propagate(self, *carriers):
+    def propagate(self, spectral_info):
         attenuation = db2lin(self.loss)
 
-        for carrier in carriers:
-            pwr = carrier.power
-            pwr = pwr._replace(signal=pwr.signal/attenuation,
-                               nonlinear_interference=pwr.nli/attenuation,
-                               amplified_spontaneous_emission=pwr.ase/attenuation)
-            yield carrier._replace(power=pwr)
+        return spectral_info.update(signal=spectral_info.signal/attenuation,
+                                    nli=spectral_info.nli/attenuation,
+                                    ase=spectral_info.ase/attenuation)
 
     def update_pref(self, pref):
-        self.pch_out = round(pref.pi - self.loss, 2)
+        self.pch_out = _round(pref.pi - self.loss, 2)
         return pref._replace(p_span0=pref.p0, p_spani=pref.pi - self.loss)
 
     def __call__(self, spectral_info):
-        carriers = tuple(self.propagate(*spectral_info.carriers))
+        si = self.propagate(spectral_info)
         pref = self.update_pref(spectral_info.pref)
-        return spectral_info.update(carriers=carriers, pref=pref)
+        return si.update(pref=pref)
 
 FusedParams = namedtuple('FusedParams', 'loss')
 
@@ -153,6 +159,7 @@ class Fused(Node):
     def to_json(self):
         return {'uid'       : self.uid,
                 'type'      : type(self).__name__,
+                'params'    : {'loss' : self.loss},
                 'metadata'      : {
                     'location': self.metadata['location']._asdict()
                                     }
@@ -165,23 +172,37 @@ class Fused(Node):
         return '\n'.join([f'{type(self).__name__} {self.uid}',
                           f'  loss (dB): {self.loss:.2f}'])
 
-    def propagate(self, *carriers):
+    def propagate(self, spectral_info):
         attenuation = db2lin(self.loss)
 
-        for carrier in carriers:
-            pwr = carrier.power
-            pwr = pwr._replace(signal=pwr.signal/attenuation,
-                               nonlinear_interference=pwr.nli/attenuation,
-                               amplified_spontaneous_emission=pwr.ase/attenuation)
-            yield carrier._replace(power=pwr)
+        return spectral_info.update(signal=spectral_info.signal/attenuation,
+                                    nli=spectral_info.nli/attenuation,
+                                    ase=spectral_info.ase/attenuation)
 
     def update_pref(self, pref):
         return pref._replace(p_span0=pref.p0, p_spani=pref.pi - self.loss)
 
     def __call__(self, spectral_info):
-        carriers = tuple(self.propagate(*spectral_info.carriers))
+        si = self.propagate(spectral_info)
         pref = self.update_pref(spectral_info.pref)
-        return spectral_info.update(carriers=carriers, pref=pref)
+        return si.update(pref=pref)
+
+NliCacheInfo = namedtuple('NliCacheInfo', 'hits misses maxsize currsize')
+
+# LRU cache of the psi matrices and eq. 120 prefactors: they only depend on
+# the fiber parameters and on the channel grid, not on the launch power, and
+# many spans share the same parameters once split_fiber has run
+NLI_CACHE_SIZE = 128
+_nli_cache = OrderedDict()
+_nli_cache_stats = {'hits': 0, 'misses': 0}
+
+def nli_cache_info():
+    return NliCacheInfo(_nli_cache_stats['hits'], _nli_cache_stats['misses'],
+                        NLI_CACHE_SIZE, len(_nli_cache))
+
+def nli_cache_clear():
+    _nli_cache.clear()
+    _nli_cache_stats.update(hits=0, misses=0)
 
 FiberParams = namedtuple('FiberParams', 'type_variety length loss_coef length_units \
                                          att_in con_in con_out dispersion gamma')
@@ -332,40 +353,114 @@ class Fiber(Node):
         carrier_nli = carrier.baud_rate * g_nli
         return carrier_nli
 
-    def propagate(self, *carriers):
+    def _nli_coefficients(self):
+        """ Returns the factors of eq. 120 and eq. 123 from arXiv:1209.0394
+        that only depend on the fiber parameters.
+        :return: psi_coef: pi**2 * asymptotic_length * abs(beta2)
+        :return: nli_coef: the (16 / 27) ... prefactor of eq. 120
+        """
+        asymptotic_length = self.asymptotic_length
+        beta2 = abs(self.beta2())
+        psi_coef = pi**2 * asymptotic_length * beta2
+        nli_coef = (16 / 27) * (self.gamma * self.effective_length)**2 \
+                   / (2 * pi * beta2 * asymptotic_length)
+        return psi_coef, nli_coef
+
+    def _psi_matrix(self, channel_numbers, frequencies, baud_rates, psi_coef=None):
+        """ Calculates eq. 123 from arXiv:1209.0394 for all the carrier pairs
+        of the WDM comb at once.
+        :param channel_numbers: numpy array of the carriers channel numbers
+        :param frequencies: numpy array of the carriers frequencies in Hz
+        :param baud_rates: numpy array of the carriers baud rates in Hz
+        :param psi_coef: precomputed factor, see _nli_coefficients
+        :return: psi[i, j], the psi value of carrier i under analysis
+                 with interfering carrier j (SCI on the diagonal, XCI elsewhere)
+        """
+        if psi_coef is None:
+            psi_coef, _ = self._nli_coefficients()
+        delta_f = frequencies[:, newaxis] - frequencies[newaxis, :]
+        xci = arcsinh(psi_coef * baud_rates[:, newaxis] * (delta_f + 0.5 * baud_rates[newaxis, :]))
+        xci -= arcsinh(psi_coef * baud_rates[:, newaxis] * (delta_f - 0.5 * baud_rates[newaxis, :]))
+        sci = arcsinh(0.5 * psi_coef * baud_rates**2)
+        same_channel = channel_numbers[:, newaxis] == channel_numbers[newaxis, :]
+        return where(same_channel, sci[:, newaxis], xci)
+
+    def _nli_matrix(self, channel_numbers, frequencies, baud_rates, coefficients=None):
+        """ Returns the psi matrix and the eq. 120 prefactor of this span for
+        the channel grid, looked up in the NLI cache shared by all the spans
+        with the same fiber parameters.
+        :param coefficients: precomputed (psi_coef, nli_coef), see _nli_coefficients
+        :return: psi, nli_coef
+        """
+        channel_numbers = asarray(channel_numbers, dtype=float64)
+        frequencies = asarray(frequencies, dtype=float64)
+        baud_rates = asarray(baud_rates, dtype=float64)
+        key = (self.type_variety, self.length, self.loss_coef, self.dispersion, self.gamma,
+               channel_numbers.tobytes(), frequencies.tobytes(), baud_rates.tobytes())
+        try:
+            _nli_cache.move_to_end(key)
+            _nli_cache_stats['hits'] += 1
+            return _nli_cache[key]
+        except KeyError:
+            _nli_cache_stats['misses'] += 1
+
+        psi_coef, nli_coef = coefficients if coefficients is not None \
+                             else self._nli_coefficients()
+        psi = self._psi_matrix(channel_numbers, frequencies, baud_rates, psi_coef)
+        psi.flags.writeable = False
+        _nli_cache[key] = psi, nli_coef
+        while len(_nli_cache) > NLI_CACHE_SIZE:
+            _nli_cache.popitem(last=False)
+        return psi, nli_coef
+
+    def _gn_analytic_vector(self, channel_numbers, frequencies, baud_rates, signals,
+                            coefficients=None):
+        """ Computes the nonlinear interference power on all the carriers of
+        the WDM comb with eq. 120 from arXiv:1209.0394, using the psi matrix
+        instead of iterating over every carrier pair as _gn_analytic does.
+        :param channel_numbers: numpy array of the carriers channel numbers
+        :param frequencies: numpy array of the carriers frequencies in Hz
+        :param baud_rates: numpy array of the carriers baud rates in Hz
+        :param signals: numpy array of the carriers signal powers in W
+        :param coefficients: precomputed (psi_coef, nli_coef), see _nli_coefficients
+        :return: carriers_nli: numpy array of nonlinear interference in W per carrier
+        """
+        psi, nli_coef = self._nli_matrix(channel_numbers, frequencies, baud_rates, coefficients)
+        # transpose so that a batch of power levels (2-D signals) is supported
+        g_nli = (psi @ ((signals / baud_rates)**2).T).T * (signals / baud_rates)
+        g_nli *= nli_coef
+
+        carriers_nli = baud_rates * g_nli
+        return carriers_nli
+
+    def propagate(self, spectral_info):
 
         # apply connector_att_in on all carriers before computing gn analytics  premiere partie pas bonne
         attenuation = db2lin(self.con_in + self.att_in)
+        signal = spectral_info.signal/attenuation
+        nli = spectral_info.nli/attenuation
+        ase = spectral_info.ase/attenuation
 
-        chan = []
-        for carrier in carriers:
-            pwr = carrier.power
-            pwr = pwr._replace(signal=pwr.signal/attenuation,
-                               nonlinear_interference=pwr.nli/attenuation,
-                               amplified_spontaneous_emission=pwr.ase/attenuation)
-            carrier = carrier._replace(power=pwr)
-            chan.append(carrier)
-
-        carriers = tuple(f for f in chan)
+        carriers_nli = self._gn_analytic_vector(spectral_info.channel_number,
+            spectral_info.frequency, spectral_info.baud_rate, signal)
 
         # propagate in the fiber and apply attenuation out
         attenuation = db2lin(self.con_out)
-        for carrier in carriers:
-            pwr = carrier.power
-            carrier_nli = self._gn_analytic(carrier, *carriers)
-            pwr = pwr._replace(signal=pwr.signal/self.lin_attenuation/attenuation,
-                               nonlinear_interference=(pwr.nli+carrier_nli)/self.lin_attenuation/attenuation,
-                               amplified_spontaneous_emission=pwr.ase/self.lin_attenuation/attenuation)
-            yield carrier._replace(power=pwr)
+        return spectral_info.update(signal=signal/self.lin_attenuation/attenuation,
+                                    nli=(nli+carriers_nli)/self.lin_attenuation/attenuation,
+                                    ase=ase/self.lin_attenuation/attenuation)
 
     def update_pref(self, pref):
-        self.pch_out = round(pref.pi - self.loss, 2)
+        self.pch_out = _round(pref.pi - self.loss, 2)
         return pref._replace(p_span0=pref.p0, p_spani=pref.pi - self.loss)
 
     def __call__(self, spectral_info):
-        carriers = tuple(self.propagate(*spectral_info.carriers))
+        si = self.propagate(spectral_info)
         pref = self.update_pref(spectral_info.pref)
-        return spectral_info.update(carriers=carriers, pref=pref)
+        return si.update(pref=pref)
+
+# number of channel grids memoized by each amplifier
+INTERPOL_CACHE_SIZE = 8
 
 class EdfaParams:
     def __init__(self, **params):
@@ -415,7 +510,9 @@ class Edfa(Node):
         self.interpol_dgt = None # interpolated dynamic gain tilt
         self.interpol_gain_ripple = None # gain ripple
         self.interpol_nf_ripple = None # nf_ripple
+        self.interpol_dgt_slope = None # slope of the dgt linear fit
         self.channel_freq = None # SI channel frequencies
+        self._interpol_cache = {} # interpolated vectors per channel grid
         # nf, gprofile, pin and pout attributes are set by interpol_params
         self.nf = None # dB edfa nf at operational.gain_target
         self.gprofile = None
@@ -478,42 +575,76 @@ class Edfa(Node):
         set the edfa class __init__ None parameters :
                 self.channel_freq, self.nf, self.interpol_dgt and self.interpol_gain_ripple
         """
-        # TODO|jla: read amplifier actual frequencies from additional params in json
-        amplifier_freq = itufs(0.05) * 1e12 # Hz
         self.channel_freq = frequencies
-        self.interpol_dgt = interp(self.channel_freq, amplifier_freq, self.params.dgt)
-        self.interpol_gain_ripple = interp(self.channel_freq, amplifier_freq, self.params.gain_ripple)
-        self.interpol_nf_ripple =interp(self.channel_freq, amplifier_freq, self.params.nf_ripple)
+        self.interpol_dgt, self.interpol_gain_ripple, self.interpol_nf_ripple, \
+            self.interpol_dgt_slope = self._interpol_grid(frequencies)
 
-        self.pin_db = lin2db(sum(pin*1e3))
+        self.pin_db = lin2db(_power_sum(pin*1e3))
         """check power saturation and correct target_gain accordingly:"""
 
         if self.dp_db is not None:
-            self.target_pch_db = round(self.dp_db + pref.p0, 2)
+            self.target_pch_db = _round(self.dp_db + pref.p0, 2)
             self.effective_gain = self.target_pch_db - pref.pi
-        
-        self.effective_gain = min(self.effective_gain, self.params.p_max - self.pin_db)
-        self.effective_pch_db = round(pref.pi + self.effective_gain, 2)
+
+        effective_gain = minimum(self.effective_gain, self.params.p_max - self.pin_db)
+        if self.dp_db is None and effective_gain.ndim:
+            # gain mode power sweep: a gain reduction due to saturation is kept
+            # for the next power levels, as when they are propagated one by one
+            effective_gain = minimum.accumulate(effective_gain, axis=0)
+        self.effective_gain = effective_gain
+        self.effective_pch_db = _round(pref.pi + self.effective_gain, 2)
 
         self.nf = self._calc_nf()
         self.gprofile = self._gain_profile(pin)
 
         pout = (pin + self.noise_profile(baud_rates))*db2lin(self.gprofile)
-        self.pout_db = lin2db(sum(pout*1e3))
+        self.pout_db = lin2db(_power_sum(pout*1e3))
         self.operational.gain_target = self.effective_gain
         # ase & nli are only calculated in signal bandwidth
         #    pout_db is not the absolute full output power (negligible if sufficient channels)
 
+    def _interpol_grid(self, frequencies):
+        """interpolate the edfa dgt, gain_ripple and nf_ripple vectors and
+        compute the dgt linear fit slope for a channel grid: they only depend
+        on the amplifier type_variety and on the channel frequencies, so they
+        are memoized for the power sweeps and requests reusing the same grid
+        """
+        frequencies = asarray(frequencies, dtype=float64)
+        key = (self.params.type_variety, frequencies.tobytes())
+        try:
+            return self._interpol_cache[key]
+        except KeyError:
+            pass
+
+        # TODO|jla: read amplifier actual frequencies from additional params in json
+        amplifier_freq = itufs(0.05) * 1e12 # Hz
+        interpol_dgt = interp(frequencies, amplifier_freq, self.params.dgt)
+        interpol_gain_ripple = interp(frequencies, amplifier_freq, self.params.gain_ripple)
+        interpol_nf_ripple = interp(frequencies, amplifier_freq, self.params.nf_ripple)
+        for vector in (interpol_dgt, interpol_gain_ripple, interpol_nf_ripple):
+            vector.flags.writeable = False
+
+        # linear fit to get the dgt slope
+        # TODO|jla: check what param should be used (currently length(dgt))
+        nb_channel = arange(len(interpol_dgt))
+        interpol_dgt_slope = polyfit(nb_channel, interpol_dgt, 1)[0]
+
+        if len(self._interpol_cache) >= INTERPOL_CACHE_SIZE:
+            del self._interpol_cache[next(iter(self._interpol_cache))]
+        self._interpol_cache[key] = interpol_dgt, interpol_gain_ripple, \
+                                    interpol_nf_ripple, interpol_dgt_slope
+        return self._interpol_cache[key]
+
     def _calc_nf(self, avg = False):
         """nf calculation based on 2 models: self.params.nf_model.enabled from json import:
         True => 2 stages amp modelling based on precalculated nf1, nf2 and delta_p in build_OA_json
         False => polynomial fit based on self.params.nf_fit_coeff"""
         # TODO|jla: TBD alarm rising or input VOA padding in case
         # gain_min > gain_target TBD:
-        pad = max(self.params.gain_min - self.effective_gain, 0)
+        pad = maximum(self.params.gain_min - self.effective_gain, 0)
         self.att_in = pad
         gain_target = self.effective_gain + pad
-        dg = max(self.params.gain_flatmax - gain_target, 0)
+        dg = maximum(self.params.gain_flatmax - gain_target, 0)
         if self.params.type_def == 'variable_gain':
             g1a = gain_target - self.params.nf_model.delta_p - dg
             nf_avg = lin2db(db2lin(self.params.nf_model.nf1) + db2lin(self.params.nf_model.nf2)/db2lin(g1a))
@@ -611,9 +742,8 @@ class Edfa(Node):
         # a way to determine if exceeding the gain or output power of the amp
         tot_in_power_db = self.pin_db # Pin in W
 
-        # linear fit to get the
-        p = polyfit(nb_channel, self.interpol_dgt, 1)
-        dgt_slope = p[0]
+        # linear fit to get the dgt slope: memoized in interpol_params
+        dgt_slope = self.interpol_dgt_slope
 
         # Calculate the target slope - currently assumes equal spaced channels
         # TODO|jla: support arbitrary channel spacing
@@ -641,13 +771,13 @@ class Edfa(Node):
         # second estimate of amp ch gain using the channel input profile
         g2nd = g1st - voa
 
-        pout_db = lin2db(sum(pin*1e3*db2lin(g2nd)))
+        pout_db = lin2db(_power_sum(pin*1e3*db2lin(g2nd)))
         dgts2 = self.effective_gain - (pout_db - tot_in_power_db)
 
         # center estimate of amp ch gain
         xcent = dgts2
         gcent = g1st - voa + array(self.interpol_dgt) * xcent
-        pout_db = lin2db(sum(pin*1e3*db2lin(gcent)))
+        pout_db = lin2db(_power_sum(pin*1e3*db2lin(gcent)))
         gavg_cent = pout_db - tot_in_power_db
 
         # Lower estimate of amp ch gain
@@ -659,52 +789,46 @@ class Edfa(Node):
 
         xlow = dgts2 - deltax
         glow = g1st - voa + array(self.interpol_dgt) * xlow
-        pout_db = lin2db(sum(pin * 1e3 * db2lin(glow)))
+        pout_db = lin2db(_power_sum(pin * 1e3 * db2lin(glow)))
         gavg_low = pout_db - tot_in_power_db
 
         # upper gain estimate
         xhigh = dgts2 + deltax
         ghigh = g1st - voa + array(self.interpol_dgt) * xhigh
-        pout_db = lin2db(sum(pin * 1e3 * db2lin(ghigh)))
+        pout_db = lin2db(_power_sum(pin * 1e3 * db2lin(ghigh)))
         gavg_high = pout_db - tot_in_power_db
 
         # compute slope
         slope1 = (gavg_low - gavg_cent) / (xlow - xcent)
         slope2 = (gavg_cent - gavg_high) / (xcent - xhigh)
 
-        if abs(self.effective_gain - gavg_cent) <= err_tolerance:
-            dgts3 = xcent
-        elif self.effective_gain < gavg_cent:
-            dgts3 = xcent - (gavg_cent - self.effective_gain) / slope1
-        else:
-            dgts3 = xcent + (-gavg_cent + self.effective_gain) / slope2
+        # element-wise choice to support one gain per power level
+        dgts3 = where(abs(self.effective_gain - gavg_cent) <= err_tolerance, xcent,
+                where(self.effective_gain < gavg_cent,
+                      xcent - (gavg_cent - self.effective_gain) / slope1,
+                      xcent + (-gavg_cent + self.effective_gain) / slope2))
 
         return g1st - voa + array(self.interpol_dgt) * dgts3
 
-    def propagate(self, pref, *carriers):
+    def propagate(self, spectral_info):
         """add ase noise to the propagating carriers of SpectralInformation"""
-        pin = array([c.power.signal+c.power.nli+c.power.ase for c in carriers]) # pin in W
-        freq = array([c.frequency for c in carriers])
-        brate = array([c.baud_rate for c in carriers])
+        pin = spectral_info.signal + spectral_info.nli + spectral_info.ase # pin in W
         # interpolate the amplifier vectors with the carriers freq, calculate nf & gain profile
-        self.interpol_params(freq, pin, brate, pref)
+        self.interpol_params(spectral_info.frequency, pin, spectral_info.baud_rate, spectral_info.pref)
 
         gains = db2lin(self.gprofile)
-        carrier_ases = self.noise_profile(brate)
+        carrier_ases = self.noise_profile(spectral_info.baud_rate)
         att = db2lin(self.operational.out_voa)
 
-        for gain, carrier_ase, carrier in zip(gains, carrier_ases, carriers):
-            pwr = carrier.power
-            pwr = pwr._replace(signal=pwr.signal*gain/att,
-                               nonlinear_interference=pwr.nli*gain/att,
-                               amplified_spontaneous_emission=(pwr.ase+carrier_ase)*gain/att)
-            yield carrier._replace(power=pwr)
+        return spectral_info.update(signal=spectral_info.signal*gains/att,
+                                    nli=spectral_info.nli*gains/att,
+                                    ase=(spectral_info.ase+carrier_ases)*gains/att)
 
     def update_pref(self, pref):
         return pref._replace(p_span0=pref.p0,
                             p_spani=pref.pi + self.effective_gain - self.operational.out_voa)
 
     def __call__(self, spectral_info):
-        carriers = tuple(self.propagate(spectral_info.pref, *spectral_info.carriers))
+        si = self.propagate(spectral_info)
         pref = self.update_pref(spectral_info.pref)
-        return spectral_info.update(carriers=carriers, pref=pref)
+        return si.update(pref=pref)
@@ -8,16 +8,28 @@ gnpy.core.equipment
 This module contains functionality for specifying equipment.
 '''
 
-from numpy import clip, polyval
+from numpy import array, clip, polyval, maximum, zeros, where
 from sys import exit
 from operator import itemgetter
 from math import isclose
 from pathlib import Path
-from json import loads
+from json import loads, dumps
+from hashlib import sha1
+from os import getpid, replace
+from pickle import dump, load, HIGHEST_PROTOCOL
+from logging import getLogger
+from threading import get_ident
 from gnpy.core.utils import lin2db, db2lin, load_json
-from collections import namedtuple
+from collections import namedtuple, OrderedDict
 from gnpy.core.elements import Edfa
 
+logger = getLogger(__name__)
+
+# equipment libraries whose amplifier noise figure table is kept
+MAX_NF_TABLES = 8
+# format of the pickled equipment libraries of load_equipment
+EQUIPMENT_CACHE_VERSION = 1
+
 Model_vg = namedtuple('Model_vg', 'nf1 nf2 delta_p')
 Model_fg = namedtuple('Model_fg', 'nf0')
 Fiber = namedtuple('Fiber', 'type_variety dispersion gamma')
@@ -144,6 +156,72 @@ def edfa_nf(gain_target, variety_type, equipment):
             })
     return amp._calc_nf(True)
 
+class EdfaNfTable:
+    """noise figure models of the amplifier varieties allowed for design,
+    as arrays (one item per variety in library order): the average noise
+    figure of all of them for a gain target is computed at once, with the
+    formulas of Edfa._calc_nf (see edfa_nf)"""
+    def __init__(self, edfa_dict):
+        self.amps = tuple(edfa_dict.items())
+        amps = [(variety, amp) for variety, amp in self.amps if amp.allowed_for_design]
+        self.varieties = [variety for variety, _ in amps]
+        self.gain_flatmax = array([amp.gain_flatmax for _, amp in amps], dtype=float)
+        self.gain_min = array([amp.gain_min for _, amp in amps], dtype=float)
+        self.p_max = array([amp.p_max for _, amp in amps], dtype=float)
+        self.variable_gain = array([amp.type_def == 'variable_gain' for _, amp in amps], dtype=bool)
+        self.fixed_gain = array([amp.type_def == 'fixed_gain' for _, amp in amps], dtype=bool)
+        polynomial = ~(self.variable_gain | self.fixed_gain)
+        def model(amp, field, kind):
+            return getattr(amp.nf_model, field) if amp.type_def == kind else 0
+        self.nf1 = array([model(amp, 'nf1', 'variable_gain') for _, amp in amps], dtype=float)
+        self.nf2 = array([model(amp, 'nf2', 'variable_gain') for _, amp in amps], dtype=float)
+        self.delta_p = array([model(amp, 'delta_p', 'variable_gain') for _, amp in amps], dtype=float)
+        self.nf0 = array([model(amp, 'nf0', 'fixed_gain') for _, amp in amps], dtype=float)
+        # polynomial fits, padded with leading zeros to the same degree
+        coeffs = [list(amp.nf_fit_coeff) if fit else [] for (_, amp), fit in zip(amps, polynomial)]
+        degree = max((len(c) for c in coeffs), default=0)
+        self.nf_fit_coeff = zeros((len(amps), degree))
+        for i, c in enumerate(coeffs):
+            if c:
+                self.nf_fit_coeff[i, degree-len(c):] = c
+
+    def __repr__(self):
+        return (f'{type(self).__name__}('
+                f'varieties={self.varieties!r})')
+
+    def is_valid(self, edfa_dict):
+        """the amplifiers of the library are the ones of the table"""
+        return len(self.amps) == len(edfa_dict) and \
+            all(variety in edfa_dict and edfa_dict[variety] is amp for variety, amp in self.amps)
+
+    def nf(self, gain_target):
+        """average noise figure (dB) of every variety for gain_target (dB)"""
+        pad = maximum(self.gain_min - gain_target, 0)
+        gain = gain_target + pad
+        dg = maximum(self.gain_flatmax - gain, 0)
+        g1a = gain - self.delta_p - dg
+        nf_vg = lin2db(db2lin(self.nf1) + db2lin(self.nf2)/db2lin(g1a))
+        nf_fit = zeros(len(dg))
+        for coeff in self.nf_fit_coeff.T:
+            nf_fit = nf_fit * -dg + coeff
+        nf_avg = where(self.variable_gain, nf_vg, where(self.fixed_gain, self.nf0, nf_fit))
+        return nf_avg + pad
+
+_nf_tables = OrderedDict()
+
+def edfa_nf_table(equipment):
+    """EdfaNfTable of the equipment amplifiers: computed once per library
+    (by load_equipment) and again if its amplifiers are changed"""
+    edfa_dict = equipment['Edfa']
+    _, table = _nf_tables.pop(id(edfa_dict), (None, None))
+    if table is None or not table.is_valid(edfa_dict):
+        table = EdfaNfTable(edfa_dict)
+    # the library is kept with its table: its id is not reused
+    _nf_tables[id(edfa_dict)] = edfa_dict, table
+    while len(_nf_tables) > MAX_NF_TABLES:
+        _nf_tables.popitem(last=False)
+    return table
+
 def trx_mode_params(equipment, trx_type_variety='', trx_mode='', error_message=False):
     """return the trx and SI parameters from eqpt_config for a given type_variety and mode (ie format)"""
     trx_params = {}
@@ -193,9 +271,103 @@ def automatic_spacing(baud_rate):
 def automatic_nch(f_min, f_max, spacing):
     return int((f_max - f_min)//spacing)
 
-def load_equipment(filename):
-    json_data = load_json(filename)
-    return equipment_from_json(json_data, filename)
+class ReadOnlyDict(dict):
+    """dict that cannot be modified: the equipment libraries of
+    load_equipment are shared by all its callers. A modified library is a
+    new one, eg {**equipment, 'Spans': {**equipment['Spans'], 'default': spans}}"""
+    def _read_only(self, *args, **kwargs):
+        raise TypeError(f'{type(self).__name__} cannot be modified')
+    __setitem__ = __delitem__ = __ior__ = _read_only
+    clear = pop = popitem = setdefault = update = _read_only
+
+    def __reduce__(self):
+        return type(self), (dict(self),)
+
+def read_only(equipment):
+    """equipment library whose types and varieties cannot be modified"""
+    return ReadOnlyDict((key, ReadOnlyDict(entries)) for key, entries in equipment.items())
+
+# resolved equipment filename: (equipment files, their stats, library)
+_libraries = {}
+
+def equipment_files(filename, json_data):
+    """filename and the amplifier configuration files its library refers to"""
+    parent = Path(filename).parent
+    files = [Path(filename)]
+    for entry in json_data.get('Edfa', []):
+        files.append(parent / entry.get('advanced_config_from_json', 'default_edfa_config.json'))
+    return list(dict.fromkeys(f.resolve() for f in files))
+
+def _stat(filename):
+    stat = Path(filename).stat()
+    return stat.st_mtime_ns, stat.st_size
+
+def _digest(filename):
+    with open(filename, 'rb') as f:
+        return sha1(f.read()).hexdigest()
+
+def _load_cache(cache_filename, filename):
+    """equipment files and library pickled to cache_filename, if the files
+    are unchanged since; None otherwise"""
+    try:
+        with open(cache_filename, 'rb') as f:
+            cache = load(f)
+        if cache['version'] != EQUIPMENT_CACHE_VERSION or cache['files'][0][0] != str(filename):
+            return None
+        if any(_digest(f) != digest for f, digest in cache['files']):
+            return None
+        return [Path(f) for f, _ in cache['files']], cache['equipment']
+    except Exception as e:
+        logger.info(f'equipment cache {cache_filename} not used: {e!r}')
+        return None
+
+def _save_cache(cache_filename, files, equipment):
+    cache = {'version': EQUIPMENT_CACHE_VERSION,
+             'files': [(str(f), _digest(f)) for f in files],
+             'equipment': equipment}
+    # written aside then renamed: concurrent readers never see a partial file
+    temporary_filename = f'{cache_filename}.{getpid()}.{get_ident()}.tmp'
+    with open(temporary_filename, 'wb') as f:
+        dump(cache, f, HIGHEST_PROTOCOL)
+    replace(temporary_filename, cache_filename)
+
+def load_equipment(filename, cache_filename=None):
+    """read-only equipment library of filename (eqpt_config.json). It is
+    loaded once per process, and returned again while filename and the
+    amplifier configuration files it refers to keep their modification time
+    and size.
+
+    With cache_filename, the library is also pickled to this file for the
+    next processes, that read it while the content of the equipment files
+    is unchanged (like any pickle, the file must be trusted)"""
+    filename = Path(filename).resolve()
+    cached = _libraries.get(filename)
+    if cached is not None:
+        files, stats, equipment = cached
+        try:
+            if [_stat(f) for f in files] == stats:
+                return equipment
+        except OSError:
+            pass
+    equipment = None
+    stat = _stat(filename)
+    if cache_filename is not None:
+        cached = _load_cache(cache_filename, filename)
+        if cached is not None:
+            files, equipment = cached
+            stats = [stat] + [_stat(f) for f in files[1:]]
+    if equipment is None:
+        json_data = load_json(filename)
+        files = equipment_files(filename, json_data)
+        # before reading them: a change during the load is seen next time
+        stats = [stat] + [_stat(f) for f in files[1:]]
+        equipment = read_only(equipment_from_json(json_data, filename))
+        if cache_filename is not None:
+            _save_cache(cache_filename, files, equipment)
+    if 'Edfa' in equipment:
+        edfa_nf_table(equipment)
+    _libraries[filename] = files, stats, equipment
+    return equipment
 
 def equipment_from_json(json_data, filename):
     """build global dictionnary eqpt_library that stores all eqpt characteristics:
@@ -222,3 +394,10 @@ def equipment_from_json(json_data, filename):
                     typ = lambda **kws: Amp.from_default_json(config, **kws)
             equipment[key][subkey] = typ(**entry)
     return equipment
+
+def equipment_fingerprint(equipment):
+    """digest of all the equipment characteristics: two equipment libraries
+    with the same fingerprint give the same network design"""
+    data = dumps(equipment, sort_keys=True,
+                 default=lambda obj: obj.tolist() if hasattr(obj, 'tolist') else repr(obj))
+    return sha1(data.encode()).hexdigest()
@@ -7,4 +7,350 @@ gnpy.core.execute
 
 This module contains functions for executing the propogation of
 spectral information on a `gnpy` network.
+
+A path (list of network elements) can be compiled into a pipeline of
+operators: consecutive flat losses (Roadm, Fused, and the connector, padding
+and lineic losses of a Fiber) are merged into a single attenuation, the fiber
+NLI factors are computed once per span, and the remaining elements (Edfa,
+Transceiver...) are called as usual. Running the pipeline fills in the same
+element state (pch_out, pin_db, snr...) as calling every element in turn.
+
+Paths that share their first elements can share the propagation of this
+prefix: a PropagationCache memoizes the spectral information after every
+operator in a trie, and a new path resumes from its longest cached prefix.
+A network keeps its own cache (see propagation_cache), that goes away with
+the network and is cleared when the network is designed again.
 '''
+
+from collections import OrderedDict, namedtuple
+from hashlib import sha1
+from sys import getsizeof
+from numpy import any, ndarray
+from gnpy.core.elements import Transceiver, Fiber, Edfa, Roadm, Fused
+from gnpy.core.utils import db2lin
+
+MAX_COMPILED_PATHS = 128
+PROPAGATION_CACHE_BYTES = 64 * 2**20
+
+# element attributes set by the propagation
+PROPAGATION_STATE = {
+    Transceiver: ('osnr_ase', 'osnr_ase_01nm', 'osnr_nli', 'snr'),
+    Roadm: ('loss', 'pch_out'),
+    Fiber: ('pch_out',),
+    Edfa: ('nf', 'gprofile', 'pin_db', 'pout_db', 'target_pch_db',
+           'effective_pch_db', 'effective_gain', 'att_in', 'channel_freq',
+           'interpol_dgt', 'interpol_gain_ripple', 'interpol_nf_ripple',
+           'interpol_dgt_slope'),
+}
+
+class _Attenuation:
+    """flat loss merged over a run of passive elements"""
+    def __init__(self):
+        self.loss = 0 # dB
+        self.elements = [] # elements whose pref is updated by this operator
+
+    def add(self, loss, element=None):
+        self.loss += loss
+        if element is not None:
+            self.elements.append(element)
+
+    def __bool__(self):
+        # losses are arrays (one per power level) in a batched power sweep
+        return bool(self.elements) or bool(any(self.loss != 0))
+
+    def hoist(self):
+        self.attenuation = db2lin(self.loss)
+        return self
+
+    @property
+    def key(self):
+        return 'loss', _comparable(self.loss), tuple(element_key(el) for el in self.elements)
+
+    def __call__(self, spectral_info):
+        pref = spectral_info.pref
+        for element in self.elements:
+            pref = element.update_pref(pref)
+        return spectral_info.update(signal=spectral_info.signal/self.attenuation,
+                                    nli=spectral_info.nli/self.attenuation,
+                                    ase=spectral_info.ase/self.attenuation,
+                                    pref=pref)
+
+class _NonLinearInterference:
+    """nli generated at the input of a fiber span"""
+    def __init__(self, fiber):
+        self.fiber = fiber
+        self.coefficients = fiber._nli_coefficients()
+        self.elements = ()
+
+    @property
+    def key(self):
+        return 'nli', element_key(self.fiber)
+
+    def __call__(self, spectral_info):
+        carriers_nli = self.fiber._gn_analytic_vector(spectral_info.channel_number,
+            spectral_info.frequency, spectral_info.baud_rate, spectral_info.signal,
+            self.coefficients)
+        return spectral_info.update(nli=spectral_info.nli+carriers_nli)
+
+def path_signature(path):
+    """loss parameters the compiled operators depend on: a compiled path
+    is outdated as soon as one of them changes (eg set_roadm_loss)"""
+    return tuple((el.con_in, el.att_in, el.loss, el.length) if isinstance(el, Fiber)
+                 else _comparable(el.loss) if isinstance(el, (Roadm, Fused))
+                 else None
+                 for el in path)
+
+def _comparable(loss):
+    # roadm losses are arrays (one per power level) in a batched power sweep
+    return loss.tobytes() if isinstance(loss, ndarray) else loss
+
+class CompiledPath:
+    def __init__(self, path):
+        self.path = tuple(path)
+        self.signature = path_signature(self.path)
+        operators = []
+        attenuation = _Attenuation()
+        for el in self.path:
+            if isinstance(el, (Roadm, Fused)):
+                attenuation.add(el.loss, el)
+            elif isinstance(el, Fiber):
+                attenuation.add(el.con_in + el.att_in)
+                if attenuation:
+                    operators.append(attenuation.hoist())
+                operators.append(_NonLinearInterference(el))
+                attenuation = _Attenuation()
+                attenuation.add(el.loss - el.con_in - el.att_in, el)
+            else:
+                if attenuation:
+                    operators.append(attenuation.hoist())
+                    attenuation = _Attenuation()
+                operators.append(el)
+        if attenuation:
+            operators.append(attenuation.hoist())
+        self.operators = tuple(operators)
+
+    def __repr__(self):
+        return (f'{type(self).__name__}('
+                f'elements={len(self.path)!r}, '
+                f'operators={len(self.operators)!r})')
+
+    def __call__(self, spectral_info, cache=None):
+        if cache is not None:
+            return cache.propagate(self, spectral_info)
+        for operator in self.operators:
+            spectral_info = operator(spectral_info)
+        return spectral_info
+
+def _compile(compiled_paths, path):
+    key = tuple(path)
+    compiled = compiled_paths.pop(key, None)
+    if compiled is None or compiled.signature != path_signature(key):
+        compiled = CompiledPath(key)
+    compiled_paths[key] = compiled
+    while len(compiled_paths) > MAX_COMPILED_PATHS:
+        compiled_paths.popitem(last=False)
+    return compiled
+
+def compile_path(path, cache=None):
+    """return the CompiledPath of path. With the PropagationCache of the
+    network of path (propagation_cache), the previous compilation is reused
+    while the path elements losses are unchanged: the compiled paths refer
+    to the elements, they are kept with the network rather than in the
+    module"""
+    return CompiledPath(path) if cache is None else cache.compile(path)
+
+def element_key(el):
+    """element and the settings the result of its propagation depends on"""
+    if isinstance(el, Fiber):
+        return el, (el.con_in, el.att_in, el.con_out, el.length)
+    if isinstance(el, (Roadm, Fused)):
+        return el, _comparable(el.loss)
+    if isinstance(el, Edfa):
+        # in gain mode, a gain reduced by saturation is kept for the next
+        # propagation: the effective gain is part of the amplifier settings
+        return el, (el.params.type_variety, el.operational.gain_target,
+                    el.operational.tilt_target, el.operational.out_voa, el.dp_db,
+                    _comparable(el.effective_gain) if el.dp_db is None else None)
+    return el, None
+
+def _operator_key(operator):
+    return operator.key if isinstance(operator, (_Attenuation, _NonLinearInterference)) \
+        else element_key(operator)
+
+def _operator_elements(operator):
+    return operator.elements if isinstance(operator, (_Attenuation, _NonLinearInterference)) \
+        else (operator,)
+
+def propagation_state(elements):
+    """the attributes set by the propagation of elements, to be restored
+    with restore_propagation_state"""
+    return tuple((el, {attr: getattr(el, attr) for attr in PROPAGATION_STATE.get(type(el), ())},
+                  el.operational.gain_target if isinstance(el, Edfa) else None)
+                 for el in elements)
+
+def restore_propagation_state(state):
+    for el, attrs, gain_target in state:
+        for attr, value in attrs.items():
+            setattr(el, attr, value)
+        if isinstance(el, Edfa):
+            el.operational.gain_target = gain_target
+
+def _nbytes(values):
+    return sum(v.nbytes for v in values if isinstance(v, ndarray))
+
+def _key_nbytes(key):
+    """memory held by an operator key: its tuples and values, the elements
+    it refers to are part of the network"""
+    if isinstance(key, tuple):
+        return getsizeof(key) + sum(_key_nbytes(k) for k in key)
+    if isinstance(key, ndarray):
+        return getsizeof(key) + key.nbytes
+    if isinstance(key, (str, bytes, int, float)):
+        return getsizeof(key)
+    return 0
+
+def _state_nbytes(state):
+    """memory held by a propagation_state"""
+    nbytes = getsizeof(state)
+    for el_state in state:
+        attrs = el_state[1]
+        nbytes += getsizeof(el_state) + getsizeof(attrs) + \
+            sum(v.nbytes if isinstance(v, ndarray) else getsizeof(v) for v in attrs.values())
+    return nbytes
+
+def _fingerprint(spectral_info):
+    digest = sha1()
+    for field in spectral_info._FIELDS:
+        digest.update(getattr(spectral_info, field).tobytes())
+    return spectral_info.pref, digest.digest()
+
+class _PrefixNode:
+    __slots__ = ('parent', 'key', 'children', 'spectral_info', 'state', 'nbytes')
+
+    def __init__(self, parent, key, spectral_info=None, state=()):
+        self.parent = parent
+        self.key = key
+        self.children = {}
+        self.spectral_info = spectral_info
+        self.state = state
+        # the node itself, its key and the element state it records
+        self.nbytes = getsizeof(self) + getsizeof(self.children) + _key_nbytes(key) + \
+            _state_nbytes(state)
+        if spectral_info is not None:
+            self.nbytes += getsizeof(spectral_info) + \
+                _nbytes((spectral_info.signal, spectral_info.nli, spectral_info.ase))
+
+PropagationCacheInfo = namedtuple('PropagationCacheInfo', 'hits misses evictions nbytes maxbytes')
+
+class PropagationCache:
+    """trie of the spectral information after each operator of the propagated
+    paths, for each input spectral information.
+
+    An operator is identified by its elements and their settings
+    (element_key): entries become unreachable as soon as an element setting
+    changes (eg set_roadm_loss, DesignCache) and are evicted, least
+    recently used first, when the memory they hold (arrays, keys and
+    recorded element state) exceeds maxbytes. The element state recorded
+    after each operator is restored when a cached prefix is reused.
+
+    The keys refer to the elements of one network: use the cache of the
+    network (propagation_cache). A copy of the cache (deepcopy, pickle) is
+    empty, like the cache of a copy of the network."""
+    def __init__(self, maxbytes=PROPAGATION_CACHE_BYTES):
+        self.maxbytes = maxbytes
+        self.clear()
+
+    def __repr__(self):
+        return (f'{type(self).__name__}('
+                f'nodes={len(self._nodes)!r}, '
+                f'nbytes={self.nbytes!r}, '
+                f'maxbytes={self.maxbytes!r})')
+
+    def __reduce__(self):
+        return type(self), (self.maxbytes,)
+
+    def clear(self):
+        self._compiled_paths = OrderedDict()
+        self._roots = {}
+        self._nodes = OrderedDict() # least recently used first
+        self.nbytes = 0
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    def cache_info(self):
+        return PropagationCacheInfo(self.hits, self.misses, self.evictions,
+                                    self.nbytes, self.maxbytes)
+
+    def compile(self, path):
+        """the CompiledPath of path, reusing the previous compilation while
+        the path elements losses are unchanged"""
+        return _compile(self._compiled_paths, path)
+
+    def propagate(self, compiled, spectral_info):
+        fingerprint = _fingerprint(spectral_info)
+        node = self._roots.get(fingerprint)
+        if node is None:
+            node = self._roots[fingerprint] = _PrefixNode(None, fingerprint)
+            self._nodes[id(node)] = node
+            self.nbytes += node.nbytes
+        visited = [node]
+        operators = iter(compiled.operators)
+        for operator in operators:
+            key = _operator_key(operator)
+            child = node.children.get(key)
+            if child is None:
+                break
+            # restored at once: the key of the next operators depends on it
+            restore_propagation_state(child.state)
+            node = child
+            visited.append(node)
+            self.hits += 1
+        else:
+            key = None
+        if node.spectral_info is not None:
+            spectral_info = node.spectral_info
+
+        while key is not None:
+            spectral_info = operator(spectral_info)
+            child = _PrefixNode(node, key, spectral_info, propagation_state(_operator_elements(operator)))
+            node.children[key] = child
+            self._nodes[id(child)] = child
+            self.nbytes += child.nbytes
+            node = child
+            visited.append(node)
+            self.misses += 1
+            operator = next(operators, None)
+            key = None if operator is None else _operator_key(operator)
+
+        # the ancestors are more recently used than their descendants
+        for node in reversed(visited):
+            self._nodes.move_to_end(id(node))
+        while self.nbytes > self.maxbytes and self._nodes:
+            self._evict(next(iter(self._nodes.values())))
+        return spectral_info
+
+    def _evict(self, node):
+        if node.parent is None:
+            del self._roots[node.key]
+        else:
+            del node.parent.children[node.key]
+        stack = [node]
+        while stack:
+            node = stack.pop()
+            stack.extend(node.children.values())
+            del self._nodes[id(node)]
+            self.nbytes -= node.nbytes
+            self.evictions += 1
+
+def propagation_cache(network):
+    """return the PropagationCache of the paths of network, created once and
+    kept with the graph until clear_propagation_cache is called"""
+    cache = network.graph.get('propagation_cache')
+    if cache is None:
+        cache = network.graph['propagation_cache'] = PropagationCache()
+    return cache
+
+def clear_propagation_cache(network):
+    """drop the PropagationCache of network, after it was designed again"""
+    network.graph.pop('propagation_cache', None)
@@ -10,7 +10,8 @@ This module contains classes for modelling SpectralInformation.
 
 
 from collections import namedtuple
-from numpy import array
+from copy import copy
+from numpy import arange, array, ascontiguousarray, float64, full, ndarray, ndim, ones, zeros
 from gnpy.core.utils import lin2db
 from json import loads
 from gnpy.core.utils import load_json
@@ -46,10 +47,86 @@ class Pref(namedtuple('Pref', 'p_span0, p_spani'), ConvenienceAccess):
     _ABBREVS = {'p0' :  'p_span0',
                 'pi' :  'p_spani'}
 
-class SpectralInformation(namedtuple('SpectralInformation', 'pref carriers'), ConvenienceAccess):
+def _as_array(values, dtype=float64):
+    """contiguous read-only view of values, shared with the caller when no
+    conversion is needed"""
+    values = ascontiguousarray(values, dtype=dtype).view()
+    values.flags.writeable = False
+    return values
 
-    def __new__(cls, pref=Pref(0, 0), *carriers):
-        return super().__new__(cls, pref, carriers)
+class SpectralInformation(ConvenienceAccess):
+    """Spectral information stored as a struct of arrays: one contiguous
+    float64 array per carrier field (frequency, baud rate, roll-off, signal,
+    nli and ase powers) instead of a tuple of Channel namedtuples, so that
+    network elements can propagate the whole WDM comb with array arithmetic.
+
+    The .carriers property is a compatibility view that still returns the
+    WDM comb as a tuple of Channel namedtuples, and .update(carriers=...)
+    still accepts such a sequence. It is not available for the spectral
+    information of a batched power sweep (2-D powers).
+    """
+
+    _FIELDS = ('channel_number', 'frequency', 'baud_rate', 'roll_off', 'signal',
+               'nonlinear_interference', 'amplified_spontaneous_emission')
+
+    _ABBREVS = {'channel':  'channel_number',
+                'num_chan': 'channel_number',
+                'ffs':      'frequency',
+                'freq':     'frequency',
+                'nli':      'nonlinear_interference',
+                'ase':      'amplified_spontaneous_emission',}
+
+    def __init__(self, pref=Pref(0, 0), *carriers):
+        self.pref = pref
+        self._set_carriers(carriers)
+
+    @classmethod
+    def from_arrays(cls, pref, channel_number, frequency, baud_rate, roll_off,
+                    signal, nli, ase):
+        return cls(pref)._replace(channel_number=channel_number,
+            frequency=frequency, baud_rate=baud_rate, roll_off=roll_off,
+            signal=signal, nonlinear_interference=nli,
+            amplified_spontaneous_emission=ase)
+
+    def _set_carriers(self, carriers):
+        carriers = tuple(carriers)
+        self.channel_number = _as_array([c.channel_number for c in carriers], int)
+        self.frequency = _as_array([c.frequency for c in carriers])
+        self.baud_rate = _as_array([c.baud_rate for c in carriers])
+        self.roll_off = _as_array([c.roll_off for c in carriers])
+        self.signal = _as_array([c.power.signal for c in carriers])
+        self.nonlinear_interference = _as_array([c.power.nli for c in carriers])
+        self.amplified_spontaneous_emission = _as_array([c.power.ase for c in carriers])
+
+    def _replace(self, **kwargs):
+        si = copy(self)
+        if 'carriers' in kwargs:
+            si._set_carriers(kwargs.pop('carriers'))
+        if 'pref' in kwargs:
+            si.pref = kwargs.pop('pref')
+        for field, values in kwargs.items():
+            if field not in self._FIELDS:
+                raise ValueError(f'Got unexpected field name: {field!r}')
+            setattr(si, field, _as_array(values, int if field == 'channel_number' else float64))
+        return si
+
+    @property
+    def carriers(self):
+        if self.signal.ndim > 1:
+            # a Channel holds the powers of one power level
+            raise ValueError('carriers of a batched power sweep: '
+                             f'{len(self.signal)} power levels')
+        return tuple(Channel(n, f, b, r, Power(s, nli, ase))
+                     for n, f, b, r, s, nli, ase
+                     in zip(*(getattr(self, field).tolist() for field in self._FIELDS)))
+
+    def __len__(self):
+        return len(self.frequency)
+
+    def __repr__(self):
+        return (f'{type(self).__name__}('
+                f'pref={self.pref!r}, '
+                f'nb_channel={len(self)!r})')
 
 def merge_input_spectral_information(*si):
     """mix channel combs of different baud rates and power"""
@@ -57,13 +134,24 @@ def merge_input_spectral_information(*si):
     pass
 
 def create_input_spectral_information(f_min, roll_off, baud_rate, power, spacing, nb_channel):
+    """power is the channel power in W. It can also be a sequence of channel
+    powers for a power sweep: the power arrays then have one row per power
+    level (power level x channel) and pref one row per power level."""
+    if isinstance(power, (list, tuple, ndarray)):
+        power = array(power, dtype=float64).reshape(-1, 1)
     # pref in dB : convert power lin into power in dB
     pref = lin2db(power * 1e3)
-    si = SpectralInformation(pref=Pref(pref, pref))
-    si = si.update(carriers=[
-            Channel(f, (f_min+spacing*f),
-            baud_rate, roll_off, Power(power, 0, 0)) for f in range(1,nb_channel+1)
-            ])
+    channel_number = arange(1, nb_channel+1)
+    signal = full(nb_channel, power) if ndim(power) == 0 \
+             else power * ones(nb_channel)
+    si = SpectralInformation.from_arrays(pref=Pref(pref, pref),
+            channel_number=channel_number,
+            frequency=f_min+spacing*channel_number,
+            baud_rate=full(nb_channel, baud_rate),
+            roll_off=full(nb_channel, roll_off),
+            signal=signal,
+            nli=zeros(signal.shape),
+            ase=zeros(signal.shape))
     return si
 
 
@@ -10,64 +10,169 @@ This module contains functions for constructing networks of network elements.
 
 from gnpy.core.convert import convert_file
 from networkx import DiGraph
-from numpy import arange
+from numpy import arange, argmin, inf, minimum, where
 from logging import getLogger
 from os import path
+from re import fullmatch
 from operator import itemgetter
 from gnpy.core import elements
 from gnpy.core.elements import Fiber, Edfa, Transceiver, Roadm, Fused
-from gnpy.core.equipment import edfa_nf
+from gnpy.core.equipment import edfa_nf_table, equipment_fingerprint
+from gnpy.core.execute import clear_propagation_cache
+from gnpy.core.snapshot import save_snapshot, read_snapshot, snapshot_network
+from gnpy.core.topology import Topology
 from gnpy.core.units import UNITS
 from gnpy.core.utils import load_json, save_json, round2float, db2lin, lin2db
 from sys import exit
 from collections import namedtuple
+from bisect import bisect_left
+from itertools import chain
+from copy import deepcopy
+from hashlib import sha1
+from json import dumps
 
 logger = getLogger(__name__)
 
-def load_network(filename, equipment):
+def load_network(filename, equipment, pref_ch_db=None, pref_total_db=None):
+    """network of the topology file (.xls, .json or a .npz snapshot saved
+    by save_network): with the design powers, the auto-design saved by
+    save_network is loaded instead when it was made from the same topology
+    file and equipment library (see load_auto_design)"""
+    if pref_ch_db is not None:
+        network = load_auto_design(filename, equipment, pref_ch_db, pref_total_db)
+        if network is not None:
+            logger.info(f'Loading the auto-design of {filename}')
+            return network
     json_filename = ''
     if filename.suffix.lower() == '.xls':
         logger.info('Automatically generating topology JSON file')
         json_filename = convert_file(filename)
     elif filename.suffix.lower() == '.json':
         json_filename = filename
+    elif filename.suffix.lower() == '.npz':
+        return snapshot_network(read_snapshot(filename), equipment)
     else:
         raise ValueError(f'unsuported topology filename extension {filename.suffix.lower()}')
     json_data = load_json(json_filename)
     return network_from_json(json_data, equipment)
 
-def save_network(filename, network):
-    filename_output = path.splitext(filename)[0] + '_auto_design.json'
+def auto_design_filename(filename, extension='.json'):
+    return path.splitext(filename)[0] + '_auto_design' + extension
+
+def file_fingerprint(filename):
+    """digest of the content of a file"""
+    with open(filename, 'rb') as f:
+        return sha1(f.read()).hexdigest()
+
+def design_parameters(equipment, pref_ch_db, pref_total_db, fingerprint=None):
+    """inputs of build_network, other than the topology. fingerprint: the
+    equipment_fingerprint of equipment, if already known"""
+    if fingerprint is None:
+        fingerprint = equipment_fingerprint(equipment)
+    return {'equipment': fingerprint,
+            'pref_ch_db': float(pref_ch_db),
+            'pref_total_db': float(pref_total_db)}
+
+def _json_number(value):
+    # numpy scalars are saved as the python number they hold
+    return value.item() if hasattr(value, 'item') else value
+
+def save_network(filename, network, equipment=None):
+    """save the network to <filename>_auto_design.json. A network designed by
+    build_network is saved with the fingerprint of the topology file and the
+    design parameters, for load_auto_design. With its equipment library, the
+    network is also saved to the binary snapshot <filename>_auto_design.npz
+    (see gnpy.core.snapshot), that load_auto_design reads first"""
+    filename_output = auto_design_filename(filename)
     json_data = network_to_json(network)
+    design = network.graph.get('auto_design')
+    if design is not None:
+        design = {'topology': file_fingerprint(filename), **design}
+        # amplifier settings of the design that are not part of the topology
+        amplifiers = {n.uid: {'delta_p': _json_number(n.dp_db),
+                              'effective_gain': _json_number(n.effective_gain)}
+                      for n in network if isinstance(n, Edfa)}
+        json_data['auto_design'] = {**design, 'amplifiers': amplifiers}
     save_json(json_data, filename_output)
+    if equipment is not None:
+        save_snapshot(auto_design_filename(filename, '.npz'), network, equipment, design)
 
-def network_from_json(json_data, equipment):
+def load_auto_design(filename, equipment, pref_ch_db, pref_total_db):
+    """the network saved by save_network after build_network, if it was
+    designed from the current content of the topology file, with the same
+    equipment library and design powers; None otherwise. The network is
+    marked as designed: build_network with the same parameters leaves it
+    unchanged. The binary snapshot of the auto-design is read if there is
+    one, the JSON file otherwise"""
+    expected = {'topology': file_fingerprint(filename),
+                **design_parameters(equipment, pref_ch_db, pref_total_db)}
+    def outdated(design):
+        return design is None or any(design.get(k) != v for k, v in expected.items())
+    snapshot_filename = auto_design_filename(filename, '.npz')
+    if path.isfile(snapshot_filename):
+        snapshot = read_snapshot(snapshot_filename)
+        if not outdated(snapshot.header['auto_design']):
+            network = snapshot_network(snapshot, equipment)
+            network_index(network)
+            return network
+        logger.info(f'{snapshot_filename} is outdated')
+    design_filename = auto_design_filename(filename)
+    if not path.isfile(design_filename):
+        return None
+    json_data = load_json(design_filename)
+    design = json_data.get('auto_design')
+    if outdated(design):
+        logger.info(f'{design_filename} is outdated')
+        return None
+    network = network_from_json(json_data, equipment)
+    amplifiers = design['amplifiers']
+    for node in network:
+        if isinstance(node, Edfa) and node.uid in amplifiers:
+            node.dp_db = amplifiers[node.uid]['delta_p']
+            node.effective_gain = amplifiers[node.uid]['effective_gain']
+    network.graph['auto_design'] = design_parameters(equipment, pref_ch_db, pref_total_db)
+    network_index(network)
+    return network
+
+def network_from_json(json_data, equipment, backend='networkx'):
+    """network of the elements and connections of json_data: a
+    networkx.DiGraph, or with backend='csr' a compact Topology (that can
+    be routed and propagated, but not designed)"""
     # NOTE|dutc: we could use the following, but it would tie our data format
     #            too closely to the graph library
     # from networkx import node_link_graph
+    elements_list = [element_from_json(el_config, equipment) for el_config in json_data['elements']]
+
+    nodes = {k.uid: k for k in elements_list}
+    connections = [(nodes[cx['from_node']], nodes[cx['to_node']])
+                   for cx in json_data['connections']]
+
+    if backend == 'csr':
+        return Topology(elements_list, connections)
+    if backend != 'networkx':
+        raise ValueError(f'unknown network backend {backend!r}')
     g = DiGraph()
-    for el_config in json_data['elements']:
-        typ = el_config.pop('type')
-        variety = el_config.pop('type_variety', 'default')
-        if typ in equipment and variety in equipment[typ]:
-            extra_params = equipment[typ][variety]
-            el_config.setdefault('params', {}).update(extra_params._asdict())
-        elif typ in ['Edfa', 'Fiber']: #catch it now because the code will crash later!
-            print( f'The {typ} of variety type {variety} was not recognized:'
-                    '\nplease check it is properly defined in the eqpt_config json file')
-            exit()
-        cls = getattr(elements, typ)
-        el = cls(**el_config)
-        g.add_node(el)
-
-    nodes = {k.uid: k for k in g.nodes()}
-
-    for cx in json_data['connections']:
-        from_node, to_node = cx['from_node'], cx['to_node']
-        g.add_edge(nodes[from_node], nodes[to_node])
+    g.add_nodes_from(elements_list)
+    for from_node, to_node in connections:
+        g.add_edge(from_node, to_node)
 
     return g
 
+def element_from_json(el_config, equipment):
+    """network element of its JSON description (consumed), with the
+    parameters of its type variety in the equipment library"""
+    typ = el_config.pop('type')
+    variety = el_config.pop('type_variety', 'default')
+    if typ in equipment and variety in equipment[typ]:
+        extra_params = equipment[typ][variety]
+        el_config.setdefault('params', {}).update(extra_params._asdict())
+    elif typ in ['Edfa', 'Fiber']: #catch it now because the code will crash later!
+        print( f'The {typ} of variety type {variety} was not recognized:'
+                '\nplease check it is properly defined in the eqpt_config json file')
+        exit()
+    cls = getattr(elements, typ)
+    return cls(**el_config)
+
 def network_to_json(network):
     data = {
         'elements': [n.to_json for n in network]
@@ -85,46 +190,31 @@ def select_edfa(gain_target, power_target, equipment):
     """amplifer selection algorithm
     @Orange Jean-Luc Augé
     """
-    Edfa_list = namedtuple('Edfa_list', 'variety power gain nf')
     TARGET_EXTENDED_GAIN = 2.1
     #MAX_EXTENDED_GAIN = 5
-    edfa_dict = equipment['Edfa']
+    # all the varieties allowed for design are evaluated at once
+    table = edfa_nf_table(equipment)
     pin = power_target - gain_target
 
-    edfa_list = [Edfa_list(
-                variety=edfa_variety,
-                power=min(
-                    pin
-                    +edfa.gain_flatmax
-                    +TARGET_EXTENDED_GAIN,
-                    edfa.p_max
-                    )
-                    -power_target,
-                gain=edfa.gain_flatmax-gain_target,
-                nf=edfa_nf(gain_target, edfa_variety, equipment)) \
-                for edfa_variety, edfa in edfa_dict.items()
-                if edfa.allowed_for_design]
-
-    acceptable_gain_list = \
-    list(filter(lambda x : x.gain>-TARGET_EXTENDED_GAIN, edfa_list))
-    if len(acceptable_gain_list) < 1:
+    power = minimum(pin + table.gain_flatmax + TARGET_EXTENDED_GAIN, table.p_max) - power_target
+    gain = table.gain_flatmax - gain_target
+    nf = table.nf(gain_target)
+
+    acceptable_gain = gain > -TARGET_EXTENDED_GAIN
+    if not acceptable_gain.any():
         #no amplifier satisfies the required gain, so pick the highest gain:
-        gain_max = max(edfa_list, key=itemgetter(2)).gain
+        gain_max = gain.max()
         #pick up all amplifiers that share this max gain:
-        acceptable_gain_list = \
-        list(filter(lambda x : x.gain-gain_max>-0.1, edfa_list))
-    acceptable_power_list = \
-    list(filter(lambda x : x.power>=0, acceptable_gain_list))
-    if len(acceptable_power_list) < 1:
+        acceptable_gain = gain - gain_max > -0.1
+    acceptable_power = acceptable_gain & (power >= 0)
+    if not acceptable_power.any():
         #no amplifier satisfies the required power, so pick the highest power:
-        power_max = \
-        max(acceptable_gain_list, key=itemgetter(1)).power
+        power_max = power[acceptable_gain].max()
         #pick up all amplifiers that share this max gain:
-        acceptable_power_list = \
-        list(filter(lambda x : x.power-power_max>-0.1, acceptable_gain_list))
+        acceptable_power = acceptable_gain & (power - power_max > -0.1)
     # gain and power requirements are resolved,
     #       =>chose the amp with the best NF among the acceptable ones:
-    return min(acceptable_power_list, key=itemgetter(3)).variety #filter on NF
+    return table.varieties[argmin(where(acceptable_power, nf, inf))] #filter on NF
 
 def set_roadm_loss(network, equipment, pref_ch_db):
     roadms = [roadm for roadm in network if isinstance(roadm, Roadm)]
@@ -139,12 +229,12 @@ def set_roadm_loss(network, equipment, pref_ch_db):
         elif roadm.loss == None:
             roadm.loss = default_roadm_loss
 
-def target_power(dp_from_gain, network, node, equipment): #get_fiber_dp
+def target_power(dp_from_gain, network, node, equipment, spans=None): #get_fiber_dp
     SPAN_LOSS_REF = 20
     POWER_SLOPE = 0.3
     power_mode = equipment['Spans']['default'].power_mode
     dp_range = list(equipment['Spans']['default'].delta_power_range_db)
-    node_loss = span_loss(network, node)
+    node_loss = span_loss(network, node, spans)
 
     dp_gain_mode = 0
     try:
@@ -168,63 +258,120 @@ def target_power(dp_from_gain, network, node, equipment): #get_fiber_dp
     return dp
 
 
+def _first(nodes):
+    return next(iter(nodes), None)
+
+def _prev_link(network, node):
+    """the node spliced before node (fused spans), or None"""
+    prev_node = _first(network.predecessors(node))
+    if prev_node is not None and (isinstance(prev_node, Fused) or isinstance(node, Fused)):
+        return prev_node
+    return None
+
+def _next_link(network, node):
+    """the node spliced after node (fused spans), or None"""
+    next_node = _first(network.successors(node))
+    if next_node is not None and (isinstance(next_node, Fused) or isinstance(node, Fused)):
+        return next_node
+    return None
+
 def prev_node_generator(network, node):
     """fused spans interest:
     iterate over all predecessors while they are Fused or Fiber type"""
-    prev_node = next(n for n in network.predecessors(node))
-    # yield and re-iterate
-    if isinstance(prev_node, Fused) or isinstance(node, Fused):
-        yield prev_node
-        yield from prev_node_generator(network, prev_node)
-    else:
-        StopIteration
+    visited = {node}
+    node = _prev_link(network, node)
+    while node is not None and node not in visited:
+        yield node
+        visited.add(node)
+        node = _prev_link(network, node)
 
 def next_node_generator(network, node):
     """fused spans interest:
     iterate over all successors while they are Fused or Fiber type"""
-    next_node = next(n for n in network.successors(node))
-    # yield and re-iterate
-    if isinstance(next_node, Fused) or isinstance(node, Fused):
-        yield next_node
-        yield from next_node_generator(network, next_node)
-    else:
-        StopIteration
+    visited = {node}
+    node = _next_link(network, node)
+    while node is not None and node not in visited:
+        yield node
+        visited.add(node)
+        node = _next_link(network, node)
+
+class FusedSpans:
+    """fused span chains of a network: for every node, the first (last) node
+    of the succession of nodes spliced before (after) it by Fused nodes, aka
+    no amp in between, and the total loss of these nodes.
+
+    A chain is walked once and its nodes recorded together, so that the
+    queries of all the nodes of the network take linear time. The records
+    hold losses: clear must be called when the topology or the losses
+    change (split_fiber, add_egress_amplifier, add_fiber_padding do)."""
+    def __init__(self, network):
+        self.network = network
+        self.clear()
+
+    def __repr__(self):
+        return (f'{type(self).__name__}('
+                f'prev={len(self._prev)!r}, '
+                f'next={len(self._next)!r})')
+
+    def clear(self):
+        self._prev = {} # node: (first node, loss of the nodes before)
+        self._next = {} # node: (last node, loss of the nodes after)
+
+    def _chain(self, node, records, link):
+        start = node
+        # walk up to a recorded node or to the end of the chain
+        chain = []
+        visited = set()
+        while node not in records:
+            linked = link(self.network, node)
+            if linked is None or linked is node or linked in visited:
+                records[node] = (node, 0)
+                break
+            chain.append((node, linked))
+            visited.add(node)
+            node = linked
+        # and record the nodes walked, from the end of the chain
+        for node, linked in reversed(chain):
+            edge, loss = records[linked]
+            records[node] = (edge, loss + linked.loss)
+        return records[start]
+
+    def first_node(self, node):
+        return self._chain(node, self._prev, _prev_link)[0]
+
+    def last_node(self, node):
+        return self._chain(node, self._next, _next_link)[0]
+
+    def loss_before(self, node):
+        return self._chain(node, self._prev, _prev_link)[1]
+
+    def loss_after(self, node):
+        return self._chain(node, self._next, _next_link)[1]
 
-def span_loss(network, node):
+    def span_loss(self, node):
+        loss = node.loss if node.passive else 0
+        if isinstance(_first(self.network.predecessors(node)), Fused):
+            loss += self.loss_before(node)
+        if isinstance(_first(self.network.successors(node)), Fused):
+            loss += self.loss_after(node)
+        return loss
+
+def span_loss(network, node, spans=None):
     """Fused span interest:
     return the total span loss of all the fibers spliced by a Fused node"""
-    loss = node.loss if node.passive else 0
-    try:
-        prev_node = next(n for n in network.predecessors(node))
-        if isinstance(prev_node, Fused):
-            loss += sum(n.loss for n in prev_node_generator(network, node))
-    except StopIteration:
-        pass
-    try:
-        next_node = next(n for n in network.successors(node))
-        if isinstance(next_node, Fused):
-            loss += sum(n.loss for n in next_node_generator(network, node))
-    except StopIteration:
-        pass
-    return loss
+    return (spans or FusedSpans(network)).span_loss(node)
 
-def find_first_node(network, node):
+def find_first_node(network, node, spans=None):
     """Fused node interest:
     returns the 1st node at the origin of a succession of fused nodes
     (aka no amp in between)"""
-    this_node = node
-    for this_node in prev_node_generator(network, node):
-        pass
-    return this_node
+    return (spans or FusedSpans(network)).first_node(node)
 
-def find_last_node(network, node):
+def find_last_node(network, node, spans=None):
     """Fused node interest:
     returns the last node in a succession of fused nodes
     (aka no amp in between)"""
-    this_node = node
-    for this_node in next_node_generator(network, node):
-        pass
-    return this_node
+    return (spans or FusedSpans(network)).last_node(node)
 
 def set_amplifier_voa(amp, pref_total_db, power_mode):
     VOA_MARGIN = 0
@@ -241,64 +388,79 @@ def set_amplifier_voa(amp, pref_total_db, power_mode):
             voa = 0 # no output voa optimization in gain mode
         amp.operational.out_voa = voa
 
-def set_egress_amplifier(network, roadm, equipment, pref_total_db):
-    power_mode = equipment['Spans']['default'].power_mode
+def set_egress_amplifier(network, roadm, equipment, pref_total_db, spans=None):
+    spans = spans or FusedSpans(network)
     next_oms = (n for n in network.successors(roadm) if not isinstance(n, Transceiver))
     for oms in next_oms:
-        #go through all the OMS departing from the Roadm
-        node = roadm
-        prev_node = roadm
-        next_node = oms
-        # if isinstance(next_node, Fused): #support ROADM wo egress amp for metro applications
-        #     node = find_last_node(next_node)
-        #     next_node = next(n for n in network.successors(node))
-        #     next_node = find_last_node(next_node)
-        prev_dp = 0
-        dp = 0
-        while True:
-        #go through all nodes in the OMS (loop until next Roadm instance)
-            if isinstance(node, Edfa):
-                node_loss = span_loss(network, prev_node)
-                dp_from_gain = prev_dp + node.operational.gain_target - node_loss \
-                    if node.operational.gain_target > 0 else None
-                dp = target_power(dp_from_gain, network, next_node, equipment)
-                gain_target = node_loss + dp - prev_dp
-
-                if power_mode:
-                    node.dp_db = dp
-                node.operational.gain_target = gain_target
-
-                if node.params.type_variety == '':
-                    power_target = pref_total_db + dp
-                    edfa_variety = select_edfa(gain_target, power_target, equipment)
-                    extra_params = equipment['Edfa'][edfa_variety]
-                    node.params.update_params(extra_params._asdict())
-                set_amplifier_voa(node, pref_total_db, power_mode)
-            if isinstance(next_node, Roadm) or isinstance(next_node, Transceiver):
-                break
-            prev_dp = dp
-            prev_node = node
-            node = next_node
-            # print(f'{node.uid}')
-            next_node = next(n for n in network.successors(node))
+        set_oms_amplifiers(network, roadm, oms, equipment, pref_total_db, spans)
 
+def set_oms_amplifiers(network, roadm, oms, equipment, pref_total_db, spans=None):
+    """design the amplifiers of the OMS departing from roadm, whose first
+    node is oms"""
+    power_mode = equipment['Spans']['default'].power_mode
+    spans = spans or FusedSpans(network)
+    #go through all the OMS departing from the Roadm
+    node = roadm
+    prev_node = roadm
+    next_node = oms
+    # if isinstance(next_node, Fused): #support ROADM wo egress amp for metro applications
+    #     node = find_last_node(next_node)
+    #     next_node = next(n for n in network.successors(node))
+    #     next_node = find_last_node(next_node)
+    prev_dp = 0
+    dp = 0
+    while True:
+    #go through all nodes in the OMS (loop until next Roadm instance)
+        if isinstance(node, Edfa):
+            node_loss = spans.span_loss(prev_node)
+            dp_from_gain = prev_dp + node.operational.gain_target - node_loss \
+                if node.operational.gain_target > 0 else None
+            dp = target_power(dp_from_gain, network, next_node, equipment, spans)
+            gain_target = node_loss + dp - prev_dp
+
+            if power_mode:
+                node.dp_db = dp
+            node.operational.gain_target = gain_target
 
-def add_egress_amplifier(network, node):
+            if node.params.type_variety == '':
+                power_target = pref_total_db + dp
+                edfa_variety = select_edfa(gain_target, power_target, equipment)
+                extra_params = equipment['Edfa'][edfa_variety]
+                node.params.update_params(extra_params._asdict())
+            set_amplifier_voa(node, pref_total_db, power_mode)
+        if isinstance(next_node, Roadm) or isinstance(next_node, Transceiver):
+            break
+        prev_dp = dp
+        prev_node = node
+        node = next_node
+        # print(f'{node.uid}')
+        next_node = next(n for n in network.successors(node))
+
+
+def add_egress_amplifier(network, node, spans=None):
     next_nodes = [n for n in network.successors(node)
         if not (isinstance(n, Transceiver) or isinstance(n, Fused) or isinstance(n, Edfa))]
         #no amplification for fused spans or TRX
+    if next_nodes and spans is not None:
+        spans.clear()
     for i, next_node in enumerate(next_nodes):
-        network.remove_edge(node, next_node)
-        amp = Edfa(
-                    uid = f'Edfa{i}_{node.uid}',
-                    params = {},
-                    operational = {
-                        'gain_target': 0,
-                        'tilt_target': 0,
-                    })
-        network.add_node(amp)
-        network.add_edge(node, amp)
-        network.add_edge(amp, next_node)
+        insert_amplifier(network, node, next_node, f'Edfa{i}_{node.uid}')
+
+def insert_amplifier(network, node, next_node, uid):
+    """insert an amplifier to be designed between node and next_node"""
+    invalidate_network_index(network)
+    network.remove_edge(node, next_node)
+    amp = Edfa(
+                uid = uid,
+                params = {},
+                operational = {
+                    'gain_target': 0,
+                    'tilt_target': 0,
+                })
+    network.add_node(amp)
+    network.add_edge(node, amp)
+    network.add_edge(amp, next_node)
+    return amp
 
 
 def calculate_new_length(fiber_length, bounds, target_length):
@@ -325,10 +487,13 @@ def calculate_new_length(fiber_length, bounds, target_length):
     return result
 
 
-def split_fiber(network, fiber, bounds, target_length, equipment):
+def split_fiber(network, fiber, bounds, target_length, equipment, spans=None):
     new_length, n_spans = calculate_new_length(fiber.length, bounds, target_length)
     if n_spans == 1:
         return
+    if spans is not None:
+        spans.clear()
+    invalidate_network_index(network)
 
     try:
         next_node = next(network.successors(fiber))
@@ -366,55 +531,589 @@ def add_connector_loss(fibers, con_in, con_out, EOL):
         else:
             fiber.con_out = fiber.con_out+EOL
 
-def add_fiber_padding(network, fibers, padding):
+def add_fiber_padding(network, fibers, padding, spans=None):
     """last_fibers = (fiber for n in network.nodes()
                          if not (isinstance(n, Fiber) or isinstance(n, Fused))
                          for fiber in network.predecessors(n)
                          if isinstance(fiber, Fiber))"""
+    spans = spans or FusedSpans(network)
     for fiber in fibers:
-        this_span_loss = span_loss(network, fiber)
         next_node = next(network.successors(fiber))
-        if this_span_loss < padding and not (isinstance(next_node, Fused)):
+        if isinstance(next_node, Fused):
+            # only the last fiber of fused spans is padded
+            continue
+        this_span_loss = spans.span_loss(fiber)
+        if this_span_loss < padding:
             #add a padding att_in at the input of the 1st fiber:
             #address the case when several fibers are spliced together
-            first_fiber = find_first_node(network, fiber)
+            first_fiber = spans.first_node(fiber)
             if first_fiber.att_in is None:
                 first_fiber.att_in = padding - this_span_loss
             else :
                 first_fiber.att_in = first_fiber.att_in + padding - this_span_loss
+            # the loss of the fused spans has changed
+            spans.clear()
 
-def build_network(network, equipment, pref_ch_db, pref_total_db):
+SpanDesign = namedtuple('SpanDesign', 'bounds target_length con_in con_out EOL padding')
+
+def span_design(equipment):
+    """fiber span settings of build_network, from the default Spans of the
+    equipment library"""
     default_span_data = equipment['Spans']['default']
     max_length = int(default_span_data.max_length * UNITS[default_span_data.length_units])
     min_length = max(int(default_span_data.padding/0.2*1e3),50_000)
-    bounds = range(min_length, max_length)
-    target_length = max(min_length, 90_000)
-    con_in = default_span_data.con_in
-    con_out = default_span_data.con_out + default_span_data.EOL
-    padding = default_span_data.padding
+    return SpanDesign(bounds=range(min_length, max_length),
+                      target_length=max(min_length, 90_000),
+                      con_in=default_span_data.con_in,
+                      con_out=default_span_data.con_out + default_span_data.EOL,
+                      EOL=default_span_data.EOL,
+                      padding=default_span_data.padding)
+
+def build_network(network, equipment, pref_ch_db, pref_total_db):
+    design = design_parameters(equipment, pref_ch_db, pref_total_db)
+    if network.graph.get('auto_design') == design:
+        # already designed with these parameters (eg by load_auto_design)
+        network_index(network)
+        return
+    span_data = span_design(equipment)
+    # the propagations of the previous design are not reused
+    clear_propagation_cache(network)
 
     #set raodm loss for gain_mode before to build network
     set_roadm_loss(network, equipment, pref_ch_db)
     fibers = [f for f in network.nodes() if isinstance(f, Fiber)]
-    add_connector_loss(fibers, con_in, con_out, default_span_data.EOL)
-    add_fiber_padding(network, fibers, padding)
+    add_connector_loss(fibers, span_data.con_in, span_data.con_out, span_data.EOL)
+    # fused spans chains, walked once and kept up to date by the next steps
+    spans = FusedSpans(network)
+    add_fiber_padding(network, fibers, span_data.padding, spans)
     # don't group split fiber and add amp in the same loop
     # =>for code clarity (at the expense of speed):
     for fiber in fibers:
-        split_fiber(network, fiber, bounds, target_length, equipment)
+        split_fiber(network, fiber, span_data.bounds, span_data.target_length, equipment, spans)
 
     amplified_nodes = [n for n in network.nodes()
                         if isinstance(n, Fiber) or isinstance(n, Roadm)]
     for node in amplified_nodes:
-        add_egress_amplifier(network, node)
+        add_egress_amplifier(network, node, spans)
 
     roadms = [r for r in network.nodes() if isinstance(r, Roadm)]
     for roadm in roadms:
-        set_egress_amplifier(network, roadm, equipment, pref_total_db)
+        set_egress_amplifier(network, roadm, equipment, pref_total_db, spans)
 
     #support older json input topology wo Roadms:
     if len(roadms) == 0:
         trx = [t for t in network.nodes() if isinstance(t, Transceiver)]
         for t in trx:
-            set_egress_amplifier(network, t, equipment, pref_total_db)
+            set_egress_amplifier(network, t, equipment, pref_total_db, spans)
+
+    network.graph['auto_design'] = design
+    network_index(network)
+
+class NetworkIndex:
+    """O(1) lookups of the network elements used as path end points and
+    constraints: elements by uid, roadms by city and egress amplifiers by the
+    beginning of their uid ('egress edfa in <city>').
+
+    The index is not checked against the network: the functions that add,
+    remove or rename elements (split_fiber, insert_amplifier,
+    IncrementalDesign) call invalidate_network_index, and so must the code
+    that changes the graph otherwise."""
+    def __init__(self, network):
+        self.nodes = {}
+        self.transceivers = {}
+        self.roadms = {}
+        egress = []
+        for position, node in enumerate(network.nodes()):
+            self.nodes.setdefault(node.uid, node)
+            if isinstance(node, Transceiver):
+                self.transceivers.setdefault(node.uid, node)
+            elif isinstance(node, Roadm):
+                self.roadms.setdefault(node.uid, node)
+            elif isinstance(node, Edfa) and node.uid.startswith('egress edfa in '):
+                egress.append((node.uid, position, node))
+        # sorted uids: all the egress amplifiers of a city are contiguous
+        self._egress = sorted(egress, key=itemgetter(0, 1))
+        self._egress_uids = [uid for uid, _, _ in self._egress]
+        self._egress_by_city = {}
+
+    def __repr__(self):
+        return (f'{type(self).__name__}('
+                f'nodes={len(self.nodes)!r}, '
+                f'transceivers={len(self.transceivers)!r}, '
+                f'roadms={len(self.roadms)!r}, '
+                f'egress_amplifiers={len(self._egress)!r})')
+
+    def roadm(self, city):
+        return self.roadms.get(f'roadm {city}')
+
+    def egress_amplifier(self, city):
+        """first egress amplifier (in network order) whose uid starts with
+        'egress edfa in <city>'"""
+        try:
+            return self._egress_by_city[city]
+        except KeyError:
+            pass
+        prefix = f'egress edfa in {city}'
+        i = bisect_left(self._egress_uids, prefix)
+        matches = []
+        while i < len(self._egress) and self._egress_uids[i].startswith(prefix):
+            matches.append(self._egress[i])
+            i += 1
+        node = min(matches, key=itemgetter(1))[2] if matches else None
+        self._egress_by_city[city] = node
+        return node
+
+    def constraint_node(self, n):
+        """resolve a path constraint the way compute_constrained_path does:
+        a transceiver uid, then a roadm city, then an egress amplifier"""
+        node = self.transceivers.get(n)
+        if node is None:
+            node = self.roadm(n)
+        if node is None:
+            node = self.egress_amplifier(n)
+        return node
+
+def network_index(network):
+    """return the NetworkIndex of network, built once and kept with the graph
+    until invalidate_network_index is called"""
+    index = network.graph.get('index')
+    if index is None:
+        index = network.graph['index'] = NetworkIndex(network)
+    return index
+
+def invalidate_network_index(network):
+    """drop the NetworkIndex of network after elements were added, removed
+    or renamed: the next network_index call builds it again"""
+    network.graph.pop('index', None)
+
+def topology_fingerprint(network):
+    """digest of the elements and connections of a network"""
+    return sha1(dumps(network_to_json(network), sort_keys=True, default=str).encode()).hexdigest()
+
+def design_state(network):
+    """element settings chosen by build_network: amplifier varieties, gain
+    targets and VOAs, roadm losses and fiber connector losses and padding"""
+    state = {}
+    for node in network:
+        if isinstance(node, Edfa):
+            state[node.uid] = (dict(vars(node.params)), node.operational.gain_target,
+                               node.operational.tilt_target, node.operational.out_voa,
+                               node.dp_db, node.effective_gain)
+        elif isinstance(node, Roadm):
+            state[node.uid] = node.loss
+        elif isinstance(node, Fiber):
+            state[node.uid] = node.att_in, node.con_in, node.con_out
+    return state
+
+def restore_design_state(network, state):
+    for node in network:
+        if node.uid not in state:
+            continue
+        if isinstance(node, Edfa):
+            params, gain_target, tilt_target, out_voa, dp_db, effective_gain = state[node.uid]
+            vars(node.params).clear()
+            node.params.update_params(params)
+            node.operational.gain_target = gain_target
+            node.operational.tilt_target = tilt_target
+            node.operational.out_voa = out_voa
+            node.dp_db = dp_db
+            node.effective_gain = effective_gain
+        elif isinstance(node, Roadm):
+            node.loss = state[node.uid]
+        elif isinstance(node, Fiber):
+            node.att_in, node.con_in, node.con_out = state[node.uid]
+
+DesignCacheInfo = namedtuple('DesignCacheInfo', 'hits misses currsize')
+
+class DesignCache:
+    """auto-designs of a network, one per design key: (reference channel power,
+    reference total power, equipment fingerprint, topology fingerprint).
+
+    Every design is built by build_network from the network as it was given,
+    so that it only depends on its key. Designing with a key that was already
+    used restores the stored element settings instead of building again.
+    The equipment fingerprint is computed when the equipment is set, not at
+    every lookup: the library must not be modified in place."""
+    def __init__(self, network, equipment):
+        self.network = network
+        self.equipment = equipment
+        self._pristine = deepcopy(network)
+        self.topology = topology_fingerprint(network)
+        self.designs = {}
+        self.hits = 0
+        self.misses = 0
+
+    def __repr__(self):
+        return (f'{type(self).__name__}('
+                f'designs={len(self.designs)!r}, '
+                f'hits={self.hits!r}, '
+                f'misses={self.misses!r})')
+
+    @property
+    def equipment(self):
+        return self._equipment
+
+    @equipment.setter
+    def equipment(self, equipment):
+        self._equipment = equipment
+        self.fingerprint = equipment_fingerprint(equipment)
+
+    def key(self, pref_ch_db, pref_total_db):
+        return (pref_ch_db, pref_total_db, self.fingerprint, self.topology)
+
+    def cache_info(self):
+        return DesignCacheInfo(self.hits, self.misses, len(self.designs))
+
+    def design(self, pref_ch_db, pref_total_db):
+        """set the network elements to the design of the given reference powers"""
+        key = self.key(pref_ch_db, pref_total_db)
+        state = self.designs.get(key)
+        if state is None:
+            self.misses += 1
+            # the topology (split fibers, amplifiers) does not depend on the
+            # powers: the network itself is built once, other designs are
+            # built on a copy of the initial network
+            network = self.network if not self.designs else deepcopy(self._pristine)
+            build_network(network, self.equipment, pref_ch_db, pref_total_db)
+            state = self.designs[key] = design_state(network)
+        else:
+            self.hits += 1
+        # always restored: propagation updates the amplifiers gain
+        restore_design_state(self.network, state)
+        self.network.graph['auto_design'] = design_parameters(self.equipment, pref_ch_db,
+                                                              pref_total_db, self.fingerprint)
+
+# uid of the spans of a fiber split by split_fiber
+SPLIT_FIBER_UID = r'(.*)_\(\d+/\d+\)'
+
+def _add_drop(node):
+    return isinstance(node, (Roadm, Transceiver))
+
+def _oms_start(start, first):
+    """whether the connection from start begins an OMS: build_network adds
+    an amplifier after a roadm, even to another roadm"""
+    return not isinstance(first, Transceiver) and (isinstance(start, Roadm) or not _add_drop(first))
+
+def _line(network, first):
+    """elements from first to the next roadm or transceiver, and this node;
+    None if the line branches out or ends before"""
+    elements = []
+    visited = set()
+    node = first
+    while not _add_drop(node):
+        if node in visited or network.in_degree(node) != 1 or network.out_degree(node) != 1:
+            return None
+        elements.append(node)
+        visited.add(node)
+        node = next(network.successors(node))
+    return elements, node
+
+def _merge(config, changes):
+    for key, value in changes.items():
+        if isinstance(value, dict) and isinstance(config.get(key), dict):
+            _merge(config[key], value)
+        else:
+            config[key] = value
+    return config
+
+def _order_successors(network, node, successors):
+    """reorder the successors of node"""
+    current = list(network.successors(node))
+    mismatch = next((i for i, (a, b) in enumerate(zip(current, successors)) if a is not b),
+                    len(successors))
+    for n in current[mismatch:]:
+        network.remove_edge(node, n)
+    for n in successors[mismatch:]:
+        network.add_edge(node, n)
+
+class IncrementalDesign:
+    """network designed by build_network and kept designed as its topology
+    changes (see apply), by designing again only the OMS the changes touch.
+
+    An OMS is the line of elements from a roadm (or a transceiver) to the
+    next one. Its design does not depend on the other OMS: the touched OMS
+    are removed from the designed network and designed again, from the
+    network as it was given with the changes applied (self.topology), the
+    other OMS keep their design. The result is the design build_network
+    gives for self.topology, with the same element uids and successors
+    order; only the predecessors of the roadms may come in another order.
+    Changes of lines that branch out or end without roadm are designed by
+    building the whole network again."""
+    def __init__(self, network, equipment, pref_ch_db, pref_total_db):
+        self.network = network
+        self.equipment = equipment
+        self.pref_ch_db = pref_ch_db
+        self.pref_total_db = pref_total_db
+        self.topology = deepcopy(network)
+        self._nodes = {n.uid: n for n in self.topology}
+        self._position = {n: i for i, n in enumerate(self.topology)}
+        # the OMS whose amplifiers are set (see build_network)
+        self._designed_from = Roadm if any(isinstance(n, Roadm) for n in self.topology) \
+            else Transceiver
+        self._index()
+        build_network(network, equipment, pref_ch_db, pref_total_db)
+        self.redesigns = 0
+        self.rebuilds = 0
+
+    def __repr__(self):
+        return (f'{type(self).__name__}('
+                f'oms={len(self._oms)!r}, '
+                f'redesigns={self.redesigns!r}, '
+                f'rebuilds={self.rebuilds!r})')
+
+    def _index(self):
+        self._oms = {} # (add uid, first uid): OMS elements in the topology
+        self._members = {} # uid: keys of the OMS starting at or going through it
+        for start in self.topology:
+            if _add_drop(start):
+                for first in self.topology.successors(start):
+                    self._index_oms(start, first)
+
+    def _index_oms(self, start, first):
+        line = _line(self.topology, first) if _oms_start(start, first) else None
+        if line is not None:
+            key = start.uid, first.uid
+            self._oms[key] = line[0]
+            for node in (start, *line[0]):
+                self._members.setdefault(node.uid, set()).add(key)
+
+    def _unindex_oms(self, key):
+        for node in (self._nodes[key[0]], *self._oms.pop(key)):
+            self._members[node.uid].discard(key)
+
+    def _origin(self, node):
+        """uid of the element of the topology node comes from, None for the
+        amplifiers added by the design"""
+        if node.uid in self._nodes:
+            return node.uid
+        match = fullmatch(SPLIT_FIBER_UID, node.uid)
+        if match and match.group(1) in self._nodes:
+            return match.group(1)
+        return None
+
+    def _designed_first(self, start, first_uid):
+        """first element of the designed OMS of key (start uid, first_uid)"""
+        for first in self.network.successors(start):
+            origin = self._origin(first)
+            if origin is None and self.network.out_degree(first) == 1:
+                origin = self._origin(next(self.network.successors(first)))
+            if origin == first_uid:
+                return first
+        return None
+
+    def _designed_oms(self, start, first_uid):
+        """elements of the designed OMS of key (start uid, first_uid)"""
+        first = self._designed_first(start, first_uid)
+        line = None if first is None else _line(self.network, first)
+        return None if line is None else line[0]
+
+    def _egress(self, start):
+        """(successor, index of its egress amplifier or None) of start in
+        the topology, in the order of the successors of the designed start:
+        split fibers are connected again after the other successors, in
+        the network order, and build_network connects the egress
+        amplifiers of a roadm after its other successors"""
+        span_data = span_design(self.equipment)
+        def split(node):
+            return isinstance(node, Fiber) and calculate_new_length(
+                node.length, span_data.bounds, span_data.target_length)[1] > 1
+        successors = list(self.topology.successors(start))
+        successors = [n for n in successors if not split(n)] + \
+            sorted(filter(split, successors), key=self._position.get)
+        if not isinstance(start, Roadm):
+            return [(n, None) for n in successors]
+        amplified = [n for n in successors if not isinstance(n, (Transceiver, Fused, Edfa))]
+        return [(n, None) for n in successors if n not in amplified] + \
+            [(n, i) for i, n in enumerate(amplified)]
+
+    def _topology_oms(self, node):
+        """key of the OMS of node in the topology, or None"""
+        first = node
+        visited = {node}
+        while True:
+            predecessors = list(self.topology.predecessors(first))
+            if len(predecessors) != 1:
+                return None
+            if _add_drop(predecessors[0]):
+                return predecessors[0], first
+            first = predecessors[0]
+            if first in visited:
+                return None
+            visited.add(first)
+
+    def _update(self, node, changes):
+        config = _merge(node.to_json, deepcopy(changes))
+        vars(node).update(vars(element_from_json(config, self.equipment)))
+
+    def apply(self, changes):
+        """apply changes to the topology and design the network again. The
+        changes are given in the format of the topology JSON:
+            'elements': partial descriptions of existing elements, merged
+                into their description, eg {'uid': ..., 'params': {'length': 85}}
+                or {'uid': ..., 'type_variety': 'std_low_gain'}
+            'connections': connections to add
+            'removed_connections': connections to remove
+        Returns the keys (roadm or transceiver uid, first element uid) of the
+        OMS designed again."""
+        edits = changes.get('elements', [])
+        added = [(cx['from_node'], cx['to_node']) for cx in changes.get('connections', [])]
+        removed = [(cx['from_node'], cx['to_node']) for cx in changes.get('removed_connections', [])]
+        for uid in chain((edit['uid'] for edit in edits), *added, *removed):
+            if uid not in self._nodes:
+                raise ValueError(f'unknown element {uid!r}')
+        for edit in edits:
+            if edit.get('type', type(self._nodes[edit['uid']]).__name__) != \
+                    type(self._nodes[edit['uid']]).__name__:
+                raise ValueError(f'the type of {edit["uid"]!r} cannot be changed')
+        for u, v in removed:
+            if not self.topology.has_edge(self._nodes[u], self._nodes[v]):
+                raise ValueError(f'unknown connection from {u!r} to {v!r}')
+
+        # roadms and transceivers whose OMS are designed again, other elements
+        edited = {self._nodes[edit['uid']] for edit in edits}
+        starts = {n for n in edited if _add_drop(n)}
+        touched = {self._nodes[uid] for uid in chain(*added, *removed)} | edited
+        touched = {n for n in touched if not _add_drop(n)}
+        rebuild = any(n.uid not in self._members for n in touched)
+        old = {key for n in touched for key in self._members.get(n.uid, ())}
+        old |= {(u, v) for u, v in chain(added, removed) if (u, v) in self._oms}
+        old |= {key for n in starts for key in self._members.get(n.uid, ())
+                if key[0] == n.uid}
+
+        for edit in edits:
+            self._update(self._nodes[edit['uid']], edit)
+        for u, v in removed:
+            self.topology.remove_edge(self._nodes[u], self._nodes[v])
+        for u, v in added:
+            self.topology.add_edge(self._nodes[u], self._nodes[v])
+
+        candidates = {(self._nodes[start], self._nodes[first])
+                      for start, first in chain(old, added) if _add_drop(self._nodes[start])}
+        candidates |= {(start, first) for start in starts
+                       for first in self.topology.successors(start)}
+        for node in touched:
+            key = self._topology_oms(node)
+            if key is None:
+                rebuild = True
+            else:
+                candidates.add(key)
+        new = {}
+        for start, first in candidates:
+            if not self.topology.has_edge(start, first) or not _oms_start(start, first):
+                continue
+            line = _line(self.topology, first)
+            if line is None:
+                rebuild = True
+            else:
+                new[start.uid, first.uid] = (start, *line)
+        # an OMS kept as it is is designed again, once
+        old |= {key for key in new if key in self._oms}
+        # every element of the touched OMS is in a new OMS, that does not
+        # go through an OMS kept
+        elements = {n for _, line, _ in new.values() for n in line}
+        if not touched <= elements or \
+                any(n not in elements for key in old for n in self._oms[key]) or \
+                any(self._members.get(n.uid, set()) - old - {key for key in new}
+                    for n in elements):
+            rebuild = True
+        if rebuild:
+            self.rebuild()
+            return sorted(self._oms)
+        self._redesign(old, new, starts, added, removed)
+        return sorted(new)
+
+    def _redesign(self, old, new, starts, added, removed):
+        network = self.network
+        nodes = network_index(network).nodes
+        self.redesigns += 1
+
+        # the touched OMS are removed from the designed network
+        for key in old:
+            line = self._designed_oms(nodes[key[0]], key[1])
+            if line is None:
+                raise ValueError(f'OMS {key!r} is not in the designed network')
+            network.remove_nodes_from(line)
+        for uid in (n.uid for n in starts):
+            vars(nodes[uid]).update(vars(deepcopy(self._nodes[uid])))
+        set_roadm_loss([nodes[n.uid] for n in starts], self.equipment, self.pref_ch_db)
+        # the other connections are part of the OMS designed again
+        for u, v in removed:
+            if _add_drop(self._nodes[u]) and _add_drop(self._nodes[v]) and \
+                    not _oms_start(self._nodes[u], self._nodes[v]):
+                network.remove_edge(nodes[u], nodes[v])
+        for u, v in added:
+            if _add_drop(self._nodes[u]) and _add_drop(self._nodes[v]) and \
+                    not _oms_start(self._nodes[u], self._nodes[v]):
+                network.add_edge(nodes[u], nodes[v])
+
+        # and added again from the topology
+        copies = deepcopy([n for _, line, _ in new.values() for n in line])
+        copies = iter(copies)
+        for start, line, end in new.values():
+            line = [next(copies) for _ in line]
+            network.add_nodes_from(line)
+            for u, v in zip([nodes[start.uid], *line], [*line, nodes[end.uid]]):
+                network.add_edge(u, v)
+
+        # designed as build_network does
+        span_data = span_design(self.equipment)
+        fibers = [n for key in new for n in self._designed_oms(nodes[key[0]], key[1])
+                  if isinstance(n, Fiber)]
+        add_connector_loss(fibers, span_data.con_in, span_data.con_out, span_data.EOL)
+        spans = FusedSpans(network)
+        add_fiber_padding(network, fibers, span_data.padding, spans)
+        for fiber in fibers:
+            split_fiber(network, fiber, span_data.bounds, span_data.target_length,
+                        self.equipment, spans)
+        for key in sorted(new):
+            start = nodes[key[0]]
+            line = self._designed_oms(start, key[1])
+            for fiber in line:
+                if isinstance(fiber, Fiber):
+                    add_egress_amplifier(network, fiber, spans)
+            first = line[0] if line else nodes[key[1]]
+            if isinstance(start, Roadm) and not isinstance(first, (Fused, Edfa)):
+                first = insert_amplifier(network, start, first, f'Edfa_{start.uid}')
+                spans.clear()
+            if isinstance(start, self._designed_from):
+                set_oms_amplifiers(network, start, first, self.equipment,
+                                   self.pref_total_db, spans)
+        # the successors of the roadms and their egress amplifiers uids
+        # are the ones of build_network
+        for uid in {key[0] for key in new}:
+            start = nodes[uid]
+            successors = []
+            for node, i in self._egress(self._nodes[uid]):
+                if i is None and _add_drop(node):
+                    successors.append(nodes[node.uid])
+                    continue
+                first = self._designed_first(start, node.uid)
+                if i is not None:
+                    first.uid = f'Edfa{i}_{uid}'
+                successors.append(first)
+            _order_successors(network, start, successors)
+
+        for key in old:
+            if key in self._oms:
+                self._unindex_oms(key)
+        for start, first in new:
+            self._index_oms(self._nodes[start], self._nodes[first])
+        self._updated()
+
+    def _updated(self):
+        # the design is no longer the one of the topology file
+        self.network.graph.pop('auto_design', None)
+        invalidate_network_index(self.network)
+        clear_propagation_cache(self.network)
+        network_index(self.network)
 
+    def rebuild(self):
+        """design the whole network again, from the topology"""
+        self.rebuilds += 1
+        designed = deepcopy(self.topology)
+        build_network(designed, self.equipment, self.pref_ch_db, self.pref_total_db)
+        self.network.clear()
+        self.network.add_nodes_from(designed)
+        self.network.add_edges_from(designed.edges())
+        self._index()
+        self._updated()
@@ -17,22 +17,63 @@ See: draft-ietf-teas-yang-path-computation-01.txt
 
 from collections import namedtuple
 from logging import getLogger, basicConfig, CRITICAL, DEBUG, INFO
-from networkx import (dijkstra_path, NetworkXNoPath)
-from numpy import mean
+from networkx import (DiGraph, bellman_ford_path, shortest_simple_paths,
+                      NetworkXNoPath)
+from numpy import array, float64, mean, ndarray
 from gnpy.core.service_sheet import convert_service_sheet, Request_element, Element
 from gnpy.core.elements import Transceiver, Roadm, Edfa, Fused
-from gnpy.core.network import set_roadm_loss
+from gnpy.core.network import set_roadm_loss, network_index, _line
+from gnpy.core.execute import CompiledPath, compile_path, propagation_cache, PROPAGATION_STATE
+from gnpy.core.topology import shortest_path
 from gnpy.core.utils import db2lin, lin2db
 from gnpy.core.info import create_input_spectral_information, SpectralInformation, Channel, Power
-from copy import copy, deepcopy
+from copy import copy
 from csv import writer
+from itertools import islice
 
 logger = getLogger(__name__)
 
+# candidate paths of the k shortest paths search
+MAX_CANDIDATE_PATHS = 10
 
 RequestParams = namedtuple('RequestParams','request_id source destination trx_type'+
 ' trx_mode nodes_list loose_list spacing power nb_channel frequency format baud_rate OSNR bit_rate roll_off')
 
+DisjunctionParams = namedtuple('DisjunctionParams','disjunction_id relaxable link_diverse'+
+' node_diverse disjunctions_req')
+
+class PathResult(namedtuple('PathResult',
+        'hops hop_types snr osnr_ase osnr_ase_01nm osnr_nli summaries')):
+    """what is kept of a propagated path: the hop uids and element types,
+    the per channel SNR and OSNR (dB) at the destination, and optionally the
+    printed summary of every hop. Empty when no path was found."""
+    __slots__ = ()
+
+    def __bool__(self):
+        return bool(self.hops)
+
+def _frozen(values):
+    if values is None:
+        return None
+    values = array(values, dtype=float64)
+    values.setflags(write=False)
+    return values
+
+def path_result(path, summaries=False):
+    """record the result of the propagation of path: nothing refers to the
+    network elements, that can be propagated again for the next request"""
+    if not path:
+        return PathResult((), (), None, None, None, None, () if summaries else None)
+    destination = path[-1]
+    return PathResult(
+        hops=tuple(el.uid for el in path),
+        hop_types=tuple(type(el).__name__ for el in path),
+        snr=_frozen(destination.snr),
+        osnr_ase=_frozen(destination.osnr_ase),
+        osnr_ase_01nm=_frozen(destination.osnr_ase_01nm),
+        osnr_nli=_frozen(destination.osnr_nli),
+        summaries=tuple(str(el) for el in path) if summaries else None)
+
 class Path_request:
     def __init__(self, *args, **params):
         params = RequestParams(**params)
@@ -69,14 +110,34 @@ class Path_request:
                             f'power:  \t{round(lin2db(self.power)+30,2)} dBm'
                             '\n'])
 
+class Disjunction:
+    def __init__(self, *args, **params):
+        params = DisjunctionParams(**params)
+        self.disjunction_id = params.disjunction_id
+        self.relaxable = params.relaxable
+        self.link_diverse = params.link_diverse
+        self.node_diverse = params.node_diverse
+        # request ids, in order and without repetition
+        self.disjunctions_req = list(dict.fromkeys(str(r) for r in params.disjunctions_req))
+
+    def __str__(self):
+        return '\n\t'.join([f'{type(self).__name__} {self.disjunction_id}',
+                            f'relaxable:    {self.relaxable}',
+                            f'link-diverse: {self.link_diverse}',
+                            f'node-diverse: {self.node_diverse}',
+                            f'requests:     {self.disjunctions_req}'])
+
 class Result_element(Element):
     def __init__(self,path_request,computed_path):
         self.path_id = path_request.request_id
         self.path_request = path_request
+        # computed_path is a PathResult, or the propagated path elements
+        if not isinstance(computed_path, PathResult):
+            computed_path = path_result(computed_path)
         self.computed_path = computed_path
         hop_type = []
-        for e in computed_path :
-            if isinstance(e, Transceiver) :
+        for typ in computed_path.hop_types :
+            if typ == Transceiver.__name__ :
                 hop_type.append(' - '.join([path_request.tsp,path_request.tsp_mode]))
             else:
                 hop_type.append('not recorded')
@@ -159,19 +220,19 @@ class Result_element(Element):
                        'path-metric': [
                            {
                            'metric-type': 'SNR@bandwidth',
-                           'accumulative-value': round(mean(self.computed_path[-1].snr),2)
+                           'accumulative-value': round(mean(self.computed_path.snr),2)
                            },
                            {
                            'metric-type': 'SNR@0.1nm',
-                           'accumulative-value': round(mean(self.computed_path[-1].snr+lin2db(self.path_request.baud_rate/12.5e9)),2)
+                           'accumulative-value': round(mean(self.computed_path.snr+lin2db(self.path_request.baud_rate/12.5e9)),2)
                            },
                            {
                            'metric-type': 'OSNR@bandwidth',
-                           'accumulative-value': round(mean(self.computed_path[-1].osnr_ase),2)
+                           'accumulative-value': round(mean(self.computed_path.osnr_ase),2)
                            },
                            {
                            'metric-type': 'OSNR@0.1nm',
-                           'accumulative-value': round(mean(self.computed_path[-1].osnr_ase_01nm),2)
+                           'accumulative-value': round(mean(self.computed_path.osnr_ase_01nm),2)
                            },
                            {
                            'metric-type': 'reference_power',
@@ -185,11 +246,11 @@ class Result_element(Element):
                         'path-route-objects': [
                             {
                             'path-route-object': {
-                                'index': self.computed_path.index(n),
+                                'index': self.computed_path.hops.index(n),
                                 'unnumbered-hop': {
-                                    'node-id': n.uid,
-                                    'link-tp-id': n.uid,
-                                    'hop-type': self.hop_type[self.computed_path.index(n)],
+                                    'node-id': n,
+                                    'link-tp-id': n,
+                                    'hop-type': self.hop_type[self.computed_path.hops.index(n)],
                                     'direction': 'not used'
                                 },
                                 'label-hop': {
@@ -199,7 +260,7 @@ class Result_element(Element):
                                         }
                                     }
                                 }
-                            } for n in self.computed_path
+                            } for n in self.computed_path.hops
                             ]
                     }
                 }
@@ -209,33 +270,23 @@ class Result_element(Element):
         return self.pathresult
 
 def compute_constrained_path(network, req):
-    trx = [n for n in network.nodes() if isinstance(n, Transceiver)]
-    roadm = [n for n in network.nodes() if isinstance(n, Roadm)]
-    edfa = [n for n in network.nodes() if isinstance(n, Edfa)]
-    source = next(el for el in trx if el.uid == req.source)
+    index = network_index(network)
+    source = index.transceivers[req.source]
     # start the path with its source
     # TODO : avoid loops due to constraints , guess name base on string,
     # avoid crashing if on req is not correct
     total_path = [source]
     for n in req.nodes_list:
         # print(n)
-        try :
-            node = next(el for el in trx if el.uid == n)
-        except StopIteration:
-            try:
-                node = next(el for el in roadm if el.uid == f'roadm {n}')
-            except StopIteration:
-                try:
-                    node = next(el for el in edfa
-                        if el.uid.startswith(f'egress edfa in {n}'))
-                except StopIteration:
-                    msg = f'could not find node : {n} in network topology: \
-                        not a trx, roadm, edfa or fused element'
-                    logger.critical(msg)
-                    raise ValueError(msg)
+        node = index.constraint_node(n)
+        if node is None:
+            msg = f'could not find node : {n} in network topology: \
+                not a trx, roadm, edfa or fused element'
+            logger.critical(msg)
+            raise ValueError(msg)
         # extend path list without repeating source -> skip first element in the list
         try:
-            total_path.extend(dijkstra_path(network, source, node)[1:])
+            total_path.extend(shortest_path(network, source, node)[1:])
             source = node
         except NetworkXNoPath:
             # for debug
@@ -259,79 +310,332 @@ def compute_constrained_path(network, req):
 
     return total_path
 
-def propagate(path, req, equipment, show=False):
+def roadm_graph(network):
+    """roadm level view of network: an edge per OMS, from a roadm (or
+    transceiver) to the next one, holding the elements in between and
+    weighted by its number of hops, as dijkstra_path counts them"""
+    graph = DiGraph()
+    for node in network:
+        if not isinstance(node, (Roadm, Transceiver)):
+            continue
+        graph.add_node(node)
+        for first in network.successors(node):
+            # lines that branch out without roadm are not part of the view
+            line = _line(network, first)
+            if line is None:
+                continue
+            elements, last = line
+            weight = len(elements) + 1
+            # parallel OMS: the shortest one is kept
+            if not graph.has_edge(node, last) or graph[node][last]['weight'] > weight:
+                graph.add_edge(node, last, elements=elements, weight=weight)
+    return graph
+
+def without_transit(graph, source, destination):
+    """view of the roadm level graph without the transceivers but source
+    and destination: a path does not go through other transceivers"""
+    return graph.subgraph(n for n in graph
+                          if not isinstance(n, Transceiver) or n in (source, destination))
+
+def disjoint_paths(graph, source, target, k=2, node_diverse=True):
+    """k link-diverse (and node-diverse) paths of graph from source to target,
+    of minimum total weight, shortest first, or None if there are not that
+    many: Bhandari's algorithm, the k shortest augmenting paths of a min cost
+    flow. Node diversity is obtained by splitting every node in two ends
+    joined by an edge of capacity 1."""
+    def head(n):
+        return (n, 'in') if node_diverse and n not in (source, target) else (n, 'out')
+    def tail(n):
+        return (n, 'out')
+    if source not in graph or target not in graph:
+        return None
+    residual = DiGraph()
+    for n in graph:
+        if head(n) != tail(n):
+            residual.add_edge(head(n), tail(n), weight=0)
+    for u, v, weight in graph.edges(data='weight'):
+        if u != target and v != source:
+            residual.add_edge(tail(u), head(v), weight=weight)
+
+    flow = set()
+    for _ in range(k):
+        try:
+            # the reversed edges of the flow have negative weights
+            augmenting = bellman_ford_path(residual, tail(source), head(target))
+        except NetworkXNoPath:
+            return None
+        for u, v in zip(augmenting[:-1], augmenting[1:]):
+            weight = residual[u][v]['weight']
+            residual.remove_edge(u, v)
+            residual.add_edge(v, u, weight=-weight)
+            # an edge used backwards cancels the flow on it
+            if (v, u) in flow:
+                flow.remove((v, u))
+            else:
+                flow.add((u, v))
+
+    successors = {}
+    for u, v in flow:
+        successors.setdefault(u, []).append(v)
+    paths = []
+    for _ in range(k):
+        path = [tail(source)]
+        while path[-1] != head(target):
+            path.append(successors[path[-1]].pop())
+        # back to the graph nodes, without the split node ends
+        path = [n for n, end in path if end == 'out']
+        paths.append(path)
+    return sorted(paths, key=lambda path: sum(graph[u][v]['weight']
+                                               for u, v in zip(path[:-1], path[1:])))
+
+def expand_roadm_path(graph, path):
+    """element path of a path of the roadm level graph, or [] if one of its
+    OMS does not exist"""
+    total_path = [path[0]]
+    for u, v in zip(path[:-1], path[1:]):
+        if not graph.has_edge(u, v):
+            return []
+        total_path.extend(graph[u][v]['elements'])
+        total_path.append(v)
+    return total_path
+
+def compute_disjoint_paths(network, reqs, disjunction, graph=None):
+    """paths of the requests of a disjunction: the working path (shortest)
+    for the first request, protection paths for the next ones, routed
+    together on the roadm level graph so that they are link and node
+    diverse between the source and destination roadms. Like the paths of
+    candidate_paths, they do not go through other transceivers.
+    The requests must have the same end points, in either direction, and
+    no include constraint. Returns {request_id: path}, or None if there is
+    no such paths"""
+    if graph is None:
+        graph = roadm_graph(network)
+    index = network_index(network)
+    first = reqs[0]
+    source = index.transceivers.get(first.source)
+    destination = index.transceivers.get(first.destination)
+    if source is None or destination is None:
+        return None
+    graph = without_transit(graph, source, destination)
+    for req in reqs:
+        if {req.source, req.destination} != {first.source, first.destination}:
+            return None
+    # add/drop roadms: the common end points of the disjoint paths
+    src_roadm = next(iter(graph.successors(source)), None)
+    dst_roadm = next(iter(graph.predecessors(destination)), None)
+    if src_roadm is None or dst_roadm is None:
+        return None
+    paths = disjoint_paths(graph, src_roadm, dst_roadm, len(reqs),
+                           node_diverse=disjunction.node_diverse != 'False')
+    if paths is None:
+        return None
+    routes = {}
+    for req, path in zip(reqs, paths):
+        path = [source] + path + [destination]
+        if req.source != first.source:
+            # opposite direction: the same roadms, through the reverse OMS
+            path.reverse()
+        total_path = expand_roadm_path(graph, path)
+        if not total_path:
+            return None
+        routes[req.request_id] = total_path
+    return routes
+
+def snr_01nm(snr, req):
+    """mean SNR in 0.1nm (dB), compared to the transceiver OSNR threshold"""
+    return mean(snr + lin2db(req.baud_rate/12.5e9))
+
+def is_feasible(path, req):
+    """the propagated path meets the OSNR threshold of the request"""
+    destination = path[-1] if path else None
+    return req.OSNR is None or \
+        (destination is not None and destination.snr is not None
+         and snr_01nm(destination.snr, req) >= req.OSNR)
+
+def candidate_paths(network, req, graph=None):
+    """paths from the source to the destination of req, shortest (number
+    of hops) first: Yen's algorithm on the roadm level graph"""
+    if graph is None:
+        graph = roadm_graph(network)
+    index = network_index(network)
+    source = index.transceivers.get(req.source)
+    destination = index.transceivers.get(req.destination)
+    if source not in graph or destination not in graph:
+        return
+    graph = without_transit(graph, source, destination)
+    try:
+        for path in shortest_simple_paths(graph, source, destination, weight='weight'):
+            yield expand_roadm_path(graph, path)
+    except NetworkXNoPath:
+        return
+
+def search_feasible_path(network, req, equipment, k=MAX_CANDIDATE_PATHS, exclude=()):
+    """the first of the k shortest paths of req (but the exclude ones) that
+    meets req.OSNR, propagated, or None. The candidates are deliberately not
+    pruned with an SNR lower bound, as there is no conservative estimate of
+    the propagated SNR: every candidate is propagated before being rejected,
+    and the candidates share the propagation of their common prefix
+    (propagation_cache)"""
+    exclude = [list(path) for path in exclude]
+    candidates = (c for c in candidate_paths(network, req) if c not in exclude)
+    for candidate in islice(candidates, k):
+        propagate(candidate, req, equipment, cache=propagation_cache(network))
+        if is_feasible(candidate, req):
+            return candidate
+    return None
+
+def compute_feasible_path(network, req, equipment, k=MAX_CANDIDATE_PATHS):
+    """compute_constrained_path, propagated. When this path does not meet
+    req.OSNR and req has no include constraint but its destination, the next
+    k shortest paths are tried (search_feasible_path) and the first feasible
+    one is returned instead, or the constrained path if there is none"""
+    path = compute_constrained_path(network, req)
+    if not path:
+        return path
+    cache = propagation_cache(network)
+    propagate(path, req, equipment, cache=cache)
+    if req.nodes_list != [req.destination] or is_feasible(path, req):
+        return path
+    feasible_path = search_feasible_path(network, req, equipment, k, exclude=[path])
+    if feasible_path is None:
+        logger.info(f'no path meeting the OSNR threshold of {req.OSNR}dB, '
+                    'keeping the shortest one')
+        return propagate(path, req, equipment, cache=cache)
+    logger.info(f'shortest path does not meet the OSNR threshold of {req.OSNR}dB, '
+                f'feasible path (roadms): {[e.uid for e in feasible_path if isinstance(e, Roadm)]}')
+    return feasible_path
+
+def request_spectral_information(req):
+    """input spectral information of the propagation of req"""
+    return create_input_spectral_information(
+        req.frequency['min'], req.roll_off,
+        req.baud_rate, req.power, req.spacing, req.nb_channel)
+
+def propagate(path, req, equipment, show=False, cache=None):
+    """propagate the spectral information of req along path. cache: the
+    PropagationCache of the network of path (propagation_cache), to resume
+    from the propagation of a common prefix of the previous paths"""
     #update roadm loss in case of power sweep (power mode only)
     set_roadm_loss(path, equipment, lin2db(req.power*1e3))
+    si = request_spectral_information(req)
+    compiled = compile_path(path, cache)
+    si = compiled(si, cache=cache)
+    if show :
+        for el in path:
+            print(el)
+    return path
+
+def select_power_level(path, index):
+    """set back the path elements state of one power level of a batched
+    power sweep, as if this power level had been propagated alone"""
+    for el in path:
+        # attributes that hold one value per power level (one row per power
+        # level) after a batched power sweep
+        for attr in PROPAGATION_STATE.get(type(el), ()):
+            value = getattr(el, attr)
+            if isinstance(value, ndarray) and value.ndim == 2:
+                value = value[index]
+                if value.shape == (1,):
+                    value = value[0]
+                setattr(el, attr, value)
+        if isinstance(el, Edfa):
+            el.operational.gain_target = el.effective_gain
+
+def propagate_power_sweep(path, req, equipment, powers_dbm, show=False):
+    """propagate all the channel powers (dBm) of a power sweep in a single
+    vectorized pass: the spectral information holds one row per power level.
+    Returns the destination results for each power level; the path elements
+    are left in the state of the last power level, as after propagating the
+    power levels one by one with propagate."""
+    powers = [db2lin(p_db)*1e-3 for p_db in powers_dbm]
+    #update roadm loss for every power level (power mode only)
+    set_roadm_loss(path, equipment, lin2db(array(powers)*1e3).reshape(-1, 1))
     si = create_input_spectral_information(
         req.frequency['min'], req.roll_off,
-        req.baud_rate, req.power, req.spacing, req.nb_channel)
-    for el in path:
-        si = el(si)
-        if show :
+        req.baud_rate, powers, req.spacing, req.nb_channel)
+    CompiledPath(path)(si)
+    destination = path[-1]
+    results = [{'Pch_dBm'               : p_db,
+                'OSNR_ASE_0.1nm'        : round(mean(destination.osnr_ase_01nm[i]),2),
+                'OSNR_ASE_signal_bw'    : round(mean(destination.osnr_ase[i]),2),
+                'SNR_nli_signal_bw'     : round(mean(destination.osnr_nli[i]),2),
+                'SNR_total_signal_bw'   : round(mean(destination.snr[i]),2)}
+               for i, p_db in enumerate(powers_dbm)]
+    select_power_level(path, -1)
+    req.power = powers[-1]
+    if show :
+        for el in path:
             print(el)
-    return path
+    return results
 
+CSV_HEADER = ('path-id','source','destination','transponder-type',\
+        'transponder-mode','baud rate (Gbaud)', 'input power (dBm)','path',\
+        'OSNR@bandwidth','OSNR@0.1nm','SNR@bandwidth','SNR@0.1nm','Pass?')
 
 def jsontocsv(json_data,equipment,fileout):
     # read json path result file in accordance with:
     # Yang model for requesting Path Computation
     # draft-ietf-teas-yang-path-computation-01.txt.
     # and write results in an CSV file
+    # json_data can also be a list of Result_element: their path results are
+    # then read one by one, without building the whole json data
+    if not isinstance(json_data, dict):
+        json_data = {'path': (r.pathresult for r in json_data)}
 
     mywriter = writer(fileout)
-    mywriter.writerow(('path-id','source','destination','transponder-type',\
-        'transponder-mode','baud rate (Gbaud)', 'input power (dBm)','path',\
-        'OSNR@bandwidth','OSNR@0.1nm','SNR@bandwidth','SNR@0.1nm','Pass?'))
-    tspjsondata = equipment['Transceiver']
-    #print(tspjsondata)
+    mywriter.writerow(CSV_HEADER)
     for p in json_data['path']:
-        path_id     = p['path-id']
-        source      = p['path-properties']['path-route-objects'][0]\
-        ['path-route-object']['unnumbered-hop']['node-id']
-        destination = p['path-properties']['path-route-objects'][-1]\
-        ['path-route-object']['unnumbered-hop']['node-id']
-        pth        = ' | '.join([ e['path-route-object']['unnumbered-hop']['node-id']
-                 for e in p['path-properties']['path-route-objects']])
-
-        [tsp,mode] = p['path-properties']['path-route-objects'][0]\
-        ['path-route-object']['unnumbered-hop']['hop-type'].split(' - ')
-
-        # find the min  acceptable OSNR, baud rate from the eqpt library based on tsp (tupe) and mode (format)
-        try:
-            [minosnr, baud_rate] = next([m['OSNR'] , m['baud_rate']]
-                for m in equipment['Transceiver'][tsp].mode if  m['format']==mode)
+        mywriter.writerow(csv_row(p, equipment))
 
-        # for debug
-        # print(f'coucou {baud_rate}')
-        except IndexError:
-            msg = f'could not find tsp : {self.tsp} with mode: {self.tsp_mode} in eqpt library'
+def csv_row(p, equipment):
+    """CSV_HEADER values of a path result (json)"""
+    path_id     = p['path-id']
+    source      = p['path-properties']['path-route-objects'][0]\
+    ['path-route-object']['unnumbered-hop']['node-id']
+    destination = p['path-properties']['path-route-objects'][-1]\
+    ['path-route-object']['unnumbered-hop']['node-id']
+    pth        = ' | '.join([ e['path-route-object']['unnumbered-hop']['node-id']
+             for e in p['path-properties']['path-route-objects']])
 
-            raise ValueError(msg)
-        output_snr = next(e['accumulative-value']
-            for e in p['path-properties']['path-metric'] if e['metric-type'] == 'SNR@0.1nm')
-        output_snrbandwidth = next(e['accumulative-value']
-            for e in p['path-properties']['path-metric'] if e['metric-type'] == 'SNR@bandwidth')
-        output_osnr = next(e['accumulative-value']
-            for e in p['path-properties']['path-metric'] if e['metric-type'] == 'OSNR@0.1nm')
-        output_osnrbandwidth = next(e['accumulative-value']
-            for e in p['path-properties']['path-metric'] if e['metric-type'] == 'OSNR@bandwidth')
-        power = next(e['accumulative-value']
-            for e in p['path-properties']['path-metric'] if e['metric-type'] == 'reference_power')
-        if isinstance(output_snr, str):
-            isok = ''
-        else:
-            isok = output_snr >= minosnr
-        mywriter.writerow((path_id,
-            source,
-            destination,
-            tsp,
-            mode,
-            baud_rate*1e-9,
-            round(lin2db(power)+30,2),
-            pth,
-            output_osnrbandwidth,
-            output_osnr,
-            output_snrbandwidth,
-            output_snr,
-            isok
-            ))
+    [tsp,mode] = p['path-properties']['path-route-objects'][0]\
+    ['path-route-object']['unnumbered-hop']['hop-type'].split(' - ')
+
+    # find the min  acceptable OSNR, baud rate from the eqpt library based on tsp (tupe) and mode (format)
+    try:
+        [minosnr, baud_rate] = next([m['OSNR'] , m['baud_rate']]
+            for m in equipment['Transceiver'][tsp].mode if  m['format']==mode)
+
+    # for debug
+    # print(f'coucou {baud_rate}')
+    except IndexError:
+        msg = f'could not find tsp : {self.tsp} with mode: {self.tsp_mode} in eqpt library'
+
+        raise ValueError(msg)
+    output_snr = next(e['accumulative-value']
+        for e in p['path-properties']['path-metric'] if e['metric-type'] == 'SNR@0.1nm')
+    output_snrbandwidth = next(e['accumulative-value']
+        for e in p['path-properties']['path-metric'] if e['metric-type'] == 'SNR@bandwidth')
+    output_osnr = next(e['accumulative-value']
+        for e in p['path-properties']['path-metric'] if e['metric-type'] == 'OSNR@0.1nm')
+    output_osnrbandwidth = next(e['accumulative-value']
+        for e in p['path-properties']['path-metric'] if e['metric-type'] == 'OSNR@bandwidth')
+    power = next(e['accumulative-value']
+        for e in p['path-properties']['path-metric'] if e['metric-type'] == 'reference_power')
+    if isinstance(output_snr, str):
+        isok = ''
+    else:
+        isok = output_snr >= minosnr
+    return (path_id,
+        source,
+        destination,
+        tsp,
+        mode,
+        baud_rate*1e-9,
+        round(lin2db(power)+30,2),
+        pth,
+        output_osnrbandwidth,
+        output_osnr,
+        output_snrbandwidth,
+        output_snr,
+        isok
+        )
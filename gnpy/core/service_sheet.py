@@ -43,7 +43,7 @@ class Element:
         return hash((type(self), self.uid))
 
 class Request_element(Element):
-    def __init__(self,Request,eqpt_filename):
+    def __init__(self,Request,equipment):
         # request_id is str
         # excel has automatic number formatting that adds .0 on integer values
         # the next lines recover the pure int value, assuming this .0 is unwanted
@@ -58,15 +58,14 @@ class Request_element(Element):
         self.destination = Request.destination
         self.srctpid = f'trx {Request.source}'
         self.dsttpid = f'trx {Request.destination}'
-        # test that trx_type belongs to eqpt_config.json
-        # if not replace it with a default
-        equipment = load_equipment(eqpt_filename)
+        # test that trx_type and mode belong to the equipment library (loaded
+        # once by convert_service_sheet): the transceivers are indexed by type
         try :
-            if equipment['Transceiver'][Request.trx_type]:
-                self.trx_type = Request.trx_type
-            if [mode for mode in equipment['Transceiver'][Request.trx_type].mode]:
-                self.mode = Request.mode
-        except KeyError:
+            modes = equipment['Transceiver'][Request.trx_type].mode
+            self.trx_type = Request.trx_type
+            self.mode = next(mode['format'] for mode in modes \
+                             if mode['format'] == Request.mode)
+        except (KeyError, StopIteration):
             msg = f'could not find tsp : {Request.trx_type} with mode: {Request.mode} in eqpt library \nComputation stopped.'
             #print(msg)
             logger.critical(msg)
@@ -167,8 +166,8 @@ class Request_element(Element):
         return self.pathrequest , self.pathsync
 
 def convert_service_sheet(input_filename, eqpt_filename, output_filename='', filter_region=[]):
-    service = parse_excel(input_filename)
-    req = [Request_element(n,eqpt_filename) for n in service]
+    # the equipment library is loaded and checked once for all the rows
+    equipment = load_equipment(eqpt_filename)
     # dumps the output into a json file with name
     # split_filename = [input_filename[0:len(input_filename)-len(suffix_filename)] , suffix_filename[1:]]
     if output_filename=='':
@@ -176,10 +175,15 @@ def convert_service_sheet(input_filename, eqpt_filename, output_filename='', fil
     # for debug
     # print(json_filename)
     data = {
-        'path-request': [n.json[0] for n in req],
-        'synchronisation': [n.json[1] for n in req
-        if n.json[1] is not None]
+        'path-request': [],
+        'synchronisation': []
     }
+    # rows are converted as they are read
+    for n in service_rows(input_filename):
+        pathrequest, pathsync = Request_element(n,equipment).json
+        data['path-request'].append(pathrequest)
+        if pathsync is not None:
+            data['synchronisation'].append(pathsync)
     with open(output_filename, 'w') as f:
             f.write(dumps(data, indent=2))
     return data
@@ -191,10 +195,13 @@ def parse_row(row, fieldnames):
 #
 
 def parse_excel(input_filename):
+    return list(service_rows(input_filename))
+
+def service_rows(input_filename):
+    """Request of each row of the Service sheet, parsed when it is needed"""
     with open_workbook(input_filename) as wb:
         service_sheet = wb.sheet_by_name('Service')
-        services = list(parse_service_sheet(service_sheet))
-    return services
+        yield from parse_service_sheet(service_sheet)
 
 def parse_service_sheet(service_sheet):
         logger.info(f'Validating headers on {service_sheet.name!r}')
@@ -0,0 +1,261 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+'''
+gnpy.core.snapshot
+==================
+
+This module contains a compact binary format for a network and the
+equipment library it was built with.
+
+A snapshot is an uncompressed NumPy .npz file. Its 'header' member is a
+small JSON document (format version, equipment library, design parameters,
+table of the repeated strings), the other members are the columns of the
+element parameters (one row per element of a type, in the network order)
+and the connections, as element indices. The members are stored without
+compression, so they are memory-mapped when the snapshot is read instead
+of being parsed: loading a network is then dominated by the creation of its
+elements.
+'''
+
+from json import dumps, loads
+from struct import unpack
+from zipfile import ZipFile, ZIP_STORED
+from networkx import DiGraph
+from numpy import array, float64, frombuffer, int32, int64, memmap, nan, ndarray, savez, uint8, zeros
+from numpy.lib.format import read_magic, read_array_header_1_0, read_array_header_2_0
+from collections import namedtuple
+from gnpy.core import elements
+from gnpy.core.elements import Transceiver, Roadm, Fused, Fiber, Edfa
+from gnpy.core.equipment import Amp, Model_vg, Model_fg, Spans, Transceiver as TransceiverType, \
+    Roadms, SI, Fiber as FiberType, edfa_nf_table, read_only
+from gnpy.core.units import UNITS
+
+SNAPSHOT_VERSION = 1
+ELEMENT_TYPES = (Transceiver, Roadm, Fused, Fiber, Edfa)
+EQUIPMENT_TYPES = {typ.__name__: typ for typ in
+                   (Amp, Model_vg, Model_fg, Spans, TransceiverType, Roadms, SI, FiberType)}
+
+# numeric parameters of each element type: (column, attribute getter)
+COLUMNS = {
+    Roadm: (('loss', lambda el: el.loss),),
+    Fused: (('loss', lambda el: el.loss),),
+    Fiber: (('length', lambda el: el.length/UNITS[el.params.length_units]),
+            ('loss_coef', lambda el: el.loss_coef*1e3),
+            ('att_in', lambda el: el.att_in),
+            ('con_in', lambda el: el.con_in),
+            ('con_out', lambda el: el.con_out)),
+    Edfa: (('gain_target', lambda el: el.operational.gain_target),
+           ('tilt_target', lambda el: el.operational.tilt_target),
+           ('out_voa', lambda el: el.operational.out_voa),
+           ('delta_p', lambda el: el.dp_db),
+           ('effective_gain', lambda el: el.effective_gain)),
+}
+
+Snapshot = namedtuple('Snapshot', 'header arrays')
+
+def _tagged(value):
+    # namedtuples of the equipment library, with their type
+    if hasattr(value, '_asdict'):
+        return {'namedtuple': type(value).__name__,
+                'fields': {k: _tagged(v) for k, v in value._asdict().items()}}
+    if isinstance(value, (list, tuple)):
+        return [_tagged(v) for v in value]
+    if isinstance(value, dict):
+        return {k: _tagged(v) for k, v in value.items()}
+    return value.tolist() if hasattr(value, 'tolist') else value
+
+def _untagged(value):
+    if isinstance(value, list):
+        return [_untagged(v) for v in value]
+    if not isinstance(value, dict):
+        return value
+    if 'namedtuple' in value:
+        try:
+            typ = EQUIPMENT_TYPES[value['namedtuple']]
+        except KeyError:
+            raise ValueError(f'unknown equipment type {value["namedtuple"]!r}') from None
+        return typ(**{k: _untagged(v) for k, v in value['fields'].items()})
+    return {k: _untagged(v) for k, v in value.items()}
+
+def _numbers(values):
+    """float64 column of values (nan for None) and, if some of them are
+    integers, the mask of the integers: they are restored as int"""
+    column = array([nan if v is None else float(v) for v in values], dtype=float64)
+    integers = array([isinstance(v, int) and not isinstance(v, bool) for v in values], dtype=bool)
+    return column, integers if integers.any() else None
+
+def _strings(values):
+    return frombuffer('\0'.join(values).encode(), dtype=uint8)
+
+def save_snapshot(filename, network, equipment, design=None):
+    """save network and equipment to the snapshot filename (.npz), with the
+    design information of save_network (design, a JSON dictionary)"""
+    nodes = list(network)
+    ids = {el: i for i, el in enumerate(nodes)}
+    try:
+        types = [next(i for i, typ in enumerate(ELEMENT_TYPES) if type(el) is typ) for el in nodes]
+    except StopIteration:
+        raise ValueError('only the gnpy.core.elements types can be saved to a snapshot') from None
+    strings = {}
+    def code(value):
+        return strings.setdefault(value, len(strings))
+    locations = [el.metadata['location'] for el in nodes]
+    arrays = {
+        'type': array(types, dtype=uint8),
+        'uid': _strings([el.uid for el in nodes]),
+        'city': array([code(loc.city) for loc in locations], dtype=int32),
+        'region': array([code(loc.region) for loc in locations], dtype=int32),
+        'connections': array([(ids[u], ids[v]) for u in nodes for v in network.successors(u)],
+                             dtype=int64).reshape(-1, 2),
+    }
+    for name in ('latitude', 'longitude'):
+        column, integers = _numbers([getattr(loc, name) for loc in locations])
+        arrays[name] = column
+        if integers is not None:
+            arrays[f'{name}.int'] = integers
+    for typ in (Fiber, Edfa):
+        typed = [el for el in nodes if type(el) is typ]
+        arrays[f'{typ.__name__}.type_variety'] = array(
+            [code(el.params.type_variety) for el in typed], dtype=int32)
+    arrays['Fiber.length_units'] = array(
+        [code(el.params.length_units) for el in nodes if type(el) is Fiber], dtype=int32)
+    for typ, columns in COLUMNS.items():
+        typed = [el for el in nodes if type(el) is typ]
+        for name, value in columns:
+            column, integers = _numbers([value(el) for el in typed])
+            arrays[f'{typ.__name__}.{name}'] = column
+            if integers is not None:
+                arrays[f'{typ.__name__}.{name}.int'] = integers
+    header = {'version': SNAPSHOT_VERSION,
+              'types': [typ.__name__ for typ in ELEMENT_TYPES],
+              'strings': list(strings),
+              'equipment': _tagged(equipment),
+              'auto_design': design}
+    arrays['header'] = frombuffer(dumps(header).encode(), dtype=uint8)
+    with open(filename, 'wb') as f:
+        savez(f, **arrays)
+
+def _npy_arrays(filename):
+    """arrays of an uncompressed .npz file, memory-mapped: np.load cannot
+    memory-map the members of an archive, but they are stored as is"""
+    data = memmap(filename, dtype=uint8, mode='r')
+    arrays = {}
+    with ZipFile(filename) as archive, open(filename, 'rb') as f:
+        for info in archive.infolist():
+            if info.compress_type != ZIP_STORED:
+                raise ValueError(f'{filename} is not an uncompressed snapshot')
+            # local file header: 30 bytes, then the file name and the extra field
+            f.seek(info.header_offset + 26)
+            name_length, extra_length = unpack('<HH', f.read(4))
+            f.seek(info.header_offset + 30 + name_length + extra_length)
+            version = read_magic(f)
+            if version == (1, 0):
+                shape, fortran_order, dtype = read_array_header_1_0(f)
+            elif version == (2, 0):
+                shape, fortran_order, dtype = read_array_header_2_0(f)
+            else:
+                raise ValueError(f'unsupported array format {version} in {filename}')
+            key = info.filename[:-len('.npy')]
+            if 0 in shape:
+                arrays[key] = zeros(shape, dtype=dtype)
+            else:
+                arrays[key] = ndarray(shape, dtype=dtype, buffer=data, offset=f.tell(),
+                                      order='F' if fortran_order else 'C')
+    return arrays
+
+def read_snapshot(filename):
+    """header and memory-mapped arrays of the snapshot filename"""
+    arrays = _npy_arrays(filename)
+    header = loads(arrays.pop('header').tobytes().decode())
+    if header.get('version') != SNAPSHOT_VERSION:
+        raise ValueError(f'unsupported snapshot version {header.get("version")!r} in {filename}')
+    return Snapshot(header, arrays)
+
+def snapshot_equipment(snapshot):
+    """equipment library saved in snapshot (read-only, as load_equipment)"""
+    equipment = read_only({key: {variety: _untagged(entry) for variety, entry in entries.items()}
+                           for key, entries in snapshot.header['equipment'].items()})
+    if 'Edfa' in equipment:
+        edfa_nf_table(equipment)
+    return equipment
+
+def _column(arrays, name):
+    values = arrays[name].tolist()
+    integers = arrays.get(f'{name}.int')
+    if integers is not None:
+        values = [int(v) if i else v for v, i in zip(values, integers.tolist())]
+    return [None if v != v else v for v in values]
+
+def snapshot_network(snapshot, equipment):
+    """networkx.DiGraph of the elements and connections of snapshot, with
+    the parameters of their type variety in equipment (as network_from_json)"""
+    header, arrays = snapshot
+    strings = header['strings']
+    types = [getattr(elements, typ) for typ in header['types']]
+    type_codes = arrays['type'].tolist()
+    uids = arrays['uid'].tobytes().decode().split('\0') if type_codes else []
+    locations = zip(_column(arrays, 'latitude'), _column(arrays, 'longitude'),
+                    arrays['city'].tolist(), arrays['region'].tolist())
+    # per type, the parameter rows in the network order
+    rows = {}
+    for typ in COLUMNS:
+        names = [name for name, _ in COLUMNS[typ]]
+        columns = [_column(arrays, f'{typ.__name__}.{name}') for name in names]
+        if typ in (Fiber, Edfa):
+            names.append('type_variety')
+            columns.append([strings[i] for i in arrays[f'{typ.__name__}.type_variety'].tolist()])
+        if typ is Fiber:
+            names.append('length_units')
+            columns.append([strings[i] for i in arrays['Fiber.length_units'].tolist()])
+        rows[typ] = iter([dict(zip(names, row)) for row in zip(*columns)])
+    variety_params = {}
+    def params(typ, variety):
+        # the JSON of each element is completed with its equipment parameters
+        key = typ.__name__, variety
+        if key not in variety_params:
+            if typ.__name__ in equipment and variety in equipment[typ.__name__]:
+                variety_params[key] = equipment[typ.__name__][variety]._asdict()
+            elif typ in (Edfa, Fiber):
+                raise ValueError(f'The {typ.__name__} of variety type {variety} is not '
+                                 f'in the equipment library')
+            else:
+                variety_params[key] = None
+        return variety_params[key]
+
+    nodes = []
+    for code, uid, (latitude, longitude, city, region) in zip(type_codes, uids, locations):
+        typ = types[code]
+        metadata = {'location': {'latitude': latitude, 'longitude': longitude,
+                                 'city': strings[city], 'region': strings[region]}}
+        if typ in (Roadm, Fused):
+            el = typ(uid=uid, metadata=metadata, params=next(rows[typ]))
+        elif typ is Fiber:
+            row = next(rows[typ])
+            el = typ(uid=uid, metadata=metadata, params={**row, **params(typ, row['type_variety'])})
+        elif typ is Edfa:
+            row = next(rows[typ])
+            el = typ(uid=uid, metadata=metadata, params=params(typ, row['type_variety']),
+                     operational={'gain_target': row['gain_target'],
+                                  'tilt_target': row['tilt_target'],
+                                  'out_voa': row['out_voa']})
+            el.dp_db = row['delta_p']
+            el.effective_gain = row['effective_gain']
+        else:
+            extra = params(typ, 'default')
+            el = typ(uid=uid, metadata=metadata, **({} if extra is None else {'params': dict(extra)}))
+        nodes.append(el)
+
+    network = DiGraph()
+    network.add_nodes_from(nodes)
+    network.add_edges_from((nodes[u], nodes[v]) for u, v in arrays['connections'].tolist())
+    design = header.get('auto_design')
+    if design is not None:
+        network.graph['auto_design'] = {k: v for k, v in design.items() if k != 'topology'}
+    return network
+
+def load_snapshot(filename):
+    """network and equipment library saved to the snapshot filename"""
+    snapshot = read_snapshot(filename)
+    equipment = snapshot_equipment(snapshot)
+    return snapshot_network(snapshot, equipment), equipment
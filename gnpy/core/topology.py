@@ -0,0 +1,152 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+'''
+gnpy.core.topology
+==================
+
+This module contains a compact representation of a network topology.
+
+The elements are numbered and the connections are stored as compressed
+sparse row (CSR) arrays of successors and predecessors, with parallel arrays
+of element type and fiber length, instead of the dictionaries networkx keeps
+for every node and edge. It is meant to route and propagate on large
+networks once they are designed: build_network changes the topology and
+needs a networkx.DiGraph, whose auto-design JSON or graph can then be turned
+into a Topology (see network_from_json and Topology.from_network).
+'''
+
+from networkx import DiGraph, NetworkXNoPath, NodeNotFound, dijkstra_path
+from numpy import array, argsort, bincount, concatenate, cumsum, int64, nan, uint8
+from gnpy.core.elements import Transceiver, Roadm, Fused, Fiber, Edfa
+
+ELEMENT_TYPES = (Transceiver, Roadm, Fused, Fiber, Edfa)
+
+def _csr(sources, targets, size):
+    """CSR arrays of the targets of each source, in the order of the edges"""
+    sources = array(sources, dtype=int64)
+    targets = array(targets, dtype=int64)
+    indptr = concatenate([[0], cumsum(bincount(sources, minlength=size))]).astype(int64)
+    return indptr, targets[argsort(sources, kind='stable')]
+
+class Topology:
+    """directed graph of network elements, stored as CSR arrays: element i
+    is self.elements[i], its successors are
+    indices[indptr[i]:indptr[i+1]], its predecessors
+    rindices[rindptr[i]:rindptr[i+1]].
+
+    The successors and predecessors of an element are in the order
+    networkx gives them for the same graph, so that routing gives the same
+    paths. The graph methods used by the routing and propagation functions
+    (nodes, successors, predecessors...) take and return elements."""
+    def __init__(self, elements, edges):
+        self.elements = list(elements)
+        self.ids = {el: i for i, el in enumerate(self.elements)}
+        # a connection is recorded once, as in a DiGraph
+        edges = list(dict.fromkeys((self.ids[u], self.ids[v]) for u, v in edges))
+        size = len(self.elements)
+        self.indptr, self.indices = _csr([u for u, _ in edges], [v for _, v in edges], size)
+        self.rindptr, self.rindices = _csr([v for _, v in edges], [u for u, _ in edges], size)
+        self.types = array([next((i for i, typ in enumerate(ELEMENT_TYPES) if isinstance(el, typ)),
+                                 len(ELEMENT_TYPES)) for el in self.elements], dtype=uint8)
+        self.length = array([el.length if isinstance(el, Fiber) else nan
+                             for el in self.elements], dtype=float)
+        # cached data of other modules (see network_index)
+        self.graph = {}
+
+    @classmethod
+    def from_network(cls, network):
+        topology = cls(network.nodes(), ())
+        ids = topology.ids
+        succ = [[ids[v] for v in network.successors(u)] for u in topology.elements]
+        pred = [[ids[v] for v in network.predecessors(u)] for u in topology.elements]
+        topology.indptr, topology.indices = _csr(
+            [i for i, s in enumerate(succ) for _ in s], [j for s in succ for j in s], len(ids))
+        topology.rindptr, topology.rindices = _csr(
+            [i for i, p in enumerate(pred) for _ in p], [j for p in pred for j in p], len(ids))
+        return topology
+
+    def __repr__(self):
+        return (f'{type(self).__name__}('
+                f'nodes={self.number_of_nodes()!r}, '
+                f'edges={self.number_of_edges()!r})')
+
+    def __len__(self):
+        return len(self.elements)
+
+    def __iter__(self):
+        return iter(self.elements)
+
+    def __contains__(self, node):
+        return node in self.ids
+
+    def nodes(self):
+        return self.elements
+
+    def number_of_nodes(self):
+        return len(self.elements)
+
+    def number_of_edges(self):
+        return len(self.indices)
+
+    def edges(self):
+        return ((u, self.elements[j]) for i, u in enumerate(self.elements)
+                for j in self.indices[self.indptr[i]:self.indptr[i+1]])
+
+    def _id(self, node):
+        try:
+            return self.ids[node]
+        except KeyError:
+            raise NodeNotFound(f'{node!r} is not in the topology') from None
+
+    def successors(self, node):
+        i = self._id(node)
+        return (self.elements[j] for j in self.indices[self.indptr[i]:self.indptr[i+1]])
+
+    def predecessors(self, node):
+        i = self._id(node)
+        return (self.elements[j] for j in self.rindices[self.rindptr[i]:self.rindptr[i+1]])
+
+    def has_edge(self, u, v):
+        if u not in self.ids or v not in self.ids:
+            return False
+        i = self.ids[u]
+        return self.ids[v] in self.indices[self.indptr[i]:self.indptr[i+1]]
+
+    def shortest_path(self, source, target):
+        """path with the fewest hops from source to target: the breadth
+        first search gives the path dijkstra_path gives with unit weights"""
+        start, end = self._id(source), self._id(target)
+        # plain lists are faster to index one item at a time
+        indptr, indices = self.indptr.tolist(), self.indices.tolist()
+        parents = [-1] * len(self.elements)
+        parents[start] = start
+        frontier = [start]
+        while frontier and parents[end] < 0:
+            reached = []
+            for i in frontier:
+                for j in indices[indptr[i]:indptr[i+1]]:
+                    if parents[j] < 0:
+                        parents[j] = i
+                        reached.append(j)
+            frontier = reached
+        if parents[end] < 0:
+            raise NetworkXNoPath(f'No path to {target}.')
+        path = [end]
+        while path[-1] != start:
+            path.append(parents[path[-1]])
+        return [self.elements[i] for i in reversed(path)]
+
+    def to_networkx(self):
+        """networkx view of the topology (eg for plotting)"""
+        graph = DiGraph()
+        graph.add_nodes_from(self.elements)
+        graph.add_edges_from(self.edges())
+        return graph
+
+def shortest_path(network, source, target):
+    """path with the fewest hops from source to target, on a Topology or a
+    networkx graph"""
+    if isinstance(network, Topology):
+        return network.shortest_path(source, target)
+    return dijkstra_path(network, source, target)
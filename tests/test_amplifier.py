@@ -4,12 +4,12 @@
 # @Date:   2018-02-02 14:06:55
 
 from gnpy.core.elements import Edfa
-from numpy import zeros, array
+from numpy import zeros, array, polyfit
 from json import load, dumps
 from gnpy.core.elements import Transceiver, Fiber, Edfa
 from gnpy.core.utils import lin2db, db2lin
 from gnpy.core.info import create_input_spectral_information, SpectralInformation, Channel, Power, Pref
-from gnpy.core.equipment import load_equipment
+from gnpy.core.equipment import load_equipment, edfa_nf, edfa_nf_table
 from gnpy.core.network import build_network, load_network, set_roadm_loss
 from pathlib import Path
 import pytest
@@ -151,3 +151,42 @@ def test_ase_noise(gain, si, setup_edfa_variable_gain, setup_trx, bw):
     si = trx(si)
     osnr = trx.osnr_ase_01nm[0]
     assert pytest.approx(osnr_expected, abs=0.01) == osnr
+
+def test_interpol_cache(setup_edfa_variable_gain, si):
+    """grid dependent vectors are interpolated once per channel grid"""
+    edfa = setup_edfa_variable_gain
+    frequencies = array([c.frequency for c in si.carriers])
+    pin = array([c.power.signal for c in si.carriers])
+    baud_rates = array([c.baud_rate for c in si.carriers])
+    edfa.interpol_params(frequencies, pin, baud_rates, Pref(0, 0))
+    dgt, slope = edfa.interpol_dgt, edfa.interpol_dgt_slope
+    edfa.interpol_params(frequencies, pin * 2, baud_rates, Pref(0, 0))
+    assert edfa.interpol_dgt is dgt
+    assert len(edfa._interpol_cache) == 1
+
+    edfa.interpol_params(frequencies + 12.5e9, pin, baud_rates, Pref(0, 0))
+    assert edfa.interpol_dgt is not dgt
+    assert len(edfa._interpol_cache) == 2
+    assert slope == pytest.approx(polyfit(range(len(dgt)), dgt, 1)[0])
+
+@pytest.mark.parametrize("gain", [-5, 0, 8, 14.6, 20, 26.3, 35])
+def test_edfa_nf_table(gain):
+    """the noise figure table gives the noise figure of edfa_nf for every
+    variety allowed for design: variable gain, fixed gain and polynomial fit"""
+    equipment = load_equipment(eqpt_library)
+    table = edfa_nf_table(equipment)
+    assert table is edfa_nf_table(equipment)
+    assert table.varieties == [v for v, amp in equipment['Edfa'].items() if amp.allowed_for_design]
+    for variety, nf in zip(table.varieties, table.nf(gain)):
+        assert nf == pytest.approx(edfa_nf(gain, variety, equipment), abs=1e-12)
+
+def test_edfa_nf_table_update():
+    """the table follows the changes of the amplifier library"""
+    # loaded libraries are read-only: a modifiable copy
+    equipment = load_equipment(eqpt_library)
+    equipment = {**equipment, 'Edfa': dict(equipment['Edfa'])}
+    table = edfa_nf_table(equipment)
+    variety = table.varieties[0]
+    equipment['Edfa'][variety] = equipment['Edfa'][variety]._replace(allowed_for_design=False)
+    assert edfa_nf_table(equipment) is not table
+    assert variety not in edfa_nf_table(equipment).varieties
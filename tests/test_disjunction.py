@@ -0,0 +1,104 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+from pathlib import Path
+from itertools import combinations
+import pytest
+from networkx import DiGraph
+from gnpy.core.elements import Transceiver, Roadm
+from gnpy.core.equipment import load_equipment, trx_mode_params
+from gnpy.core.network import load_network, build_network
+from gnpy.core.request import (Path_request, Disjunction, roadm_graph, disjoint_paths,
+                               compute_disjoint_paths)
+
+TEST_DIR = Path(__file__).parent
+DATA_DIR = TEST_DIR / 'data'
+eqpt_library = DATA_DIR / 'eqpt_config.json'
+
+def trap():
+    """the shortest path A-B-C-D leaves no disjoint path: the shortest pair
+    is A-B-D and A-C-D"""
+    graph = DiGraph()
+    for u, v, weight in [('A', 'B', 1), ('B', 'C', 1), ('C', 'D', 1),
+                         ('A', 'C', 2), ('B', 'D', 2)]:
+        graph.add_edge(u, v, weight=weight)
+        graph.add_edge(v, u, weight=weight)
+    return graph
+
+def test_disjoint_paths():
+    graph = trap()
+    assert sorted(disjoint_paths(graph, 'A', 'D')) == [['A', 'B', 'D'], ['A', 'C', 'D']]
+    assert disjoint_paths(graph, 'A', 'D', k=3) is None
+    graph.remove_edge('A', 'C')
+    assert disjoint_paths(graph, 'A', 'D') is None
+
+def test_link_diverse_paths():
+    """two paths through the same node, on different links"""
+    graph = DiGraph()
+    for u, v in [('A', 'B'), ('A', 'B2'), ('B', 'C'), ('B2', 'C'),
+                 ('C', 'D'), ('C', 'D2'), ('D', 'E'), ('D2', 'E')]:
+        graph.add_edge(u, v, weight=1)
+    assert disjoint_paths(graph, 'A', 'E') is None
+    paths = disjoint_paths(graph, 'A', 'E', node_diverse=False)
+    assert sorted(paths) == [['A', 'B', 'C', 'D', 'E'], ['A', 'B2', 'C', 'D2', 'E']] or \
+        sorted(paths) == [['A', 'B', 'C', 'D2', 'E'], ['A', 'B2', 'C', 'D', 'E']]
+
+@pytest.fixture()
+def coronet():
+    equipment = load_equipment(eqpt_library)
+    network = load_network(DATA_DIR / 'CORONET_Global_Topology.xls', equipment)
+    build_network(network, equipment, 0, 20)
+    yield network, equipment
+    (DATA_DIR / 'CORONET_Global_Topology.json').unlink()
+
+def test_compute_disjoint_paths(coronet):
+    network, equipment = coronet
+    graph = roadm_graph(network)
+    params = {'trx_type': '', 'trx_mode': '', 'format': '', 'nodes_list': [], 'loose_list': []}
+    params.update(trx_mode_params(equipment))
+    disjunction = Disjunction(disjunction_id=0, relaxable='False', link_diverse='True',
+                              node_diverse='True', disjunctions_req=[0, 1])
+    transceivers = sorted(n.uid for n in network if isinstance(n, Transceiver))[:8]
+    for source, destination in combinations(transceivers, 2):
+        reqs = [Path_request(**params, request_id=0, source=source, destination=destination),
+                Path_request(**params, request_id=1, source=destination, destination=source)]
+        routes = compute_disjoint_paths(network, reqs, disjunction, graph)
+        if routes is None:
+            continue
+        working, protection = routes[0], routes[1]
+        assert (working[0].uid, working[-1].uid) == (source, destination)
+        assert (protection[0].uid, protection[-1].uid) == (destination, source)
+        for path in routes.values():
+            assert all(network.has_edge(u, v) for u, v in zip(path[:-1], path[1:]))
+        # node diverse: no common roadm but the add/drop ones
+        roadms = [{n for n in path[2:-2] if isinstance(n, Roadm)} for path in (working, protection)]
+        assert roadms[0].isdisjoint(roadms[1])
+        assert len(working) <= len(protection)
+
+def test_disjoint_paths_transceiver_transit():
+    """disjoint paths do not go through other transceivers: here, the only
+    second path from roadm A to roadm B is through trx X"""
+    equipment = load_equipment(eqpt_library)
+    trx_a, trx_b, trx_x = (Transceiver(uid=f'trx {c}') for c in 'ABX')
+    roadm_a, roadm_b, roadm_c = (Roadm(uid=f'roadm {c}') for c in 'ABC')
+    network = DiGraph()
+    for u, v in [(trx_a, roadm_a), (trx_b, roadm_b), (roadm_a, roadm_b),
+                 (roadm_a, trx_x), (trx_x, roadm_b)]:
+        network.add_edge(u, v)
+        network.add_edge(v, u)
+    params = {'trx_type': '', 'trx_mode': '', 'format': '', 'nodes_list': [], 'loose_list': []}
+    params.update(trx_mode_params(equipment))
+    reqs = [Path_request(**params, request_id=0, source='trx A', destination='trx B'),
+            Path_request(**params, request_id=1, source='trx A', destination='trx B')]
+    disjunction = Disjunction(disjunction_id=0, relaxable='False', link_diverse='True',
+                              node_diverse='True', disjunctions_req=[0, 1])
+    graph = roadm_graph(network)
+    assert disjoint_paths(graph, roadm_a, roadm_b) is not None
+    assert compute_disjoint_paths(network, reqs, disjunction, graph) is None
+
+    # a second path through roadm C
+    network.add_edge(roadm_a, roadm_c)
+    network.add_edge(roadm_c, roadm_b)
+    routes = compute_disjoint_paths(network, reqs, disjunction)
+    assert [[n.uid for n in path] for path in routes.values()] == \
+        [['trx A', 'roadm A', 'roadm B', 'trx B'], ['trx A', 'roadm A', 'roadm C', 'roadm B', 'trx B']]
@@ -0,0 +1,78 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+from pathlib import Path
+from shutil import copyfile
+from os import utime
+from json import loads, dumps
+import pytest
+from gnpy.core import equipment as equipment_module
+from gnpy.core.equipment import load_equipment, equipment_files, equipment_fingerprint
+
+DATA_DIR = Path(__file__).parent / 'data'
+EQUIPMENT_FILES = ('eqpt_config.json', 'default_edfa_config.json',
+                   'std_medium_gain_advanced_config.json')
+
+@pytest.fixture()
+def eqpt_library(tmp_path):
+    for name in EQUIPMENT_FILES:
+        copyfile(DATA_DIR / name, tmp_path / name)
+    return tmp_path / 'eqpt_config.json'
+
+def touch(filename):
+    mtime = filename.stat().st_mtime_ns + 1
+    utime(filename, ns=(mtime, mtime))
+
+def test_equipment_files(eqpt_library):
+    files = equipment_files(eqpt_library, loads(eqpt_library.read_text()))
+    names = 'eqpt_config.json', 'std_medium_gain_advanced_config.json', 'default_edfa_config.json'
+    assert files == [(eqpt_library.parent / name).resolve() for name in names]
+
+def test_load_equipment(eqpt_library):
+    """the library is loaded again when one of its files changes"""
+    equipment = load_equipment(eqpt_library)
+    assert load_equipment(eqpt_library) is equipment
+    with pytest.raises(TypeError):
+        equipment['Spans']['default'] = None
+    with pytest.raises(TypeError):
+        equipment.pop('Edfa')
+
+    touch(eqpt_library.parent / 'default_edfa_config.json')
+    reloaded = load_equipment(eqpt_library)
+    assert reloaded is not equipment
+    assert equipment_fingerprint(reloaded) == equipment_fingerprint(equipment)
+
+    json_data = loads(eqpt_library.read_text())
+    json_data['Spans'][0]['padding'] += 1
+    eqpt_library.write_text(dumps(json_data))
+    touch(eqpt_library)
+    modified = load_equipment(eqpt_library)
+    assert modified['Spans']['default'].padding == equipment['Spans']['default'].padding + 1
+
+def test_equipment_pickle(eqpt_library, tmp_path, monkeypatch):
+    """the pickled library is used by a new process while the content of
+    the equipment files is unchanged"""
+    cache_filename = tmp_path / 'equipment.pickle'
+    equipment = load_equipment(eqpt_library, cache_filename)
+    assert cache_filename.exists()
+
+    def equipment_from_json(json_data, filename):
+        raise AssertionError('the pickled library is not used')
+    # a new process
+    monkeypatch.setattr(equipment_module, '_libraries', {})
+    with monkeypatch.context() as m:
+        m.setattr(equipment_module, 'equipment_from_json', equipment_from_json)
+        cached = load_equipment(eqpt_library, cache_filename)
+    assert equipment_fingerprint(cached) == equipment_fingerprint(equipment)
+    with pytest.raises(TypeError):
+        cached['Edfa'].clear()
+
+    # another content: the pickle is outdated
+    advanced_config = eqpt_library.parent / 'std_medium_gain_advanced_config.json'
+    json_data = loads(advanced_config.read_text())
+    json_data['nf_fit_coeff'][-1] += 1
+    advanced_config.write_text(dumps(json_data))
+    monkeypatch.setattr(equipment_module, '_libraries', {})
+    modified = load_equipment(eqpt_library, cache_filename)
+    assert modified['Edfa']['CienaDB_medium_gain'].nf_fit_coeff[-1] == \
+        equipment['Edfa']['CienaDB_medium_gain'].nf_fit_coeff[-1] + 1
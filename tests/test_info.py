@@ -0,0 +1,50 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+import pytest
+from gnpy.core.elements import Roadm
+from gnpy.core.info import create_input_spectral_information, SpectralInformation, Channel, Power, Pref
+
+@pytest.fixture()
+def si():
+    return create_input_spectral_information(191.3e12, 0.15, 32e9, 1e-3, 50e9, 96)
+
+def test_carriers_view(si):
+    """the compatibility view exposes the arrays as Channel namedtuples"""
+    carriers = si.carriers
+    assert len(carriers) == len(si) == 96
+    assert carriers[0] == Channel(1, 191.35e12, 32e9, 0.15, Power(1e-3, 0, 0))
+    assert carriers[-1].power.nli == si.nli[-1]
+    assert [c.frequency for c in carriers] == si.frequency.tolist()
+
+def test_carriers_batched_sweep():
+    """the channels of a batched power sweep are not mixed with its power levels"""
+    si = create_input_spectral_information(191.3e12, 0.15, 32e9, [1e-3, 2e-3], 50e9, 3)
+    assert si.signal.shape == (2, 3)
+    with pytest.raises(ValueError):
+        si.carriers
+
+def test_update_carriers(si):
+    """an SI built from Channel namedtuples holds the same arrays"""
+    rebuilt = SpectralInformation(si.pref, *si.carriers)
+    for field in SpectralInformation._FIELDS:
+        assert getattr(rebuilt, field).tolist() == getattr(si, field).tolist()
+    si2 = si.update(carriers=tuple(c.update(power=c.power.update(nli=c.power.signal * 1e-3))
+                                   for c in si.carriers))
+    assert si2.nli == pytest.approx(si.signal * 1e-3)
+    assert not si.nli.any()
+
+def test_read_only(si):
+    with pytest.raises(ValueError):
+        si.signal[0] = 0
+    with pytest.raises(ValueError):
+        si.update(power=0)
+
+def test_element_arrays(si):
+    """elements propagate the whole comb with array arithmetic"""
+    roadm = Roadm(uid='roadm', params={'loss': 20})
+    si2 = roadm(si.update(ase=si.signal * 1e-3))
+    assert si2.signal == pytest.approx(si.signal / 100)
+    assert si2.ase == pytest.approx(si.signal * 1e-5)
+    assert si2.pref == Pref(0, -20)
+    assert roadm.pch_out == -20
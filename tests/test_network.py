@@ -0,0 +1,268 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+from pathlib import Path
+from shutil import copyfile
+from copy import deepcopy
+import pytest
+import gnpy.core.network
+from networkx import dijkstra_path
+from gnpy.core.elements import Transceiver, Roadm, Edfa, Fiber, Fused
+from gnpy.core.equipment import load_equipment, trx_mode_params, equipment_fingerprint
+from gnpy.core.network import (load_network, build_network, network_from_json, network_index,
+                               invalidate_network_index,
+                               network_to_json, save_network, auto_design_filename,
+                               DesignCache, IncrementalDesign, FusedSpans, add_connector_loss,
+                               prev_node_generator, next_node_generator)
+from gnpy.core.request import Path_request, propagate
+
+TEST_DIR = Path(__file__).parent
+DATA_DIR = TEST_DIR / 'data'
+eqpt_library = DATA_DIR / 'eqpt_config.json'
+
+@pytest.fixture()
+def network():
+    equipment = load_equipment(eqpt_library)
+    network = load_network(DATA_DIR / 'meshTopologyExampleV2Eqpt.xls', equipment)
+    build_network(network, equipment, 0, 20)
+    yield network
+    (DATA_DIR / 'meshTopologyExampleV2Eqpt.json').unlink()
+
+@pytest.fixture()
+def unbuilt_network():
+    """returns a function loading a new copy of the network, not yet designed"""
+    equipment = load_equipment(eqpt_library)
+    yield lambda: (load_network(DATA_DIR / 'meshTopologyExampleV2.xls', equipment), equipment)
+    (DATA_DIR / 'meshTopologyExampleV2.json').unlink()
+
+def scan(network, n):
+    """constraint resolution by linear search over the network elements"""
+    for cls, match in ((Transceiver, lambda uid: uid == n),
+                       (Roadm, lambda uid: uid == f'roadm {n}'),
+                       (Edfa, lambda uid: uid.startswith(f'egress edfa in {n}'))):
+        try:
+            return next(el for el in network.nodes() if isinstance(el, cls) and match(el.uid))
+        except StopIteration:
+            pass
+
+def test_network_index(network):
+    """the index resolves constraints as the linear scans did"""
+    index = network_index(network)
+    assert index is network_index(network)
+    cities = {el.location.city for el in network.nodes()}
+    constraints = cities | {el.uid for el in network.nodes()} | {'Lann', 'unknown'}
+    for n in constraints:
+        assert index.constraint_node(n) is scan(network, n)
+    assert index.constraint_node('unknown') is None
+    assert len(index.transceivers) == len([n for n in network if isinstance(n, Transceiver)])
+
+def test_network_index_rebuild(network):
+    """the index is rebuilt once invalidated, also when the number of
+    elements and connections is unchanged"""
+    index = network_index(network)
+    trx = network_index(network).transceivers['trx Lannion_CAS']
+    trx.uid = 'trx new'
+    invalidate_network_index(network)
+    assert network_index(network) is not index
+    assert network_index(network).transceivers['trx new'] is trx
+    assert 'trx Lannion_CAS' not in network_index(network).transceivers
+
+def test_network_index_design(unbuilt_network):
+    """the design invalidates the index of the elements it replaces"""
+    network, equipment = unbuilt_network()
+    index = network_index(network)
+    build_network(network, equipment, 0, 20)
+    assert network_index(network) is not index
+    assert set(network_index(network).nodes.values()) == set(network)
+
+def padded(equipment):
+    """the equipment library with another span padding"""
+    spans = equipment['Spans']['default']._replace(padding=15)
+    return {**equipment, 'Spans': {**equipment['Spans'], 'default': spans}}
+
+def test_design_cache(unbuilt_network):
+    """a design restored from the cache is the one build_network gives on
+    the initial network"""
+    network, equipment = unbuilt_network()
+    designs = DesignCache(network, equipment)
+    powers = [(0, 19.8), (3, 22.8), (0, 19.8), (3, 22.8)]
+    for pref_ch_db, pref_total_db in powers:
+        designs.design(pref_ch_db, pref_total_db)
+        expected, _ = unbuilt_network()
+        build_network(expected, equipment, pref_ch_db, pref_total_db)
+        assert network_to_json(network) == network_to_json(expected)
+    assert designs.cache_info() == (2, 2, 2)
+
+    # the equipment is part of the design key
+    designs.equipment = padded(equipment)
+    designs.design(0, 19.8)
+    assert designs.cache_info() == (2, 3, 3)
+
+def test_design_cache_fingerprint(unbuilt_network, monkeypatch):
+    """the equipment library is hashed once, not at every design lookup"""
+    network, equipment = unbuilt_network()
+    fingerprints = []
+    def counted_fingerprint(equipment):
+        fingerprints.append(equipment)
+        return equipment_fingerprint(equipment)
+    monkeypatch.setattr(gnpy.core.network, 'equipment_fingerprint', counted_fingerprint)
+    designs = DesignCache(network, equipment)
+    designs.design(0, 19.8)
+    misses = len(fingerprints)
+    for _ in range(3):
+        designs.design(0, 19.8)
+    assert len(fingerprints) == misses
+    assert network.graph['auto_design']['equipment'] == equipment_fingerprint(equipment)
+
+def snr(network, equipment, source, destination):
+    transceivers = network_index(network).transceivers
+    path = dijkstra_path(network, transceivers[source], transceivers[destination])
+    params = {'request_id': 0, 'trx_type': '', 'trx_mode': '', 'format': '',
+              'source': source, 'destination': destination, 'nodes_list': [], 'loose_list': []}
+    params.update(trx_mode_params(equipment))
+    propagate(path, Path_request(**params), equipment)
+    return list(path[-1].snr)
+
+def test_auto_design(tmp_path):
+    """the saved auto-design is loaded instead of the topology when the
+    topology file, the equipment and the design powers are unchanged"""
+    equipment = load_equipment(eqpt_library)
+    filename = tmp_path / 'LinkforTest.json'
+    copyfile(TEST_DIR / 'LinkforTest.json', filename)
+    network = load_network(filename, equipment, 0, 20)
+    assert 'auto_design' not in network.graph
+    build_network(network, equipment, 0, 20)
+    save_network(filename, network)
+    expected = snr(network, equipment, 'trx A', 'trx F')
+
+    cached = load_network(filename, equipment, 0, 20)
+    assert cached.graph['auto_design'] == network.graph['auto_design']
+    assert network_to_json(cached) == network_to_json(network)
+    nodes = cached.number_of_nodes()
+    build_network(cached, equipment, 0, 20)
+    assert cached.number_of_nodes() == nodes
+    assert snr(cached, equipment, 'trx A', 'trx F') == pytest.approx(expected, abs=1e-9)
+
+    # another design power, equipment or topology file: designed again
+    assert 'auto_design' not in load_network(filename, equipment, 1, 21).graph
+    assert 'auto_design' not in load_network(filename, padded(equipment), 0, 20).graph
+    equipment = load_equipment(eqpt_library)
+    filename.write_text(filename.read_text() + '\n')
+    assert 'auto_design' not in load_network(filename, equipment, 0, 20).graph
+    assert Path(auto_design_filename(filename)).exists()
+
+def design(network):
+    """element settings, connections and successors of a designed network"""
+    return ({n.uid: (n.to_json, getattr(n, 'dp_db', None)) for n in network},
+            {(u.uid, v.uid) for u, v in network.edges()},
+            {n.uid: [s.uid for s in network.successors(n)] for n in network})
+
+def connection(from_node, to_node):
+    return {'from_node': from_node, 'to_node': to_node}
+
+@pytest.mark.parametrize('changes, redesigned', [
+    ({'elements': [{'uid': 'fiber (Corlay → Loudeac)-F010', 'params': {'length': 150}}]},
+     [('roadm Lannion_CAS', 'egress edfa in Lannion_CAS to Corlay')]),
+    ({'elements': [{'uid': 'fiber (Lannion_CAS → Stbrieuc)-F056', 'params': {'con_in': 1.5}},
+                   {'uid': 'fiber (Stbrieuc → Lannion_CAS)-F056', 'params': {'length': 20}}]},
+     [('roadm Lannion_CAS', 'fiber (Lannion_CAS → Stbrieuc)-F056'),
+      ('roadm Rennes_STA', 'fiber (Rennes_STA → Stbrieuc)-F057')]),
+    ({'elements': [{'uid': 'egress edfa in Lorient_KMA to Loudeac', 'type_variety': 'std_low_gain'}]},
+     [('roadm Lorient_KMA', 'egress edfa in Lorient_KMA to Loudeac')]),
+    ({'elements': [{'uid': 'ingress fused spans in Corlay', 'params': {'loss': 3}}]},
+     [('roadm Lannion_CAS', 'egress edfa in Lannion_CAS to Corlay')]),
+    ({'elements': [{'uid': 'roadm toto', 'params': {'loss': 25}}]},
+     [('roadm toto', 'fiber (toto → tata)-')]),
+    ({'removed_connections': [connection('fiber (toto → tata)-', 'roadm tata')],
+      'connections': [connection('fiber (toto → tata)-', 'roadm Brest_KLA')]},
+     [('roadm toto', 'fiber (toto → tata)-')]),
+    ({'connections': [connection('roadm toto', 'roadm tata')]},
+     [('roadm toto', 'roadm tata')]),
+])
+def test_incremental_design(changes, redesigned):
+    """only the OMS touched by the changes are designed again, and the
+    design is the one of build_network"""
+    equipment = load_equipment(eqpt_library)
+    network = load_network(DATA_DIR / 'meshTopologyExampleV2Eqpt.xls', equipment)
+    (DATA_DIR / 'meshTopologyExampleV2Eqpt.json').unlink()
+    designs = IncrementalDesign(network, equipment, 0, 20)
+    assert designs.apply(changes) == redesigned
+    assert (designs.redesigns, designs.rebuilds) == (1, 0)
+    expected = deepcopy(designs.topology)
+    build_network(expected, equipment, 0, 20)
+    assert design(network) == design(expected)
+    assert network_index(network).nodes.keys() == network_index(expected).nodes.keys()
+
+def test_incremental_rebuild():
+    """lines that branch out or end without roadm are designed again whole"""
+    equipment = load_equipment(eqpt_library)
+    network = load_network(DATA_DIR / 'meshTopologyExampleV2Eqpt.xls', equipment)
+    (DATA_DIR / 'meshTopologyExampleV2Eqpt.json').unlink()
+    designs = IncrementalDesign(network, equipment, 0, 20)
+    designs.apply({'removed_connections': [connection('roadm toto', 'fiber (toto → tata)-')]})
+    assert (designs.redesigns, designs.rebuilds) == (0, 1)
+    expected = deepcopy(designs.topology)
+    build_network(expected, equipment, 0, 20)
+    assert design(network) == design(expected)
+
+    with pytest.raises(ValueError):
+        designs.apply({'elements': [{'uid': 'Edfa0_roadm toto', 'params': {}}]})
+    with pytest.raises(ValueError):
+        designs.apply({'elements': [{'uid': 'roadm toto', 'type': 'Fused'}]})
+
+def fused_chain(equipment, n_spans):
+    """roadm A - fiber - fused - ... - fiber - roadm B"""
+    elements = [{'uid': 'roadm A', 'type': 'Roadm'}, {'uid': 'roadm B', 'type': 'Roadm'}]
+    connections = []
+    prev_node = 'roadm A'
+    for i in range(n_spans):
+        elements.append({'uid': f'fiber {i}', 'type': 'Fiber', 'type_variety': 'SSMF',
+                         'params': {'length': 5, 'length_units': 'km', 'loss_coef': 0.2}})
+        connections.append((prev_node, f'fiber {i}'))
+        prev_node = f'fiber {i}'
+        if i < n_spans - 1:
+            elements.append({'uid': f'fused {i}', 'type': 'Fused', 'params': {'loss': 0.5}})
+            connections.append((prev_node, f'fused {i}'))
+            prev_node = f'fused {i}'
+    connections.append((prev_node, 'roadm B'))
+    return network_from_json({'elements': elements,
+                              'connections': [{'from_node': u, 'to_node': v} for u, v in connections]},
+                             equipment)
+
+def test_fused_spans():
+    """the chains of the index are the ones of the node generators"""
+    equipment = load_equipment(eqpt_library)
+    network = load_network(DATA_DIR / 'excelTestFile.xls', equipment)
+    (DATA_DIR / 'excelTestFile.json').unlink()
+    build_network(network, equipment, 0, 20)
+    spans = FusedSpans(network)
+    assert any(isinstance(n, Fused) for n in network)
+    for node in network:
+        prev_nodes = list(prev_node_generator(network, node))
+        next_nodes = list(next_node_generator(network, node))
+        assert spans.first_node(node) is (prev_nodes[-1] if prev_nodes else node)
+        assert spans.last_node(node) is (next_nodes[-1] if next_nodes else node)
+        if isinstance(node, Fiber):
+            assert spans.loss_before(node) == pytest.approx(sum(n.loss for n in prev_nodes))
+            assert spans.loss_after(node) == pytest.approx(sum(n.loss for n in next_nodes))
+
+def test_long_fused_chain():
+    """a long succession of fused spans is walked without recursion and
+    padded once, at its first fiber"""
+    equipment = load_equipment(eqpt_library)
+    network = fused_chain(equipment, 2000)
+    add_connector_loss([n for n in network if isinstance(n, Fiber)], 0, 0, 0)
+    spans = FusedSpans(network)
+    last = next(n for n in network if n.uid == 'fiber 1999')
+    assert spans.first_node(last).uid == 'fiber 0'
+    assert spans.last_node(next(n for n in network if n.uid == 'fiber 0')).uid == 'fiber 1999'
+    assert spans.span_loss(last) == pytest.approx(2000 * 5 * 0.2 + 1999 * 0.5)
+
+    network = fused_chain(equipment, 3)
+    build_network(network, equipment, 0, 20)
+    fibers = {n.uid: n for n in network if isinstance(n, Fiber)}
+    padding = equipment['Spans']['default'].padding
+    span_loss = sum(f.loss for f in fibers.values()) + 2 * 0.5
+    assert fibers['fiber 0'].att_in > 0
+    assert fibers['fiber 1'].att_in == fibers['fiber 2'].att_in == 0
+    assert span_loss == pytest.approx(padding)
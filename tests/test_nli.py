@@ -0,0 +1,74 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+from numpy import array
+from pathlib import Path
+import pytest
+from gnpy.core.elements import Fiber, nli_cache_info, nli_cache_clear
+from gnpy.core.info import create_input_spectral_information
+from gnpy.core.equipment import load_equipment
+
+TEST_DIR = Path(__file__).parent
+DATA_DIR = TEST_DIR / 'data'
+eqpt_library = DATA_DIR / 'eqpt_config.json'
+
+@pytest.fixture(
+    params=[(96, 0.05e12), (60, 0.075e12), (45, 0.1e12), (2, 0.1e12)],
+    ids=['50GHz spacing', '75GHz spacing', '100GHz spacing', '2 channels'])
+def nch_and_spacing(request):
+    """parametrize channel count vs channel spacing (Hz)"""
+    yield request.param
+
+@pytest.fixture()
+def fiber():
+    """80km SSMF span with the fiber parameters of the eqpt library"""
+    equipment = load_equipment(eqpt_library)
+    params = {'length': 80, 'length_units': 'km', 'loss_coef': 0.2,
+              'con_in': 0, 'con_out': 0,
+              **equipment['Fiber']['SSMF']._asdict()}
+    return Fiber(uid='test fiber', params=params)
+
+@pytest.fixture()
+def si(nch_and_spacing):
+    nb_channel, spacing = nch_and_spacing
+    return create_input_spectral_information(191.3e12, 0.15, 32e9, 1e-3, spacing, nb_channel)
+
+def test_gn_analytic_vector(fiber, si):
+    """the psi matrix NLI engine matches the carrier by carrier eq. 120"""
+    carriers = si.carriers
+    expected = array([fiber._gn_analytic(c, *carriers) for c in carriers])
+    result = fiber._gn_analytic_vector(
+        array([c.channel_number for c in carriers]),
+        array([c.frequency for c in carriers]),
+        array([c.baud_rate for c in carriers]),
+        array([c.power.signal for c in carriers]))
+    assert result == pytest.approx(expected, rel=1e-12)
+
+def test_psi_matrix(fiber, si):
+    """SCI on the diagonal and XCI elsewhere, as computed by _psi"""
+    carriers = si.carriers
+    psi = fiber._psi_matrix(
+        array([c.channel_number for c in carriers]),
+        array([c.frequency for c in carriers]),
+        array([c.baud_rate for c in carriers]))
+    for i, carrier in enumerate(carriers):
+        for j, interfering_carrier in enumerate(carriers):
+            assert psi[i, j] == pytest.approx(fiber._psi(carrier, interfering_carrier), rel=1e-12)
+
+def test_nli_cache(fiber, si):
+    """spans with the same parameters and channel grid share their psi matrix
+    whatever the launch power"""
+    nli_cache_clear()
+    arrays = si.channel_number, si.frequency, si.baud_rate
+    nli = fiber._gn_analytic_vector(*arrays, si.signal)
+    assert nli_cache_info()[:2] == (0, 1)
+
+    twin = Fiber(uid='twin fiber', params=fiber.params._asdict())
+    nli_4db = twin._gn_analytic_vector(*arrays, si.signal * 2.5)
+    assert nli_cache_info()[:2] == (1, 1)
+    assert nli_4db == pytest.approx(nli * 2.5**3, rel=1e-12)
+
+    twin.length /= 2
+    twin._gn_analytic_vector(*arrays, si.signal)
+    assert nli_cache_info()[:2] == (1, 2)
+    assert nli_cache_info().currsize == 2
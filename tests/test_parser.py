@@ -5,18 +5,22 @@
 
 from gnpy.core.elements import Edfa
 import numpy as np
-from json import load
+from json import load, dumps
 import pytest
 from gnpy.core import network_from_json
 from gnpy.core.elements import Transceiver, Fiber, Edfa
 from gnpy.core.utils import lin2db, db2lin
 from gnpy.core.info import SpectralInformation, Channel, Power
 from tests.compare import compare_networks, compare_services
-from gnpy.core.convert import convert_file
+from gnpy.core.convert import convert_file, CONVERTER_VERSION
+from gnpy.core import service_sheet
 from gnpy.core.service_sheet import convert_service_sheet
+from gnpy.core.equipment import load_equipment
 from pathlib import Path
 import filecmp
-from os import unlink
+from os import unlink, utime
+from shutil import copyfile
+from concurrent.futures import ThreadPoolExecutor
 
 TEST_DIR = Path(__file__).parent
 DATA_DIR = TEST_DIR / 'data'
@@ -79,3 +83,74 @@ def test_excel_service_json_generation(xls_input, expected_json_output):
     assert not results.synchronizations.missing
     assert not results.synchronizations.extra
     assert not results.synchronizations.different
+
+def test_excel_json_cache(tmp_path):
+    """the JSON file is only generated again when it is outdated"""
+    xls_input = tmp_path / 'excelTestFile.xls'
+    copyfile(DATA_DIR / 'excelTestFile.xls', xls_input)
+    json_output = Path(convert_file(xls_input))
+    mtime = json_output.stat().st_mtime_ns
+    assert Path(convert_file(xls_input)).stat().st_mtime_ns == mtime
+
+    # another region filter, a newer workbook, another converter version
+    convert_file(xls_input, ['rld'])
+    assert json_output.stat().st_mtime_ns != mtime
+    with open(json_output) as f:
+        assert load(f)['converter']['filter_region'] == ['rld']
+    convert_file(xls_input)
+    mtime = json_output.stat().st_mtime_ns
+    utime(xls_input, ns=(mtime + 1, mtime + 1))
+    convert_file(xls_input)
+    assert json_output.stat().st_mtime_ns != mtime
+    with open(json_output) as f:
+        data = load(f)
+    data['converter']['version'] -= 1
+    json_output.write_text(dumps(data))
+    convert_file(xls_input)
+    with open(json_output) as f:
+        assert load(f)['converter']['version'] == CONVERTER_VERSION
+
+def test_concurrent_excel_json_generation(tmp_path):
+    """conversions in threads give the same networks as one by one"""
+    inputs = {}
+    for name in ('excelTestFile', 'meshTopologyExampleV2', 'meshTopologyExampleV2Eqpt'):
+        inputs[name] = tmp_path / f'{name}.xls'
+        copyfile(DATA_DIR / f'{name}.xls', inputs[name])
+    with ThreadPoolExecutor(3) as executor:
+        outputs = list(executor.map(convert_file, inputs.values()))
+    for name, json_output in zip(inputs, outputs):
+        with open(json_output) as f:
+            actual = load(f)
+        with open(DATA_DIR / f'{name}_expected.json') as f:
+            expected = load(f)
+        results = compare_networks(expected, actual)
+        assert not results.elements.missing and not results.elements.extra
+        assert not results.connections.missing and not results.connections.extra
+
+def test_service_sheet_equipment_loaded_once(monkeypatch):
+    """the equipment library is loaded once for all the service rows"""
+    loads = []
+    def counted_load_equipment(filename):
+        loads.append(filename)
+        return load_equipment(filename)
+    monkeypatch.setattr(service_sheet, 'load_equipment', counted_load_equipment)
+    xls_input = DATA_DIR / 'meshTopologyExampleV2.xls'
+    output = DATA_DIR / 'meshTopologyExampleV2_services.json'
+    data = convert_service_sheet(xls_input, eqpt_filename)
+    unlink(output)
+    assert len(data['path-request']) > 1
+    assert loads == [eqpt_filename]
+
+@pytest.mark.parametrize('trx_type, mode', [
+    ('Voyager_16QAM', '16QAM'),
+    ('Voyager_16QAM', 'unknown mode'),
+    ('unknown type', '16QAM')])
+def test_service_sheet_transceiver_mode(trx_type, mode):
+    """requests for an unknown transceiver type or mode stop the conversion"""
+    equipment = load_equipment(eqpt_filename)
+    request = service_sheet.Request('1', 'a', 'b', trx_type, mode, 50, 0, 80)
+    if trx_type in equipment['Transceiver'] and mode == '16QAM':
+        assert service_sheet.Request_element(request, equipment).mode == mode
+    else:
+        with pytest.raises(SystemExit):
+            service_sheet.Request_element(request, equipment)
@@ -0,0 +1,66 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+from pathlib import Path
+from json import dumps, loads
+from contextlib import redirect_stdout
+from io import StringIO
+import pytest
+from gnpy.core.equipment import load_equipment
+from gnpy.core.network import load_network
+from gnpy.core.request import Result_element
+from examples.path_requests_run import (load_requests, requests_from_json, disjunctions_from_json,
+                                        requests_from_jsonl, compute_path, stream_path,
+                                        path_result_json)
+
+TEST_DIR = Path(__file__).parent
+DATA_DIR = TEST_DIR / 'data'
+eqpt_filename = DATA_DIR / 'eqpt_config.json'
+network_filename = DATA_DIR / 'meshTopologyExampleV2.xls'
+
+@pytest.fixture(scope='module')
+def services():
+    """equipment, a function loading a new copy of the network and the
+    path requests (JSON) of meshTopologyExampleV2.xls"""
+    equipment = load_equipment(eqpt_filename)
+    data = load_requests(network_filename, eqpt_filename)
+    yield equipment, lambda: load_network(network_filename, equipment), data
+    (DATA_DIR / 'meshTopologyExampleV2.json').unlink()
+    (DATA_DIR / 'meshTopologyExampleV2_services.json').unlink()
+
+def computed(services, jobs, synchronisation=True):
+    """path requests and JSON path results of compute_path with jobs"""
+    equipment, network, data = services
+    pathreqs = requests_from_json(data, equipment)
+    disjunctions = disjunctions_from_json(data) if synchronisation else ()
+    with redirect_stdout(StringIO()):
+        paths = compute_path(network(), equipment, pathreqs, jobs, disjunctions)
+    return pathreqs, path_result_json([Result_element(r, p) for r, p in zip(pathreqs, paths)])
+
+def test_parallel_compute_path(services):
+    """the results of worker processes are the serial ones, in request order"""
+    pathreqs, serial = computed(services, 1)
+    _, parallel = computed(services, 2)
+    assert [p['path-id'] for p in parallel['path']] == [r.request_id for r in pathreqs]
+    assert dumps(parallel, indent=2) == dumps(serial, indent=2)
+
+@pytest.mark.parametrize('jobs', [1, 2])
+def test_stream_path(services, tmp_path, monkeypatch, jobs):
+    """the JSONL results are written a line per request, in request order,
+    and are the results of compute_path"""
+    equipment, network, data = services
+    monkeypatch.chdir(tmp_path)
+    with open('requests.jsonl', 'w') as f:
+        for req in data['path-request']:
+            f.write(dumps(req) + '\n')
+    with redirect_stdout(StringIO()):
+        stream_path(network(), equipment, requests_from_jsonl(Path('requests.jsonl'), equipment),
+                    'results.jsonl', jobs)
+    with open('results.jsonl') as f:
+        lines = f.read().splitlines()
+    results = [loads(line) for line in lines]
+    assert [r['path-id'] for r in results] == [req['request-id'] for req in data['path-request']]
+    _, expected = computed(services, 1, synchronisation=False)
+    assert results == loads(dumps(expected['path']))
+    with open('results.csv') as f:
+        assert len(f.read().splitlines()) == len(results) + 1
@@ -0,0 +1,73 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+import sys
+from json import dumps, loads
+from threading import Thread
+from concurrent.futures import ThreadPoolExecutor
+from urllib.request import urlopen
+from urllib.error import HTTPError
+import pytest
+from examples.path_requests_server import PathComputationService, PathComputationServer
+from tests.test_path_requests import services, computed, eqpt_filename, network_filename
+
+@pytest.fixture(params=[1, 2], ids=['serial', 'jobs'])
+def server(request, services):
+    """a path computation server on an ephemeral port, in a thread"""
+    service = PathComputationService(network_filename, eqpt_filename, request.param)
+    server = PathComputationServer(('127.0.0.1', 0), service)
+    thread = Thread(target=server.serve_forever)
+    thread.start()
+    yield server
+    server.shutdown()
+    thread.join()
+    server.server_close()
+    service.close()
+
+def post(server, path, body):
+    """status and JSON reply of a POST to the server"""
+    url = f'http://127.0.0.1:{server.server_port}{path}'
+    try:
+        with urlopen(url, data=body.encode()) as response:
+            return response.status, loads(response.read())
+    except HTTPError as e:
+        with e:
+            return e.code, loads(e.read())
+
+def test_path_request(server, services):
+    """the results of the server are the ones of compute_path, before and
+    after a reload of the network"""
+    _, expected = computed(services, 1)
+    data = dumps(services[2])
+    assert post(server, '/path-request', data) == (200, expected)
+    assert post(server, '/reload', '') == (200, {'reloads': 1})
+    assert post(server, '/path-request', data) == (200, expected)
+
+def test_concurrent_path_requests(server, services):
+    """concurrent requests on the shared network, with a reload among them,
+    get the results of the requests computed one at a time"""
+    _, expected = computed(services, 1)
+    stdout = sys.stdout
+    data = dumps(services[2])
+    with ThreadPoolExecutor(4) as executor:
+        replies = [executor.submit(post, server, '/path-request', data) for _ in range(6)]
+        reload = executor.submit(post, server, '/reload', '')
+        replies += [executor.submit(post, server, '/path-request', data) for _ in range(2)]
+        assert reload.result() == (200, {'reloads': 1})
+        assert all(reply.result() == (200, expected) for reply in replies)
+    # the redirections of the requests did not overlap
+    assert sys.stdout is stdout
+
+@pytest.mark.parametrize('path, body, code', [
+    ('/path-request', '{"path-request": [', 400),
+    ('/path-request', '{"path-request": [{"request-id": "0"}]}', 400),
+    ('/path-request', '[]', 400),
+    ('/unknown', '{}', 404)])
+def test_path_request_errors(server, services, path, body, code):
+    """malformed requests are answered with an error, and the server
+    keeps computing the next ones"""
+    status, reply = post(server, path, body)
+    assert status == code
+    assert 'error' in reply
+    _, expected = computed(services, 1)
+    assert post(server, '/path-request', dumps(services[2])) == (200, expected)
@@ -0,0 +1,71 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+from pathlib import Path
+from itertools import islice
+import pytest
+from gnpy.core.elements import Transceiver
+from gnpy.core.equipment import load_equipment, trx_mode_params
+from gnpy.core.network import load_network, build_network
+from gnpy.core.request import (Path_request, compute_constrained_path, propagate, candidate_paths,
+                               search_feasible_path, compute_feasible_path, is_feasible, snr_01nm)
+
+TEST_DIR = Path(__file__).parent
+DATA_DIR = TEST_DIR / 'data'
+eqpt_library = DATA_DIR / 'eqpt_config.json'
+
+@pytest.fixture(scope='module')
+def coronet():
+    equipment = load_equipment(eqpt_library)
+    network = load_network(DATA_DIR / 'CORONET_Global_Topology.xls', equipment)
+    build_network(network, equipment, 0, 20)
+    yield network, equipment
+    (DATA_DIR / 'CORONET_Global_Topology.json').unlink()
+
+def request(equipment, source, destination):
+    params = {'request_id': 0, 'trx_type': '', 'trx_mode': '', 'format': '',
+              'source': source, 'destination': destination,
+              'nodes_list': [destination], 'loose_list': ['strict']}
+    params.update(trx_mode_params(equipment))
+    return Path_request(**params)
+
+def uids(path):
+    return [el.uid for el in path] if path is not None else None
+
+@pytest.mark.parametrize('source, destination', [('trx Chicago', 'trx New_York'),
+                                                 ('trx Mumbai', 'trx New_Orleans'),
+                                                 ('trx Minneapolis', 'trx Portland')])
+def test_search_feasible_path(coronet, source, destination):
+    """the search returns the first candidate meeting the OSNR threshold,
+    and compute_feasible_path the shortest path when there is none"""
+    network, equipment = coronet
+    req = request(equipment, source, destination)
+    shortest = compute_constrained_path(network, req)
+    candidates = list(islice(candidate_paths(network, req), 10))
+    assert uids(candidates[0]) == uids(shortest)
+    assert [len(c) for c in candidates] == sorted(len(c) for c in candidates)
+    snrs = []
+    for candidate in candidates:
+        propagate(candidate, req, equipment)
+        snrs.append(snr_01nm(candidate[-1].snr, req))
+    for osnr in (snrs[0] - 1, (snrs[0] + max(snrs)) / 2, max(snrs) + 1):
+        req.OSNR = osnr
+        expected = next((c for c, snr in zip(candidates[1:], snrs[1:]) if snr >= osnr), None)
+        path = search_feasible_path(network, req, equipment, exclude=[shortest])
+        assert uids(path) == uids(expected)
+        if path is not None:
+            assert is_feasible(path, req)
+        # the first feasible candidate, or the shortest one
+        i = next((i for i, snr in enumerate(snrs) if snr >= osnr), 0)
+        path = compute_feasible_path(network, req, equipment)
+        assert uids(path) == uids(candidates[i])
+        assert snr_01nm(path[-1].snr, req) == pytest.approx(snrs[i])
+
+def test_search_excluded_paths(coronet):
+    """the excluded paths do not count among the k candidates"""
+    network, equipment = coronet
+    req = request(equipment, 'trx Chicago', 'trx New_York')
+    candidates = list(islice(candidate_paths(network, req), 3))
+    req.OSNR = None
+    path = search_feasible_path(network, req, equipment, k=1, exclude=candidates[:2])
+    assert uids(path) == uids(candidates[2])
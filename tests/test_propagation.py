@@ -12,9 +12,15 @@ from gnpy.core.utils import lin2db, db2lin
 from gnpy.core.info import create_input_spectral_information, SpectralInformation, Channel, Power
 from gnpy.core.equipment import load_equipment
 from gnpy.core.network import build_network, load_network
+from gnpy.core.execute import CompiledPath, compile_path, PropagationCache, propagation_cache
+from gnpy.core.request import Path_request, Result_element, propagate, propagate_power_sweep, path_result
+from gnpy.core.equipment import trx_mode_params
 from pathlib import Path
 from networkx import dijkstra_path
 from numpy import mean
+from copy import deepcopy
+from weakref import ref
+from gc import collect
 
 #network_file_name = 'tests/test_network.json'
 network_file_name = Path(__file__).parent.parent / 'tests/LinkforTest.json'
@@ -90,6 +96,191 @@ def test_snr(osnr_test, dest):
     nli_diff = abs((nli-expected_nli)/nli)
     assert osnr_diff <0.01 and nli_diff<0.01
 
+@pytest.mark.parametrize("dest",['trx B','trx F'])
+def test_compiled_path(dest):
+    """the compiled operator pipeline gives the same results and element
+    state as calling every element of the path"""
+    equipment = load_equipment(eqpt_library_name)
+    network = load_network(network_file_name,equipment)
+    build_network(network, equipment, 0, 20)
+    transceivers = {n.uid: n for n in network.nodes() if isinstance(n, Transceiver)}
+    path = dijkstra_path(network, transceivers['trx A'], transceivers[dest])
+    si = create_input_spectral_information(191.3e12, 0.15, 32e9, 1e-3, 50e9, 80)
+
+    expected_si = si
+    for el in path:
+        expected_si = el(expected_si)
+    expected = [str(el) for el in path]
+
+    compiled = CompiledPath(path)
+    result_si = compiled(si)
+    assert [str(el) for el in path] == expected
+    assert result_si.signal == pytest.approx(expected_si.signal, rel=1e-9)
+    assert result_si.nli == pytest.approx(expected_si.nli, rel=1e-9)
+    assert result_si.ase == pytest.approx(expected_si.ase, rel=1e-9)
+    assert result_si.pref == pytest.approx(expected_si.pref)
+
+    # the compilation is reused by a cache until a loss changes
+    cache = PropagationCache()
+    assert compile_path(path, cache) is compile_path(path, cache)
+    assert compile_path(path) is not compile_path(path)
+    fiber = next(el for el in path if isinstance(el, Fiber))
+    previous = compile_path(path, cache)
+    fiber.att_in += 1
+    assert compile_path(path, cache) is not previous
+
+@pytest.mark.parametrize("network_file, source_uid, destination_uid, power_mode", [
+    (Path(__file__).parent / 'data/meshTopologyExampleV2.xls', 'trx Brest_KLA', 'trx Rennes_STA', True),
+    (network_file_name, 'trx A', 'trx F', True),
+    (network_file_name, 'trx A', 'trx F', False)])
+def test_power_sweep(network_file, source_uid, destination_uid, power_mode):
+    """a batched power sweep gives the same results and final element state
+    as propagating the power levels one by one"""
+    equipment = load_equipment(eqpt_library_name)
+    spans = equipment['Spans']['default']._replace(power_mode=power_mode)
+    equipment = {**equipment, 'Spans': {**equipment['Spans'], 'default': spans}}
+    params = {'request_id': 0, 'trx_type': '', 'trx_mode': '', 'format': '',
+              'source': source_uid, 'destination': destination_uid,
+              'nodes_list': [destination_uid], 'loose_list': ['strict'],
+              **trx_mode_params(equipment)}
+    powers_dbm = [-3, 0, 2, 6, 10]
+
+    def design():
+        # gain mode amplifiers keep their gain from one propagation to the next
+        network = load_network(network_file, equipment)
+        build_network(network, equipment, 0, 20)
+        transceivers = {n.uid: n for n in network.nodes() if isinstance(n, Transceiver)}
+        return dijkstra_path(network, transceivers[source_uid], transceivers[destination_uid])
+
+    path = design()
+    expected = []
+    for p_db in powers_dbm:
+        req = Path_request(**params)
+        req.power = db2lin(p_db) * 1e-3
+        propagate(path, req, equipment)
+        expected.append([mean(path[-1].osnr_ase_01nm), mean(path[-1].osnr_ase),
+                         mean(path[-1].osnr_nli), mean(path[-1].snr)])
+    expected_state = [str(el) for el in path]
+
+    path = design()
+    results = propagate_power_sweep(path, Path_request(**params), equipment, powers_dbm)
+    for result, values in zip(results, expected):
+        assert [result['OSNR_ASE_0.1nm'], result['OSNR_ASE_signal_bw'],
+                result['SNR_nli_signal_bw'], result['SNR_total_signal_bw']] \
+            == pytest.approx(values, abs=0.006)
+    assert [str(el) for el in path] == expected_state
+    if network_file.suffix == '.xls':
+        network_file.with_suffix('.json').unlink()
+
+def test_path_result():
+    """a path result keeps the destination results of its own propagation
+    and gives the same json result as the propagated elements"""
+    equipment = load_equipment(eqpt_library_name)
+    network = load_network(network_file_name, equipment)
+    build_network(network, equipment, 0, 20)
+    transceivers = {n.uid: n for n in network.nodes() if isinstance(n, Transceiver)}
+    params = {'request_id': 0, 'trx_type': '', 'trx_mode': '', 'format': '',
+              'source': 'trx A', 'destination': 'trx F',
+              'nodes_list': ['trx F'], 'loose_list': ['strict'],
+              **trx_mode_params(equipment)}
+    req = Path_request(**params)
+    path = propagate(dijkstra_path(network, transceivers['trx A'], transceivers['trx F']),
+                     req, equipment)
+    result = path_result(path, summaries=True)
+    assert result.hops == tuple(el.uid for el in path)
+    assert result.summaries == tuple(str(el) for el in path)
+    assert Result_element(req, result).json == Result_element(req, path).json
+    with pytest.raises(ValueError):
+        result.snr[0] = 0
+
+    snr = path[-1].snr.copy()
+    req.power = db2lin(3) * 1e-3
+    propagate(path, req, equipment)
+    assert (result.snr == snr).all() and (path[-1].snr != snr).any()
+
+    assert not path_result([])
+    assert Result_element(req, path_result([])).json['path-properties']['path-metric'][0] \
+        == {'metric-type': 'SNR@bandwidth', 'accumulative-value': 'None'}
+
+def test_propagation_cache():
+    """paths resumed from a cached prefix give the same results and element
+    state as a full propagation, also after an element setting changed"""
+    def design():
+        equipment = load_equipment(eqpt_library_name)
+        network = load_network(network_file_name, equipment)
+        build_network(network, equipment, 0, 20)
+        transceivers = {n.uid: n for n in network.nodes() if isinstance(n, Transceiver)}
+        return [dijkstra_path(network, transceivers['trx A'], transceivers[dest])
+                for dest in ('trx B', 'trx F')]
+    si = create_input_spectral_information(191.3e12, 0.15, 32e9, 1e-3, 50e9, 80)
+    cache = PropagationCache()
+    cached_paths, paths = design(), design()
+
+    def check(i):
+        result = CompiledPath(cached_paths[i])(si, cache=cache)
+        expected = CompiledPath(paths[i])(si)
+        assert result.signal.tolist() == expected.signal.tolist()
+        assert result.ase.tolist() == expected.ase.tolist()
+        assert [str(el) for el in cached_paths[i]] == [str(el) for el in paths[i]]
+
+    check(0)
+    assert cache.cache_info().hits == 0
+    check(1)
+    hits = cache.cache_info().hits
+    assert hits > 0 # shared prefix
+    check(0)
+    assert cache.cache_info().hits == hits + len(CompiledPath(paths[0]).operators)
+
+    # a changed setting is not propagated from the cache
+    for path in cached_paths[1], paths[1]:
+        next(el for el in reversed(path) if isinstance(el, Fiber)).att_in += 3
+    check(1)
+    check(0)
+
+    small = PropagationCache(maxbytes=cache.nbytes // 3)
+    for i in (0, 1, 0):
+        assert CompiledPath(cached_paths[i])(si, cache=small).ase.tolist() == \
+            CompiledPath(paths[i])(si).ase.tolist()
+        assert small.nbytes <= small.maxbytes
+    assert small.cache_info().evictions > 0
+
+def test_network_propagation_cache():
+    """a network keeps its own propagation cache: not copied with the
+    network, cleared by a new design and released with the network, as the
+    paths propagated without cache"""
+    equipment = load_equipment(eqpt_library_name)
+    network = load_network(network_file_name, equipment)
+    build_network(network, equipment, 0, 20)
+    transceivers = {n.uid: n for n in network.nodes() if isinstance(n, Transceiver)}
+    params = {'request_id': 0, 'trx_type': '', 'trx_mode': '', 'format': '',
+              'source': 'trx A', 'destination': 'trx F',
+              'nodes_list': ['trx F'], 'loose_list': ['strict'],
+              **trx_mode_params(equipment)}
+    cache = propagation_cache(network)
+    assert propagation_cache(network) is cache
+    path = dijkstra_path(network, transceivers['trx A'], transceivers['trx F'])
+    propagate(path, Path_request(**params), equipment, cache=cache)
+    snr = path[-1].snr.copy()
+    propagate(path, Path_request(**params), equipment, cache=cache)
+    assert (path[-1].snr == snr).all()
+    info = cache.cache_info()
+    assert info.hits > 0
+    # the keys and recorded element state count along with the arrays
+    arrays = sum(node.spectral_info.signal.nbytes * 3
+                 for node in cache._nodes.values() if node.spectral_info is not None)
+    assert info.nbytes > arrays
+
+    copy = deepcopy(network)
+    assert propagation_cache(copy).cache_info().nbytes == 0
+    build_network(network, equipment, 3, 23)
+    assert propagation_cache(network) is not cache
+
+    # nor kept alive by a propagation without cache
+    propagate(path, Path_request(**params), equipment)
+    destination = ref(path[-1])
+    del network, copy, path, cache, transceivers
+    collect()
+    assert destination() is None
 
 if __name__ == '__main__':
     from logging import getLogger, basicConfig, INFO
@@ -0,0 +1,72 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+from pathlib import Path
+from shutil import copyfile
+import pytest
+from numpy import memmap, savez_compressed, arange
+from networkx import dijkstra_path
+from gnpy.core.elements import Edfa
+from gnpy.core.equipment import load_equipment, trx_mode_params, equipment_fingerprint
+from gnpy.core.network import (load_network, build_network, save_network, network_to_json,
+                               network_index, auto_design_filename)
+from gnpy.core.request import Path_request, propagate
+from gnpy.core.snapshot import save_snapshot, load_snapshot, read_snapshot
+
+TEST_DIR = Path(__file__).parent
+DATA_DIR = TEST_DIR / 'data'
+eqpt_library = DATA_DIR / 'eqpt_config.json'
+
+def snr(network, equipment, source, destination):
+    transceivers = network_index(network).transceivers
+    path = dijkstra_path(network, transceivers[source], transceivers[destination])
+    params = {'request_id': 0, 'trx_type': '', 'trx_mode': '', 'format': '',
+              'source': source, 'destination': destination, 'nodes_list': [], 'loose_list': []}
+    params.update(trx_mode_params(equipment))
+    propagate(path, Path_request(**params), equipment)
+    return list(path[-1].snr)
+
+def amplifiers(network):
+    return [(n.uid, repr(n.dp_db), repr(n.effective_gain)) for n in network if isinstance(n, Edfa)]
+
+@pytest.fixture()
+def designed(tmp_path):
+    equipment = load_equipment(eqpt_library)
+    filename = tmp_path / 'LinkforTest.json'
+    copyfile(TEST_DIR / 'LinkforTest.json', filename)
+    network = load_network(filename, equipment)
+    build_network(network, equipment, 0, 20)
+    save_network(filename, network, equipment)
+    return filename, network, equipment
+
+def test_snapshot(designed):
+    """the snapshot holds the network and the equipment library"""
+    filename, network, equipment = designed
+    snapshot_filename = Path(auto_design_filename(filename, '.npz'))
+    assert isinstance(read_snapshot(snapshot_filename).arrays['Fiber.length'].base, memmap)
+
+    loaded, library = load_snapshot(snapshot_filename)
+    assert equipment_fingerprint(library) == equipment_fingerprint(equipment)
+    assert loaded.graph['auto_design'] == network.graph['auto_design']
+    assert network_to_json(loaded) == network_to_json(network)
+    assert amplifiers(loaded) == amplifiers(network)
+    expected = snr(network, equipment, 'trx A', 'trx F')
+    assert snr(loaded, library, 'trx A', 'trx F') == pytest.approx(expected, abs=1e-9)
+
+    loaded = load_network(snapshot_filename, equipment)
+    assert network_to_json(loaded) == network_to_json(network)
+
+def test_snapshot_auto_design(designed):
+    """load_auto_design reads the snapshot first"""
+    filename, network, equipment = designed
+    Path(auto_design_filename(filename)).unlink()
+    cached = load_network(filename, equipment, 0, 20)
+    assert cached.graph['auto_design'] == network.graph['auto_design']
+    assert amplifiers(cached) == amplifiers(network)
+    assert 'auto_design' not in load_network(filename, equipment, 1, 21).graph
+
+def test_compressed_snapshot(tmp_path):
+    filename = tmp_path / 'compressed.npz'
+    savez_compressed(filename, header=arange(3))
+    with pytest.raises(ValueError):
+        read_snapshot(filename)
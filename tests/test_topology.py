@@ -0,0 +1,82 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+from pathlib import Path
+from copy import deepcopy
+from random import Random
+import pytest
+from networkx import dijkstra_path, NetworkXNoPath, NodeNotFound
+from gnpy.core.elements import Transceiver
+from gnpy.core.equipment import load_equipment, trx_mode_params
+from gnpy.core.network import load_network, build_network, network_to_json, network_from_json
+from gnpy.core.request import Path_request, compute_constrained_path, propagate
+from gnpy.core.topology import Topology
+
+TEST_DIR = Path(__file__).parent
+DATA_DIR = TEST_DIR / 'data'
+eqpt_library = DATA_DIR / 'eqpt_config.json'
+
+@pytest.fixture(scope='module')
+def coronet():
+    equipment = load_equipment(eqpt_library)
+    network = load_network(DATA_DIR / 'CORONET_Global_Topology.xls', equipment)
+    build_network(network, equipment, 0, 20)
+    yield network, equipment
+    (DATA_DIR / 'CORONET_Global_Topology.json').unlink()
+
+def request(equipment, source, destination):
+    params = {'request_id': 0, 'trx_type': '', 'trx_mode': '', 'format': '',
+              'source': source, 'destination': destination,
+              'nodes_list': [destination], 'loose_list': ['strict']}
+    params.update(trx_mode_params(equipment))
+    return Path_request(**params)
+
+def test_from_network(coronet):
+    """successors and predecessors are in the order of the DiGraph"""
+    network, _ = coronet
+    topology = Topology.from_network(network)
+    assert topology.number_of_nodes() == network.number_of_nodes()
+    assert topology.number_of_edges() == network.number_of_edges()
+    for el in network:
+        assert list(topology.successors(el)) == list(network.successors(el))
+        assert list(topology.predecessors(el)) == list(network.predecessors(el))
+    assert list(topology.to_networkx().edges()) == list(network.edges())
+    with pytest.raises(NodeNotFound):
+        list(topology.successors(object()))
+
+def test_shortest_path(coronet):
+    """the breadth first search breaks ties as dijkstra_path does"""
+    network, _ = coronet
+    topology = Topology.from_network(network)
+    elements = list(network)
+    rng = Random(0)
+    for _ in range(200):
+        source, target = rng.sample(elements, 2)
+        try:
+            expected = dijkstra_path(network, source, target)
+        except NetworkXNoPath:
+            with pytest.raises(NetworkXNoPath):
+                topology.shortest_path(source, target)
+        else:
+            assert topology.shortest_path(source, target) == expected
+
+def test_csr_backend(coronet):
+    """a designed network loaded as a Topology propagates as the DiGraph"""
+    network, equipment = coronet
+    json_data = network_to_json(network)
+    with pytest.raises(ValueError):
+        network_from_json(deepcopy(json_data), equipment, backend='dict')
+    results = []
+    for backend in ('networkx', 'csr'):
+        graph = network_from_json(deepcopy(json_data), equipment, backend=backend)
+        assert isinstance(graph, Topology) == (backend == 'csr')
+        result = []
+        for source, destination in (('trx Chicago', 'trx New_York'),
+                                    ('trx Mumbai', 'trx New_Orleans')):
+            req = request(equipment, source, destination)
+            path = compute_constrained_path(graph, req)
+            propagate(path, req, equipment)
+            assert isinstance(path[-1], Transceiver)
+            result.append(([el.uid for el in path], list(path[-1].snr)))
+        results.append(result)
+    assert results[0] == results[1]